@@ -16,16 +16,14 @@
 import io
 import logging
 import pickle  # nosec: B403
-import pickletools  # nosec: B403
 import pydoc
 import traceback
 from ast import PyCF_ALLOW_TOP_LEVEL_AWAIT, PyCF_ONLY_AST, PyCF_TYPE_COMMENTS
 from asyncio import Future
-from base64 import b85decode, b85encode
 from collections.abc import MutableMapping
 from inspect import CO_COROUTINE  # pylint: disable=no-name-in-module
 from random import Random
-from types import TracebackType
+from types import CodeType, TracebackType
 from typing import Any, ClassVar, Final, cast
 
 import dill  # type: ignore[import-untyped]  # nosec: B403
@@ -37,6 +35,7 @@ from .. import EVENT_REDIS, EVENT_SHUTDOWN, pytest_is_running
 from ..utils.decorators import requires
 from ..utils.request_handler import APIRequestHandler
 from ..utils.utils import Permission
+from .session import BackdoorSession
 
 LOGGER: Final = logging.getLogger(__name__)
 SEPARATOR: Final = regex.compile(r"[,\s]+")
@@ -65,31 +64,22 @@ class Backdoor(APIRequestHandler):
 
     ALLOWED_METHODS: ClassVar[tuple[str, ...]] = ("POST",)
 
-    sessions: ClassVar[dict[str, dict[str, Any]]] = {}
+    sessions: ClassVar[dict[str, BackdoorSession]] = {}
 
-    async def backup_session(self) -> bool:
-        """Backup a session using Redis and return whether it succeeded."""
+    async def backup_session(self, code: None | CodeType = None) -> bool:
+        """
+        Backup a session using Redis and return whether it succeeded.
+
+        Only the values changed by the code are saved.
+        """
         session_id = self.request.headers.get("X-Backdoor-Session")
         if not (EVENT_REDIS.is_set() and session_id in self.sessions):
             return False
-        session = self.sessions[session_id].copy()
-        session.pop("self", None)
-        session.pop("app", None)
-        session.pop("settings", None)
-        for key, value in tuple(session.items()):
-            try:
-                session[key] = pickletools.optimize(
-                    dill.dumps(value, max(dill.DEFAULT_PROTOCOL, 5))
-                )
-            except BaseException:  # pylint: disable=broad-except  # noqa: B036
-                del session[key]
-        return bool(
-            await self.redis.setex(
-                f"{self.redis_prefix}:backdoor-session:{session_id}",
-                60 * 60 * 24 * 7,  # time to live in seconds (1 week)
-                b85encode(pickletools.optimize(dill.dumps(session))),
-            )
-        )
+        session = self.sessions[session_id]
+        if code:
+            session.mark_used(code)
+        await session.backup(self.redis)
+        return True
 
     def ensure_serializable(self, obj: Any) -> Any:
         """Ensure that obj can be serialized."""
@@ -135,35 +125,16 @@ class Backdoor(APIRequestHandler):
         elif session_id in self.sessions:
             session = self.sessions[session_id]
         else:
-            session_pickle = (
-                await self.redis.get(
-                    f"{self.redis_prefix}:backdoor-session:{session_id}"
-                )
-                if EVENT_REDIS.is_set()
-                else None
+            backdoor_session = BackdoorSession(
+                f"{self.redis_prefix}:backdoor-session-values:{session_id}"
             )
-            if session_pickle:
-                session = dill.loads(b85decode(session_pickle))  # nosec: B301
-                for key, value in session.items():
-                    try:
-                        session[key] = dill.loads(value)  # nosec: B301
-                    except BaseException:  # pylint: disable=broad-except  # noqa: B036, B950  # fmt: skip
-                        LOGGER.exception(
-                            "Error while loading %r in session %r. Data: %r",
-                            key,
-                            session,
-                            value.decode("BRAILLE"),
-                        )
-                        if self.apm_client:
-                            self.apm_client.capture_exception()  # type: ignore[no-untyped-call]
+            if EVENT_REDIS.is_set():
+                loaded = await backdoor_session.load(self.redis)
             else:
-                session = {
-                    "__builtins__": __builtins__,
-                    "__name__": "this",
-                }
-                if pytest_is_running():
-                    session["session_id"] = session_id
-            self.sessions[session_id] = session
+                loaded = 0
+            if not loaded and pytest_is_running():
+                backdoor_session["session_id"] = session_id
+            session = self.sessions[session_id] = backdoor_session
         self.update_session(session)
         return session
 
@@ -227,7 +198,7 @@ class Backdoor(APIRequestHandler):
                 session.pop("self", None)
                 session.pop("app", None)
                 session.pop("settings", None)
-                await self.backup_session()
+                await self.backup_session(code)
                 exc.args = [self.ensure_serializable(arg) for arg in exc.args]  # type: ignore[assignment]  # noqa: B950
                 output_str = output.getvalue() if not output.closed else None
                 output.close()
@@ -252,7 +223,7 @@ class Backdoor(APIRequestHandler):
                 session.pop("self", None)
                 session.pop("app", None)
                 session.pop("settings", None)
-                await self.backup_session()
+                await self.backup_session(code)
         output_str = output.getvalue() if not output.closed else None
         output.close()
         exception_text = (
@@ -0,0 +1,306 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The sessions of the backdoor, saved value by value in Redis."""
+
+import gc
+import logging
+import pickletools  # nosec: B403
+from base64 import b85decode, b85encode
+from types import CodeType, FunctionType, ModuleType, NoneType
+from typing import Any, Final, override
+
+import dill  # type: ignore[import-untyped]  # nosec: B403
+from blake3 import blake3
+from redis.asyncio import Redis
+
+LOGGER: Final = logging.getLogger(__name__)
+
+# names that are added to every session and never saved
+UNSAVED_NAMES: Final[frozenset[str]] = frozenset(
+    {"__builtins__", "app", "self", "settings"}
+)
+
+# values of these types are only pickled again if the name gets rebound
+REBIND_ONLY_TYPES: Final[tuple[type, ...]] = (
+    bool,
+    bytes,
+    complex,
+    float,
+    frozenset,
+    FunctionType,
+    int,
+    ModuleType,
+    NoneType,
+    range,
+    str,
+    type,
+)
+
+
+def get_digest(pickled: str) -> bytes:
+    """Get the digest of a pickled value."""
+    return blake3(pickled.encode("ASCII")).digest()
+
+
+def get_names(code: CodeType) -> set[str]:
+    """Get the names used by the code and the code defined in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.update(get_names(const))
+    return names
+
+
+class BackdoorSession(dict[str, Any]):
+    """
+    The namespace of a backdoor session, backed by a Redis hash.
+
+    Every value is saved in its own field of the hash. A backup only pickles
+    the values that have been rebound, used by the evaluated code (directly,
+    through the called functions, through other names or through the values
+    containing them) or marked as dirty, and only saves them if their pickle
+    changed. After loading the session,
+    the values are unpickled when their name is first looked up.
+    """
+
+    __slots__ = (
+        "_dirty",
+        "_failed",
+        "_saved",
+        "_stored",
+        "_unloaded",
+        "_used",
+        "key",
+        "max_value_size",
+        "ttl",
+    )
+
+    # the names that have been marked as dirty
+    _dirty: set[str]
+    # the names of the values that couldn't be unpickled, they stay in Redis
+    _failed: set[str]
+    # the values when they were saved or loaded with the digest of the pickle
+    # (the digest is empty if the value is too big or can't be pickled)
+    _saved: dict[str, tuple[Any, bytes]]
+    # the names of the fields in Redis
+    _stored: set[str]
+    # the pickled values that haven't been looked up yet
+    _unloaded: dict[str, str]
+    # the names used by the evaluated code since the last backup
+    _used: set[str]
+    key: str
+    max_value_size: int
+    ttl: int
+
+    def __init__(
+        self,
+        key: str,
+        *,
+        max_value_size: int = 1024 * 1024,
+        ttl: int = 60 * 60 * 24 * 7,  # 1 week
+    ) -> None:
+        """Initialize a new session."""
+        super().__init__(__builtins__=__builtins__, __name__="this")
+        self._dirty = set()
+        self._failed = set()
+        self._saved = {}
+        self._stored = set()
+        self._unloaded = {}
+        self._used = set()
+        self.key = key
+        self.max_value_size = max_value_size
+        self.ttl = ttl
+
+    @override
+    def __contains__(self, key: object) -> bool:
+        """Check whether the name is defined in the session."""
+        return key in self._unloaded or super().__contains__(key)
+
+    @override
+    def __delitem__(self, key: str) -> None:
+        """Delete a name from the session."""
+        if key in self._failed:
+            self._failed.discard(key)
+        elif self._unloaded.pop(key, None) is None:
+            super().__delitem__(key)
+        else:
+            self._saved.pop(key, None)
+
+    def __missing__(self, key: str) -> Any:
+        """Unpickle the value of a name that hasn't been looked up yet."""
+        if (pickled := self._unloaded.pop(key, None)) is None:
+            raise KeyError(key)
+        try:
+            value = dill.loads(b85decode(pickled))  # nosec: B301
+        except BaseException:  # noqa: B036
+            LOGGER.exception(
+                "Error while loading %r in session %r. Data: %r",
+                key,
+                self.key,
+                pickled,
+            )
+            self._failed.add(key)
+            raise KeyError(key) from None
+        self._saved[key] = (value, get_digest(pickled))
+        super().__setitem__(key, value)
+        return value
+
+    @override
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle the session like a normal dict (only the loaded values)."""
+        return dict, (), None, None, iter(super().items())
+
+    def _pickle(self, name: str, value: Any) -> None | str:
+        """Pickle a value, return None if it can't (or shouldn't) be saved."""
+        try:
+            pickled = pickletools.optimize(
+                dill.dumps(value, max(dill.DEFAULT_PROTOCOL, 5))
+            )
+        except BaseException:  # pylint: disable=broad-except  # noqa: B036
+            return None
+        if len(pickled) > self.max_value_size:
+            LOGGER.warning(
+                "Not saving %r in session %r, it is too big (%d bytes)",
+                name,
+                self.key,
+                len(pickled),
+            )
+            return None
+        return b85encode(pickled).decode("ASCII")
+
+    async def backup(self, redis: Redis[str]) -> int:
+        """Save the changed values and return how many have been saved."""
+        fields, deleted = self._get_changes()
+        async with redis.pipeline(transaction=True) as pipe:
+            if fields:
+                pipe.hset(self.key, mapping=fields)
+            if deleted:
+                pipe.hdel(self.key, *deleted)
+            pipe.expire(self.key, self.ttl)
+            await pipe.execute()
+        self._stored.difference_update(deleted)
+        self._stored.update(fields)
+        return len(fields)
+
+    def _get_changes(self) -> tuple[dict[str, str], list[str]]:
+        """Get the changed values pickled and the names of the deleted ones."""
+        fields: dict[str, str] = {}
+        deleted: list[str] = []
+        used = self._get_used_names()
+        dirty, self._dirty = self._dirty, set()
+        for name, value in super().items():
+            if name in UNSAVED_NAMES:
+                continue
+            self._failed.discard(name)
+            saved = self._saved.get(name)
+            if (
+                saved
+                and saved[0] is value
+                and name not in dirty
+                and (
+                    name not in used
+                    or not saved[1]
+                    or isinstance(value, REBIND_ONLY_TYPES)
+                )
+            ):
+                continue
+            if (pickled := self._pickle(name, value)) is None:
+                self._saved[name] = (value, b"")
+                if name in self._stored:
+                    deleted.append(name)
+                continue
+            digest = get_digest(pickled)
+            if not saved or saved[1] != digest:
+                fields[name] = pickled
+            self._saved[name] = (value, digest)
+        deleted.extend(
+            name
+            for name in self._stored
+            if name not in self._unloaded
+            if name not in self._failed
+            if not dict.__contains__(self, name)
+        )
+        for name in tuple(self._saved):
+            if not super().__contains__(name):
+                del self._saved[name]
+        return fields, deleted
+
+    def _get_used_names(self) -> set[str]:
+        """
+        Get the names of the values that could have been changed by the code.
+
+        These are the used names, the names used by the used functions, the
+        names of the same mutable objects and the names of the values that
+        reference them (like b after b = {"a": a}). Values that only contain
+        them through other objects (like b after b = {"a": [a]}) have to be
+        marked as dirty.
+        """
+        used, self._used = self._used, set()
+        to_check = list(used)
+        while to_check:
+            value = super().get(to_check.pop())
+            if isinstance(value, FunctionType):
+                names = get_names(value.__code__) - used
+                used.update(names)
+                to_check.extend(names)
+        values = {
+            id(value): value
+            for name in used
+            if not isinstance(value := dict.get(self, name), REBIND_ONLY_TYPES)
+        }
+        others = {
+            id(value): value
+            for value in super().values()
+            if not isinstance(value, REBIND_ONLY_TYPES)
+            if id(value) not in values
+        }
+        found = list(values.values())
+        while found and others:
+            found = [
+                others.pop(id(referrer))
+                for referrer in gc.get_referrers(*found)
+                if others.get(id(referrer)) is referrer
+            ]
+            values.update((id(value), value) for value in found)
+        used.update(
+            name for name, value in super().items() if id(value) in values
+        )
+        return used
+
+    async def load(self, redis: Redis[str]) -> int:
+        """Load the pickled values from Redis and return their count."""
+        stored = await redis.hgetall(self.key)
+        self._stored = set(stored)
+        self._unloaded = {
+            name: value
+            for name, value in stored.items()
+            if not dict.__contains__(self, name)
+        }
+        return len(self._unloaded)
+
+    def mark_dirty(self, *names: str) -> None:
+        """Check the values of the names for changes with the next backup."""
+        self._dirty.update(names)
+
+    def mark_used(self, code: CodeType) -> None:
+        """Check the values used by the code for changes with the next backup."""
+        self._used.update(get_names(code))
+
+    @override
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get the value of a name or the default."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
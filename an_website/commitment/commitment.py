@@ -19,13 +19,14 @@ Based on: https://github.com/ngerakines/commitment
 
 import logging
 import random
-from collections.abc import Mapping
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass
 from datetime import UTC, datetime
-from typing import Final
+from typing import Final, override
 
 from tornado.web import HTTPError
-from typed_stream import Stream
 
 from .. import DIR as ROOT_DIR
 from ..utils.data_parsing import parse_args
@@ -36,7 +37,6 @@ from ..utils.utils import ModuleInfo
 LOGGER: Final = logging.getLogger(__name__)
 
 type Commit = tuple[datetime, str]
-type Commits = Mapping[str, Commit]
 
 
 def get_module_info() -> ModuleInfo:
@@ -54,16 +54,97 @@ def get_module_info() -> ModuleInfo:
     )
 
 
+class Commits(Mapping[str, Commit]):
+    """
+    The commits sorted by their hashes.
+
+    Looking up a commit by its hash or the prefix of its hash is done with a
+    binary search. The commits with a message and the commits with an emoji
+    in their message are indexed, so random commits can be chosen from them
+    without looking at all the commits.
+    """
+
+    __slots__ = ("_commits", "_hashes", "_with_emoji", "_with_message")
+
+    _commits: list[Commit]
+    _hashes: list[str]
+    # the indices of the commits with an emoji in their message
+    _with_emoji: array[int]
+    # the indices of the commits with a message
+    _with_message: array[int]
+
+    def __init__(self, commits: Mapping[str, Commit]) -> None:
+        """Sort and index the commits."""
+        self._hashes = sorted(commits)
+        self._commits = [commits[hash_] for hash_ in self._hashes]
+        self._with_emoji = array("I")
+        self._with_message = array("I")
+        for index, (_, message) in enumerate(self._commits):
+            if message:
+                self._with_message.append(index)
+                if text_contains_emoji(message):
+                    self._with_emoji.append(index)
+
+    @override
+    def __getitem__(self, hash_: str) -> Commit:
+        """Get the commit with the hash."""
+        index = bisect_left(self._hashes, hash_)
+        if index < len(self._hashes) and self._hashes[index] == hash_:
+            return self._commits[index]
+        raise KeyError(hash_)
+
+    @override
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the hashes in sorted order."""
+        return iter(self._hashes)
+
+    @override
+    def __len__(self) -> int:
+        """Get the count of the commits."""
+        return len(self._hashes)
+
+    def find(
+        self, prefix: str, require_emoji: bool = False
+    ) -> None | tuple[str, Commit]:
+        """
+        Find the commit with a hash starting with the prefix.
+
+        If no commit or more than one commit matches, None is returned.
+        """
+        indices: array[int] | range = (
+            self._with_emoji if require_emoji else range(len(self._hashes))
+        )
+        start = bisect_left(indices, prefix, key=self._hashes.__getitem__)
+        matches = [
+            indices[position]
+            for position in range(start, min(start + 2, len(indices)))
+            if self._hashes[indices[position]].startswith(prefix)
+        ]
+        if len(matches) != 1:
+            return None
+        return self._hashes[matches[0]], self._commits[matches[0]]
+
+    def random(self, require_emoji: bool = False) -> None | tuple[str, Commit]:
+        """Get a random commit with a message."""
+        indices = self._with_emoji if require_emoji else self._with_message
+        if not indices:
+            return None
+        index = random.choice(indices)
+        return self._hashes[index], self._commits[index]
+
+
 def parse_commits_txt(data: str) -> Commits:
     """Parse the contents of commits.txt."""
-    return {
-        split[0]: (
-            datetime.fromtimestamp(int(split[1]), UTC),
-            split[2] if len(split) >= 3 else "",
-        )
-        for line in data.splitlines()
-        if (split := line.rstrip().split(" ", 2))
-    }
+    return Commits(
+        {
+            split[0]: (
+                datetime.fromtimestamp(int(split[1]), UTC),
+                split[2] if len(split) >= 3 else "",
+            )
+            for line in data.splitlines()
+            if (split := line.rstrip().split(" ", 2))
+        }
+    )
 
 
 def read_commits_txt() -> None | Commits:
@@ -103,16 +184,9 @@ class CommitmentAPI(APIRequestHandler):
             )
 
         if args.hash is None:
-            return await self.write_commit(
-                *random.choice(
-                    [
-                        (com, (_, msg))
-                        for com, (_, msg) in COMMITS.items()
-                        if msg
-                        if not args.require_emoji or text_contains_emoji(msg)
-                    ]
-                )
-            )
+            if not (result := COMMITS.random(args.require_emoji)):
+                raise HTTPError(404)
+            return await self.write_commit(*result)
 
         if len(args.hash) + 2 == 42:
             if args.hash in COMMITS:
@@ -122,23 +196,10 @@ class CommitmentAPI(APIRequestHandler):
         if len(args.hash) + 1 >= 42:
             raise HTTPError(404)
 
-        results = (
-            Stream(
-                (com, (_, msg))
-                for com, (_, msg) in COMMITS.items()
-                if com.startswith(args.hash)
-                if not args.require_emoji or text_contains_emoji(msg)
-            )
-            .limit(2)
-            .collect()
-        )
-
-        if len(results) != 1:
+        if not (result := COMMITS.find(args.hash, args.require_emoji)):
             raise HTTPError(404)
 
-        [(hash_, commit)] = results
-
-        return await self.write_commit(hash_, commit)
+        return await self.write_commit(*result)
 
     async def write_commit(self, hash_: str, commit: Commit) -> None:
         """Write the commit data."""
@@ -13,23 +13,31 @@
 
 """A permanent redirect to an invite of the Discord guild."""
 
+import asyncio
+import logging
 import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from functools import partial
 from typing import Final
 
 import orjson as json
-from tornado.httpclient import AsyncHTTPClient
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from tornado.httpclient import AsyncHTTPClient, HTTPResponse
 from tornado.web import HTTPError
 
-from .. import CA_BUNDLE_PATH
+from .. import CA_BUNDLE_PATH, EVENT_REDIS, NAME
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
 from ..utils.utils import ModuleInfo
 
+LOGGER: Final = logging.getLogger(__name__)
+
 GUILD_ID: Final[str] = "367648314184826880"
 
-INVITE_CACHE: dict[
-    str,
-    tuple[float, str, str] | tuple[float, HTTPError],
-] = {}
+# the invite and its source
+type Invite = tuple[str, str]
 
 
 def get_module_info() -> ModuleInfo:
@@ -56,89 +64,271 @@ def get_module_info() -> ModuleInfo:
     )
 
 
-async def url_returns_200(url: str) -> bool:
-    """Check whether a URL returns a status code of 200."""
-    response = await AsyncHTTPClient().fetch(
-        url,
-        method="HEAD",
-        raise_error=False,
-        ca_certs=CA_BUNDLE_PATH,
-    )
-    return response.code == 200
-
-
-async def get_invite(guild_id: str = GUILD_ID) -> tuple[str, str]:
-    """
-    Get the invite to a Discord guild and return it with the source.
-
-    How to get the invite:
-        - from the widget (has to be enabled in guild settings)
-        - from DISBOARD (the guild needs to set it up first)
-
-    If the invite couldn't be fetched an HTTPError is raised.
-    """
-    reason = "Invite not found."
+@dataclass(frozen=True, slots=True)
+class InviteSources:
+    """The base URLs of the services the invites are taken from."""
+
+    discord: str = "https://discord.com"
+    disboard: str = "https://disboard.org"
+    top_gg: str = "https://top.gg"
+    discords: str = "https://discords.com"
+    timeout: float = 10
+    """The timeout of every request in seconds."""
+
+    async def fetch(self, url: str, method: str = "GET") -> HTTPResponse:
+        """Fetch a URL without raising an error for other codes than 200."""
+        return await AsyncHTTPClient().fetch(
+            url,
+            method=method,
+            raise_error=False,
+            ca_certs=CA_BUNDLE_PATH,
+            request_timeout=self.timeout,
+        )
 
-    # try getting the invite from the widget
-    url = f"https://discord.com/api/guilds/{guild_id}/widget.json"
-    response = await AsyncHTTPClient().fetch(
-        url, raise_error=False, ca_certs=CA_BUNDLE_PATH
-    )
-    if response.code == 200:
-        response_json = json.loads(response.body)
-        if invite := response_json["instant_invite"]:
+    async def from_widget(self, guild_id: str) -> Invite:
+        """Get the invite from the widget (if it is enabled by the guild)."""
+        url = f"{self.discord}/api/guilds/{guild_id}/widget.json"
+        response = await self.fetch(url)
+        if response.code != 200:
+            raise HTTPError(404, reason="Invite not found.")
+        if invite := json.loads(response.body)["instant_invite"]:
             return invite, url
-        reason = f"No instant invite in widget ({url}) found."
+        raise HTTPError(
+            404, reason=f"No instant invite in widget ({url}) found."
+        )
 
-    # try getting the invite from DISBOARD
-    url = f"https://disboard.org/site/get-invite/{guild_id}"
-    response = await AsyncHTTPClient().fetch(
-        url, raise_error=False, ca_certs=CA_BUNDLE_PATH
-    )
-    if response.code == 200:
+    async def from_disboard(self, guild_id: str) -> Invite:
+        """Get the invite from DISBOARD (the guild needs to set it up first)."""
+        url = f"{self.disboard}/site/get-invite/{guild_id}"
+        response = await self.fetch(url)
+        if response.code != 200:
+            raise HTTPError(404, reason="Invite not found.")
+        return json.loads(response.body), f"{self.disboard}/server/{guild_id}"
+
+    async def from_top_gg(self, guild_id: str) -> Invite:
+        """Get the invite from Top.gg (if it lists the guild)."""
+        url = f"{self.top_gg}/servers/{guild_id}/join"
+        if (await self.fetch(url, "HEAD")).code != 200:
+            raise HTTPError(404, reason="Invite not found.")
+        return url, f"{self.top_gg}/servers/{guild_id}/"
+
+    async def from_discords(self, guild_id: str) -> Invite:
+        """Get the invite from Discords.com (if it lists the guild)."""
+        # API endpoint that only returns 200 if the guild exists
+        url = f"{self.discords}/api-v2/server/{guild_id}/relevant"
+        if (await self.fetch(url, "HEAD")).code != 200:
+            raise HTTPError(404, reason="Invite not found.")
         return (
-            json.loads(response.body),
-            f"https://disboard.org/server/{guild_id}",
+            f"{self.discords}/servers/{guild_id}/join",
+            f"{self.discords}/servers/{guild_id}/",
         )
 
-    # check if Top.gg lists the guild
-    url = f"https://top.gg/servers/{guild_id}/join"
-    if await url_returns_200(url):
-        return url, f"https://top.gg/servers/{guild_id}/"
-
-    # check if Discords.com lists the guild
-    if await url_returns_200(
-        # API endpoint that only returns 200 if the guild exists
-        f"https://discords.com/api-v2/server/{guild_id}/relevant"
-    ):
+    def get_sources(self) -> tuple[Callable[[str], Awaitable[Invite]], ...]:
+        """Get the sources in the order they are preferred."""
         return (
-            f"https://discords.com/servers/{guild_id}/join",
-            f"https://discords.com/servers/{guild_id}/",
+            self.from_widget,
+            self.from_disboard,
+            self.from_top_gg,
+            self.from_discords,
         )
 
-    raise HTTPError(404, reason=reason)
 
+INVITE_SOURCES: Final = InviteSources()
 
-async def get_invite_with_cache(
+
+async def get_invite(
     guild_id: str = GUILD_ID,
-) -> tuple[str, str]:
-    """Get an invite from cache or from get_invite()."""
-    if guild_id in INVITE_CACHE:
-        cache_entry = INVITE_CACHE[guild_id]
-        if cache_entry[0] > time.monotonic() - 300:
-            if isinstance(cache_entry[1], HTTPError):
-                raise cache_entry[1]
-            return cache_entry[1], cache_entry[2]
+    sources: InviteSources = INVITE_SOURCES,
+    race: bool = False,
+) -> Invite:
+    """
+    Get the invite to a Discord guild and return it with the source.
 
+    The sources are asked one after another, if race is True they are asked
+    at the same time and the first invite found is returned.
+
+    If the invite couldn't be fetched an HTTPError is raised, other errors
+    of the sources (e.g. timeouts) are logged and the next source is asked.
+    """
+    if not race:
+        error: None | HTTPError = None
+        for source in sources.get_sources():
+            try:
+                return await source(guild_id)
+            except HTTPError as exc:
+                error = error or exc
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.info("Invite source failed", exc_info=True)
+        raise error or HTTPError(404, reason="Invite not found.")
+
+    tasks = [
+        asyncio.create_task(source(guild_id))
+        for source in sources.get_sources()
+    ]
     try:
-        invite, source = await get_invite(guild_id)
-    except HTTPError as exc:
-        INVITE_CACHE[guild_id] = (time.monotonic(), exc)
-        raise exc
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                return await next_done
+            except HTTPError:
+                pass
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.info("Invite source failed", exc_info=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+    # prefer the reason of the most preferred source
+    raise next(
+        (
+            error
+            for task in tasks
+            if isinstance(error := task.exception(), HTTPError)
+        ),
+        HTTPError(404, reason="Invite not found."),
+    )
+
 
-    INVITE_CACHE[guild_id] = (time.monotonic(), invite, source)
+class InviteResolver:
+    """
+    Resolve invites of Discord guilds and cache them.
 
-    return invite, source
+    Every guild is resolved only once at a time, concurrent lookups wait for
+    the same result. The results are cached in Redis for all workers and in
+    a bounded cache of this worker.
+    """
+
+    __slots__ = ("_cache", "_pending", "max_size", "race", "sources", "ttl")
+
+    _cache: OrderedDict[str, tuple[float, Invite | HTTPError]]
+    _pending: dict[str, asyncio.Task[Invite | HTTPError]]
+    max_size: int
+    race: bool
+    sources: InviteSources
+    ttl: int
+
+    def __init__(
+        self,
+        *,
+        max_size: int = 256,
+        race: bool = False,
+        sources: InviteSources = INVITE_SOURCES,
+        ttl: int = 300,
+    ) -> None:
+        """Initialize the resolver with an empty cache."""
+        self._cache = OrderedDict()
+        self._pending = {}
+        self.max_size = max_size
+        self.race = race
+        self.sources = sources
+        self.ttl = ttl
+
+    def _cache_result(
+        self, guild_id: str, result: Invite | HTTPError, ttl: float
+    ) -> None:
+        """Cache the result in this worker."""
+        self._cache[guild_id] = (time.monotonic() + ttl, result)
+        self._cache.move_to_end(guild_id)
+        while len(self._cache) > self.max_size:  # pylint: disable=while-used
+            self._cache.popitem(last=False)
+
+    async def _resolve(
+        self, guild_id: str, redis: None | Redis[str], redis_prefix: str
+    ) -> Invite | HTTPError:
+        """
+        Resolve the invite and cache it.
+
+        If Redis fails, the invite is resolved from the sources. If they fail
+        too, the expired invite in the cache of this worker is used.
+        """
+        key = f"{redis_prefix}:discord-invite:{guild_id}"
+        redis_failed = False
+        if redis is not None:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    cached, ttl = await pipe.get(key).ttl(key).execute()
+            except RedisError:
+                LOGGER.exception("Getting the cached invite failed")
+                redis, redis_failed = None, True
+            else:
+                if cached:
+                    data = json.loads(cached)
+                    result: Invite | HTTPError = (
+                        HTTPError(404, reason=data["reason"])
+                        if "reason" in data
+                        else (data["invite"], data["source"])
+                    )
+                    self._cache_result(guild_id, result, max(ttl, 0))
+                    return result
+
+        try:
+            result = await get_invite(guild_id, self.sources, self.race)
+        except HTTPError as exc:
+            expired = self._cache.get(guild_id)
+            if redis_failed and expired and isinstance(expired[1], tuple):
+                return expired[1]
+            result = exc
+
+        self._cache_result(guild_id, result, self.ttl)
+        if redis is not None:
+            try:
+                await redis.set(
+                    key,
+                    json.dumps(
+                        {"reason": result.reason}
+                        if isinstance(result, HTTPError)
+                        else {"invite": result[0], "source": result[1]}
+                    ),
+                    ex=self.ttl,
+                )
+            except RedisError:
+                LOGGER.exception("Caching the invite failed")
+        return result
+
+    def _forget_task(
+        self, guild_id: str, task: asyncio.Task[Invite | HTTPError]
+    ) -> None:
+        """Forget the finished task resolving the invite to a guild."""
+        if self._pending.get(guild_id) is task:
+            del self._pending[guild_id]
+
+    def clear(self) -> None:
+        """Clear the cache of this worker."""
+        self._cache.clear()
+
+    async def get(
+        self,
+        guild_id: str = GUILD_ID,
+        redis: None | Redis[str] = None,
+        redis_prefix: str = NAME,
+    ) -> Invite:
+        """Get the invite to a Discord guild and return it with the source."""
+        if (cached := self._cache.get(guild_id)) and cached[
+            0
+        ] > time.monotonic():
+            self._cache.move_to_end(guild_id)
+            result = cached[1]
+        else:
+            if not (task := self._pending.get(guild_id)):
+                task = asyncio.create_task(
+                    self._resolve(guild_id, redis, redis_prefix)
+                )
+                self._pending[guild_id] = task
+                task.add_done_callback(partial(self._forget_task, guild_id))
+            result = await asyncio.shield(task)
+        if isinstance(result, HTTPError):
+            raise result
+        return result
+
+
+INVITE_RESOLVER: Final = InviteResolver()
+
+
+async def get_invite_with_cache(
+    guild_id: str = GUILD_ID,
+    redis: None | Redis[str] = None,
+    redis_prefix: str = NAME,
+) -> Invite:
+    """Get an invite from the cache or from get_invite()."""
+    return await INVITE_RESOLVER.get(guild_id, redis, redis_prefix)
 
 
 class ANDiscord(HTMLRequestHandler):
@@ -148,7 +338,13 @@ class ANDiscord(HTMLRequestHandler):
 
     async def get(self, *, head: bool = False) -> None:
         """Get the Discord invite."""
-        invite = (await get_invite_with_cache(GUILD_ID))[0]
+        invite = (
+            await get_invite_with_cache(
+                GUILD_ID,
+                self.redis if EVENT_REDIS.is_set() else None,
+                self.redis_prefix,
+            )
+        )[0]
         if not self.user_settings.ask_before_leaving:
             return self.redirect(invite)
         if head:
@@ -173,7 +369,11 @@ class DiscordAPI(APIRequestHandler):
     ) -> None:
         """Get the Discord invite and render it as JSON."""
         # pylint: disable=unused-argument
-        invite, source_url = await get_invite_with_cache(guild_id)
+        invite, source_url = await get_invite_with_cache(
+            guild_id,
+            self.redis if EVENT_REDIS.is_set() else None,
+            self.redis_prefix,
+        )
         return await self.finish_dict(invite=invite, source=source_url)
 
 
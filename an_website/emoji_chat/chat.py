@@ -18,7 +18,8 @@ import logging
 import random
 import sys
 import time
-from collections.abc import Awaitable, Iterable, Mapping
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
 from typing import Any, Final, Literal
 
 import orjson as json
@@ -31,6 +32,7 @@ from .. import EPOCH_MS, EVENT_REDIS, EVENT_SHUTDOWN, NAME, ORJSON_OPTIONS
 from ..utils.base_request_handler import BaseRequestHandler
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
 from ..utils.utils import Permission, ratelimit
+from .connections import ConnectionRegistry
 from .pub_sub_provider import PubSubProvider
 
 LOGGER: Final = logging.getLogger(__name__)
@@ -46,6 +48,27 @@ MAX_MESSAGE_LENGTH: Final = 20
 REDIS_CHANNEL: Final = f"{NAME}:emoji_chat_channel"
 
 
+def get_users_frame(
+    connections: ConnectionRegistry[ChatWebSocketHandler],
+) -> None | bytes:
+    """Get the serialized frame with the current users."""
+    if not sys.flags.dev_mode:
+        return None
+    return json.dumps(
+        {
+            "type": "users",
+            "users": [
+                {
+                    "name": conn.name,
+                    "joined_at": conn.connection_time,
+                }
+                for conn in connections
+            ],
+        },
+        option=ORJSON_OPTIONS,
+    )
+
+
 def get_ms_timestamp() -> int:
     """Get the current time in ms."""
     return time.time_ns() // 1_000_000 - EPOCH_MS
@@ -63,6 +86,8 @@ async def subscribe_to_redis_channel(
         try:
             message = await ps.get_message(timeout=5.0)
         except Exception as exc:  # pylint: disable=broad-exception-caught
+            # messages could get lost until subscribed again
+            CHAT_HISTORY.subscribed = False
             if str(exc) == "Connection closed by server.":
                 continue
             LOGGER.exception("Failed to get message on worker %s", worker)
@@ -79,9 +104,8 @@ async def subscribe_to_redis_channel(
             } if (
                 channel == REDIS_CHANNEL
             ):
-                await asyncio.gather(
-                    *[conn.write_message(data) for conn in OPEN_CONNECTIONS]
-                )
+                OPEN_CONNECTIONS.broadcast(data.encode("UTF-8"))
+                CHAT_HISTORY.append_published(data)
             case {
                 "type": "subscribe",
                 "data": 1,
@@ -89,6 +113,8 @@ async def subscribe_to_redis_channel(
             } if (
                 channel == REDIS_CHANNEL
             ):
+                CHAT_HISTORY.invalidate()
+                CHAT_HISTORY.subscribed = True
                 logging.info(
                     "Subscribed to Redis channel %r on worker %s",
                     channel,
@@ -108,31 +134,36 @@ async def save_new_message(
     message: str,
     redis: Redis[str],
     redis_prefix: str,
-) -> None:
-    """Save a new message."""
+) -> dict[str, Any]:
+    """Save a new message and publish it in one transaction."""
     message_dict = {
         "author": [data["emoji"] for data in emoji_list(author)],
         "content": [data["emoji"] for data in emoji_list(message)],
         "timestamp": get_ms_timestamp(),
     }
-    await redis.rpush(
-        f"{redis_prefix}:emoji-chat:message-list",
-        json.dumps(message_dict, option=ORJSON_OPTIONS),
-    )
-    await redis.ltrim(
-        f"{redis_prefix}:emoji-chat:message-list", -MAX_MESSAGE_SAVE_COUNT, -1
-    )
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.rpush(
+            f"{redis_prefix}:emoji-chat:message-list",
+            json.dumps(message_dict, option=ORJSON_OPTIONS),
+        )
+        pipe.ltrim(
+            f"{redis_prefix}:emoji-chat:message-list",
+            -MAX_MESSAGE_SAVE_COUNT,
+            -1,
+        )
+        pipe.publish(
+            REDIS_CHANNEL,
+            json.dumps(
+                {
+                    "type": "message",
+                    "message": message_dict,
+                },
+                option=ORJSON_OPTIONS,
+            ),
+        )
+        await pipe.execute()
     LOGGER.info("GOT new message %s", message_dict)
-    await redis.publish(
-        REDIS_CHANNEL,
-        json.dumps(
-            {
-                "type": "message",
-                "message": message_dict,
-            },
-            option=ORJSON_OPTIONS,
-        ),
-    )
+    return message_dict
 
 
 async def get_messages(
@@ -183,6 +214,122 @@ def get_random_name() -> str:
     )
 
 
+class ChatHistorySnapshot:
+    """The messages at one point in time, serialized when first needed."""
+
+    __slots__ = ("_html", "_json", "messages")
+
+    _html: dict[object, str]
+    _json: None | bytes
+    messages: tuple[dict[str, Any], ...]
+
+    def __init__(self, messages: Iterable[dict[str, Any]]) -> None:
+        """Initialize the snapshot."""
+        self._html = {}
+        self._json = None
+        self.messages = tuple(messages)
+
+    def get_html(
+        self,
+        key: object,
+        render: Callable[[tuple[dict[str, Any], ...]], str],
+    ) -> str:
+        """Get the messages rendered as HTML, cached with the key."""
+        if (html := self._html.get(key)) is None:
+            html = self._html[key] = render(self.messages)
+        return html
+
+    def get_json(self) -> bytes:
+        """Get the messages serialized as JSON list."""
+        if self._json is None:
+            self._json = json.dumps(self.messages, option=ORJSON_OPTIONS)
+        return self._json
+
+    def with_message(self, message: dict[str, Any]) -> ChatHistorySnapshot:
+        """Get a snapshot that contains the message."""
+        if message in self.messages[-10:]:
+            return self
+        return ChatHistorySnapshot(
+            (*self.messages, message)[-MAX_MESSAGE_SAVE_COUNT:]
+        )
+
+
+class ChatHistory:
+    """
+    The recent messages of the chat.
+
+    While the worker is subscribed to the Redis channel, the messages are kept
+    in memory and reading them doesn't need Redis.
+    """
+
+    __slots__ = ("_snapshot", "_version", "loaded", "messages", "subscribed")
+
+    _snapshot: None | ChatHistorySnapshot
+    # incremented for every change, to detect changes while loading
+    _version: int
+    loaded: bool
+    messages: deque[dict[str, Any]]
+    subscribed: bool
+
+    def __init__(self, size: int = MAX_MESSAGE_SAVE_COUNT) -> None:
+        """Initialize the empty history."""
+        self._snapshot = None
+        self._version = 0
+        self.loaded = False
+        self.messages = deque(maxlen=size)
+        self.subscribed = False
+
+    def append(self, message: dict[str, Any]) -> None:
+        """Add a published message."""
+        self._version += 1
+        if self.loaded:
+            self.messages.append(message)
+            self._snapshot = None
+
+    def append_published(self, data: str) -> None:
+        """Add the message from the data published to the Redis channel."""
+        try:
+            published = json.loads(data)
+        except json.JSONDecodeError:
+            LOGGER.error("Got invalid JSON %r", data)
+            self.invalidate()
+            return
+        if published.get("type") == "message":
+            self.append(published["message"])
+
+    async def get_snapshot(
+        self, redis: Redis[str], redis_prefix: str
+    ) -> ChatHistorySnapshot:
+        """Get the current messages, from Redis only if needed."""
+        if not self.subscribed:
+            return ChatHistorySnapshot(await get_messages(redis, redis_prefix))
+        if not self.loaded:
+            for _ in range(3):
+                version = self._version
+                messages = await get_messages(redis, redis_prefix)
+                if version == self._version:
+                    break
+            else:
+                # it changed while loading, try again with the next read
+                return ChatHistorySnapshot(messages)
+            self.messages.clear()
+            self.messages.extend(messages)
+            self.loaded = True
+            self._snapshot = None
+        if self._snapshot is None:
+            self._snapshot = ChatHistorySnapshot(self.messages)
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        """Load the messages from Redis again on the next read."""
+        self._version += 1
+        self.loaded = False
+        self._snapshot = None
+
+
+CHAT_HISTORY: Final = ChatHistory()
+
+
 class ChatHandler(BaseRequestHandler):
     """The request handler for the emoji chat."""
 
@@ -209,7 +356,7 @@ class ChatHandler(BaseRequestHandler):
             return
 
         await self.render_chat(
-            await get_messages(self.redis, self.redis_prefix)
+            await CHAT_HISTORY.get_snapshot(self.redis, self.redis_prefix)
         )
 
     async def get_name(self) -> str:
@@ -260,18 +407,20 @@ class ChatHandler(BaseRequestHandler):
         if err := check_message_invalid(message):
             raise HTTPError(400, reason=err)
 
-        await save_new_message(
+        message_dict = await save_new_message(
             await self.get_name(),
             message,
             redis=self.redis,
             redis_prefix=self.redis_prefix,
         )
 
-        await self.render_chat(
-            await get_messages(self.redis, self.redis_prefix)
+        # the published message could not have arrived yet
+        snapshot = await CHAT_HISTORY.get_snapshot(
+            self.redis, self.redis_prefix
         )
+        await self.render_chat(snapshot.with_message(message_dict))
 
-    async def render_chat(self, messages: Iterable[Mapping[str, Any]]) -> None:
+    async def render_chat(self, snapshot: ChatHistorySnapshot) -> None:
         """Render the chat."""
         raise NotImplementedError
 
@@ -279,11 +428,16 @@ class ChatHandler(BaseRequestHandler):
 class HTMLChatHandler(ChatHandler, HTMLRequestHandler):
     """The HTML request handler for the emoji chat."""
 
-    async def render_chat(self, messages: Iterable[Mapping[str, Any]]) -> None:
+    async def render_chat(self, snapshot: ChatHistorySnapshot) -> None:
         """Render the chat."""
         await self.render(
             "pages/emoji_chat.html",
-            messages=messages,
+            messages_html=snapshot.get_html(
+                self.user_settings.openmoji,
+                lambda messages: self.render_string(
+                    "pages/emoji_chat_messages.html", messages=messages
+                ).decode("UTF-8"),
+            ),
             user_name=await self.get_name_as_list(),
         )
 
@@ -291,17 +445,32 @@ class HTMLChatHandler(ChatHandler, HTMLRequestHandler):
 class APIChatHandler(ChatHandler, APIRequestHandler):
     """The API request handler for the emoji chat."""
 
-    async def render_chat(self, messages: Iterable[Mapping[str, Any]]) -> None:
+    async def render_chat(self, snapshot: ChatHistorySnapshot) -> None:
         """Render the chat."""
+        current_user = await self.get_name_as_list()
+        if (
+            self.content_type == "application/json"
+            and not self.get_bool_argument("pretty", False)
+        ):
+            # use the serialized messages instead of serializing them again
+            return await self.finish(
+                b'{"current_user":'
+                + json.dumps(current_user, option=ORJSON_OPTIONS)
+                + b',"messages":'
+                + snapshot.get_json()
+                + b"}"
+            )
         await self.finish(
             {
-                "current_user": await self.get_name_as_list(),
-                "messages": messages,
+                "current_user": current_user,
+                "messages": snapshot.messages,
             }
         )
 
 
-OPEN_CONNECTIONS: list[ChatWebSocketHandler] = []
+OPEN_CONNECTIONS: Final[ConnectionRegistry[ChatWebSocketHandler]] = (
+    ConnectionRegistry(presence_frame=get_users_frame)
+)
 
 
 class ChatWebSocketHandler(WebSocketHandler, ChatHandler):
@@ -313,8 +482,6 @@ class ChatWebSocketHandler(WebSocketHandler, ChatHandler):
     def on_close(self) -> None:  # noqa: D102
         LOGGER.info("WebSocket closed")
         OPEN_CONNECTIONS.remove(self)
-        for conn in OPEN_CONNECTIONS:
-            conn.send_users()
 
     def on_message(self, message: str | bytes) -> Awaitable[None] | None:
         """Respond to an incoming message."""
@@ -349,9 +516,7 @@ class ChatWebSocketHandler(WebSocketHandler, ChatHandler):
         )
 
         self.connection_time = get_ms_timestamp()
-        OPEN_CONNECTIONS.append(self)
-        for conn in OPEN_CONNECTIONS:
-            conn.send_users()
+        OPEN_CONNECTIONS.add(self)
 
         await self.send_messages()
 
@@ -363,10 +528,9 @@ class ChatWebSocketHandler(WebSocketHandler, ChatHandler):
 
         self.name = await self.get_name()
 
-        if not await self.ratelimit(True):
-            await self.ratelimit()
+        await self.ratelimit(True)
 
-    async def render_chat(self, messages: Iterable[Mapping[str, Any]]) -> None:
+    async def render_chat(self, snapshot: ChatHistorySnapshot) -> None:
         """Render the chat."""
         raise NotImplementedError
 
@@ -398,31 +562,16 @@ class ChatWebSocketHandler(WebSocketHandler, ChatHandler):
                     {"type": "ratelimit", "retry_after": headers["Retry-After"]}
                 )
 
-        return await save_new_message(
+        await save_new_message(
             self.name, msg_text, self.redis, self.redis_prefix
         )
+        return None
 
     async def send_messages(self) -> None:
         """Send this WebSocket all current messages."""
+        snapshot = await CHAT_HISTORY.get_snapshot(
+            self.redis, self.redis_prefix
+        )
         return await self.write_message(
-            {
-                "type": "messages",
-                "messages": await get_messages(self.redis, self.redis_prefix),
-            },
+            b'{"type":"messages","messages":' + snapshot.get_json() + b"}"
         )
-
-    def send_users(self) -> None:
-        """Send this WebSocket all current users."""
-        if sys.flags.dev_mode:
-            self.write_message(  # type: ignore[unused-awaitable]
-                {
-                    "type": "users",
-                    "users": [
-                        {
-                            "name": conn.name,
-                            "joined_at": conn.connection_time,
-                        }
-                        for conn in OPEN_CONNECTIONS
-                    ],
-                }
-            )
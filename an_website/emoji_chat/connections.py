@@ -0,0 +1,162 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The registry of the open WebSocket connections of the chat."""
+
+import asyncio
+import logging
+from asyncio import Future
+from collections.abc import Callable, Iterator
+from typing import Any, Final, Protocol
+
+from tornado.websocket import WebSocketClosedError
+
+LOGGER: Final = logging.getLogger(__name__)
+
+
+class Connection(Protocol):
+    """A connection messages can be broadcast to."""
+
+    def close(self, code: None | int = None, reason: None | str = None) -> None:
+        """Close the connection."""
+
+    def write_message(
+        self, message: bytes | str | dict[str, Any], binary: bool = False
+    ) -> Future[None]:
+        """Send a message."""
+
+
+class ConnectionRegistry[C: Connection]:
+    """
+    The open connections of one worker.
+
+    Broadcasts are serialized once and written to every connection without
+    waiting for it. Connections that have too many unsent messages are closed.
+    """
+
+    __slots__ = (
+        "_connections",
+        "_presence_handle",
+        "dropped",
+        "max_pending",
+        "presence_delay",
+        "presence_frame",
+    )
+
+    # connection → count of messages that haven't been written yet
+    _connections: dict[C, int]
+    _presence_handle: None | asyncio.TimerHandle
+    dropped: int
+    max_pending: int
+    presence_delay: float
+    presence_frame: None | Callable[[ConnectionRegistry[C]], None | bytes]
+
+    def __init__(
+        self,
+        *,
+        max_pending: int = 64,
+        presence_delay: float = 0.5,
+        presence_frame: (
+            None | Callable[[ConnectionRegistry[C]], None | bytes]
+        ) = None,
+    ) -> None:
+        """Initialize the empty registry."""
+        self._connections = {}
+        self._presence_handle = None
+        self.dropped = 0
+        self.max_pending = max_pending
+        self.presence_delay = presence_delay
+        self.presence_frame = presence_frame
+
+    def __contains__(self, connection: object) -> bool:
+        """Check whether the connection is open."""
+        return connection in self._connections
+
+    def __iter__(self) -> Iterator[C]:
+        """Iterate over the open connections."""
+        return iter(self._connections)
+
+    def __len__(self) -> int:
+        """Get the count of the open connections."""
+        return len(self._connections)
+
+    def _on_written(self, connection: C, future: Future[None]) -> None:
+        """Count a written message, forget the connection if it failed."""
+        if connection not in self._connections:
+            return
+        if not future.cancelled() and future.exception() is not None:
+            self.remove(connection)
+            return
+        self._connections[connection] -= 1
+
+    def _send_presence(self) -> None:
+        """Broadcast the presence frame."""
+        self._presence_handle = None
+        if self.presence_frame and (frame := self.presence_frame(self)):
+            self.broadcast(frame)
+
+    def add(self, connection: C) -> None:
+        """Add an open connection."""
+        self._connections.setdefault(connection, 0)
+        self.schedule_presence_update()
+
+    def broadcast(self, frame: bytes) -> int:
+        """Send a serialized frame to every connection, return the count."""
+        count = 0
+        for connection in tuple(self._connections):
+            count += self.send(connection, frame)
+        return count
+
+    def pending(self, connection: C) -> int:
+        """Get the count of the messages that haven't been written yet."""
+        return self._connections.get(connection, 0)
+
+    def remove(self, connection: C) -> None:
+        """Remove a closed connection."""
+        if self._connections.pop(connection, None) is not None:
+            self.schedule_presence_update()
+
+    def schedule_presence_update(self) -> None:
+        """Send the presence frame soon, changes until then get coalesced."""
+        if self.presence_frame is None or self._presence_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._presence_handle = loop.call_later(
+            self.presence_delay, self._send_presence
+        )
+
+    def send(self, connection: C, frame: bytes) -> bool:
+        """Send a serialized frame to a connection, drop it if it's too slow."""
+        pending = self._connections.get(connection)
+        if pending is None:
+            return False
+        if pending >= self.max_pending:
+            LOGGER.info("Dropping slow WebSocket connection")
+            self.dropped += 1
+            self.remove(connection)
+            connection.close(1008, "Too slow")
+            return False
+        try:
+            # bytes are sent as text frame if binary is False
+            future = connection.write_message(frame)
+        except WebSocketClosedError:
+            self.remove(connection)
+            return False
+        self._connections[connection] = pending + 1
+        future.add_done_callback(
+            lambda future: self._on_written(connection, future)
+        )
+        return True
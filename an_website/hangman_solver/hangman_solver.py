@@ -13,22 +13,28 @@
 
 """A page that helps solving hangman puzzles."""
 
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass
+from typing import Final
 
 from hangman_solver import (
-    HangmanResult,
     Language,
     UnknownLanguageError,
     read_words_with_length,
-    solve,
-    solve_crossword,
 )
 from tornado.web import HTTPError
+from UltraDict import UltraDict  # type: ignore[import-untyped]
 
 from ..utils.base_request_handler import BaseRequestHandler
 from ..utils.data_parsing import parse_args
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
-from ..utils.utils import ModuleInfo
+from ..utils.utils import LatencyHistogram, ModuleInfo, Timer
+from .solve import MAX_WORDS, SolutionKey, SolutionTuple, solve_uncached
+
+LOGGER: Final = logging.getLogger(__name__)
 
 
 def get_module_info() -> ModuleInfo:
@@ -38,6 +44,7 @@ def get_module_info() -> ModuleInfo:
         handlers=(
             (r"/hangman-loeser", HangmanSolver),
             (r"/api/hangman-loeser", HangmanSolverAPI),
+            (r"/api/hangman-loeser/statistik", HangmanSolverStatsAPI),
             (
                 rf"/hangman-loeser/worte/({languages})/([1-9]\d*).txt",
                 HangmanSolverWords,
@@ -67,20 +74,184 @@ class HangmanArguments:
 
     def get_max_words(self) -> int:
         """Return the maximum number of words."""
-        return max(0, min(100, self.max_words))
+        return max(0, min(MAX_WORDS, self.max_words))
+
+    def get_language(self) -> Language:
+        """Return the language of the word list."""
+        try:
+            return Language.parse_string(self.lang)
+        except UnknownLanguageError as err:
+            raise HTTPError(
+                400, reason=f"{self.lang!r} is an invalid language"
+            ) from err
+
+    def get_solution_key(self) -> SolutionKey:
+        """Return the normalized arguments that change the solution."""
+        return (
+            self.input.lower(),
+            "".join(sorted(set(self.invalid.lower()))),
+            self.get_language().value,
+            self.crossword_mode,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class HangmanSolution:
+    """The solution of a hangman puzzle."""
+
+    input: str
+    invalid: tuple[str, ...]
+    words: tuple[str, ...]
+    matching_words_count: int
+    letter_frequency: tuple[tuple[str, int], ...]
+    language: Language
+
+    @classmethod
+    def from_tuple(
+        cls, solution: SolutionTuple, language: Language, max_words: int
+    ) -> HangmanSolution:
+        """Create a solution from the cached tuple."""
+        input_, invalid, words, matching_words_count, letter_frequency = (
+            solution
+        )
+        return cls(
+            input_,
+            invalid,
+            words[:max_words],
+            matching_words_count,
+            letter_frequency,
+            language,
+        )
+
+
+class HangmanSolutionCache:
+    """A bounded cache of solutions shared between the worker processes."""
+
+    __slots__ = ("hits", "misses", "shared", "size")
+
+    hits: int
+    misses: int
+    shared: UltraDict
+    size: int
+
+    def __init__(self, size: int = 4096) -> None:
+        """Initialize the cache."""
+        self.hits = 0
+        self.misses = 0
+        self.shared = UltraDict(buffer_size=16 * 1024**2)
+        self.size = size
+
+    def get(self, key: SolutionKey) -> None | SolutionTuple:
+        """Get a cached solution."""
+        solution: None | SolutionTuple = self.shared.get(key)
+        if solution is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return solution
+
+    def put(self, key: SolutionKey, solution: SolutionTuple) -> None:
+        """Put a solution into the cache and evict the oldest ones."""
+        with self.shared.lock:
+            self.shared[key] = solution
+            # evict with some headroom to not do it again on the next put
+            if (excess := len(self.shared) - self.size) > 0:
+                for old_key in list(self.shared)[: excess + self.size // 10]:
+                    del self.shared[old_key]
+
+
+class HangmanSolverPool:
+    """Solve hangman puzzles in worker processes, not in the event loop."""
 
+    __slots__ = ("_executor", "max_queued", "pending", "size")
 
-def solve_hangman(data: HangmanArguments) -> HangmanResult:
-    """Generate a hangman object based on the input and return it."""
-    try:
-        lang = Language.parse_string(data.lang)
-    except UnknownLanguageError as err:
-        raise HTTPError(
-            400, reason=f"{data.lang!r} is an invalid language"
-        ) from err
+    _executor: None | Executor
+    max_queued: int
+    pending: int
+    size: int
 
-    return (solve_crossword if data.crossword_mode else solve)(
-        data.input, data.invalid, lang, data.get_max_words()
+    def __init__(self, size: int = 2, max_queued: int = 16) -> None:
+        """Initialize the pool, the processes get started when needed."""
+        self._executor = None
+        self.max_queued = max_queued
+        self.pending = 0
+        self.size = size
+
+    def configure(self, size: int, max_queued: int) -> None:
+        """Change the size of the pool, running solves still finish."""
+        if (size, max_queued) == (self.size, self.max_queued):
+            return
+        self.shutdown(wait=False)
+        self.size = size
+        self.max_queued = max_queued
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the processes, they get started again when needed."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    async def solve(self, key: SolutionKey) -> SolutionTuple:
+        """Solve a hangman puzzle, fail if too many are waiting."""
+        if self.size <= 0:
+            return solve_uncached(key)
+        if self.pending >= self.size + self.max_queued:
+            raise HTTPError(503, reason="Too many hangman puzzles to solve")
+        if self._executor is None:
+            # fork the processes from a server process that only imported the
+            # solve module, so they don't inherit the shared caches of the
+            # website (main() makes sure they don't import the main module)
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([solve_uncached.__module__])
+            self._executor = ProcessPoolExecutor(self.size, mp_context=context)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, solve_uncached, key
+            )
+        finally:
+            self.pending -= 1
+
+
+SOLUTION_CACHE: Final = HangmanSolutionCache()
+SOLVER_POOL: Final = HangmanSolverPool()
+SOLVE_LATENCY: Final = LatencyHistogram()
+
+
+def solve_hangman(data: HangmanArguments) -> HangmanSolution:
+    """Solve a hangman puzzle in this thread and return the solution."""
+    key = data.get_solution_key()
+    if (solution := SOLUTION_CACHE.get(key)) is None:
+        solution = solve_uncached(key)
+        SOLUTION_CACHE.put(key, solution)
+    return HangmanSolution.from_tuple(
+        solution, data.get_language(), data.get_max_words()
+    )
+
+
+async def solve_hangman_async(
+    data: HangmanArguments,
+    pool: HangmanSolverPool = SOLVER_POOL,
+    cache: HangmanSolutionCache = SOLUTION_CACHE,
+) -> tuple[HangmanSolution, float]:
+    """
+    Solve a hangman puzzle without blocking the event loop.
+
+    Return the solution and the time it took to get it in seconds.
+    """
+    key = data.get_solution_key()
+    timer = Timer()
+    if (solution := cache.get(key)) is None:
+        solution = await pool.solve(key)
+        cache.put(key, solution)
+        SOLVE_LATENCY.observe(timer.stop())
+    else:
+        timer.stop()
+    return (
+        HangmanSolution.from_tuple(
+            solution, data.get_language(), data.get_max_words()
+        ),
+        timer.get(),
     )
 
 
@@ -97,10 +268,16 @@ class HangmanSolver(HTMLRequestHandler):
 
         await self.render(
             "pages/hangman_solver.html",
-            hangman_result=solve_hangman(data),
+            hangman_result=await self.solve(data),
             data=data,
         )
 
+    async def solve(self, data: HangmanArguments) -> HangmanSolution:
+        """Solve the hangman puzzle and add the Server-Timing header."""
+        solution, duration = await solve_hangman_async(data)
+        self.set_header("Server-Timing", f"solve;dur={duration * 1000:.3f}")
+        return solution
+
 
 class HangmanSolverAPI(APIRequestHandler, HangmanSolver):
     """Request handler for the hangman solver API."""
@@ -112,7 +289,7 @@ class HangmanSolverAPI(APIRequestHandler, HangmanSolver):
         """Handle GET requests to the hangman solver API."""
         if head:
             return
-        hangman_result = solve_hangman(data)
+        hangman_result = await self.solve(data)
         await self.finish(
             {
                 "input": hangman_result.input,
@@ -127,6 +304,24 @@ class HangmanSolverAPI(APIRequestHandler, HangmanSolver):
         )
 
 
+class HangmanSolverStatsAPI(APIRequestHandler):
+    """Request handler for the statistics of the hangman solver."""
+
+    async def get(self, *, head: bool = False) -> None:
+        """Handle GET requests to the statistics API."""
+        if head:
+            return
+        await self.finish_dict(
+            cache_hits=SOLUTION_CACHE.hits,
+            cache_misses=SOLUTION_CACHE.misses,
+            cache_size=len(SOLUTION_CACHE.shared),
+            pending=SOLVER_POOL.pending,
+            latency=SOLVE_LATENCY.to_dict(),
+            p50=SOLVE_LATENCY.quantile(0.5),
+            p99=SOLVE_LATENCY.quantile(0.99),
+        )
+
+
 class HangmanSolverWords(BaseRequestHandler):
     """Request handler for the hangman word lists."""
 
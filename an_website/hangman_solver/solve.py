@@ -0,0 +1,48 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Solve hangman puzzles without the rest of the website.
+
+This module is imported by the processes of the solver pool, so it must not
+import anything that sets up the website (like the shared caches).
+"""
+
+from typing import Final
+
+from hangman_solver import HangmanResult, Language, solve, solve_crossword
+
+# solve for the most words that can be shown, so the results can be cached
+# independently of the requested word count
+MAX_WORDS: Final[int] = 100
+
+type SolutionKey = tuple[str, str, str, bool]
+type SolutionTuple = tuple[
+    str, tuple[str, ...], tuple[str, ...], int, tuple[tuple[str, int], ...]
+]
+
+
+def solve_uncached(key: SolutionKey) -> SolutionTuple:
+    """Solve a hangman puzzle with the word list of the language."""
+    input_, invalid, lang, crossword_mode = key
+    result: HangmanResult = (solve_crossword if crossword_mode else solve)(
+        input_, invalid, Language.parse_string(lang), MAX_WORDS
+    )
+    return (
+        result.input,
+        tuple(result.invalid),
+        tuple(result.words),
+        result.matching_words_count,
+        tuple(result.letter_frequency),
+    )
@@ -13,14 +13,41 @@
 
 """The module for the wordgame solver."""
 
-from collections.abc import Collection
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+from collections import defaultdict
+from collections.abc import Collection, Iterable
+from functools import cache
+from importlib.metadata import PackageNotFoundError, version
+from itertools import chain
+from pathlib import Path
+from typing import Final
 
+import orjson as json
 from hangman_solver import Language, read_words_with_length
 from typed_stream import Stream
 
+from .. import CACHE_DIR, pytest_is_running
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
 from ..utils.utils import ModuleInfo, bounded_edit_distance
 
+LOGGER: Final = logging.getLogger(__name__)
+
+WORDLISTS_VERSION: str
+try:
+    WORDLISTS_VERSION = version("hangman-solver-rs")
+except PackageNotFoundError:
+    WORDLISTS_VERSION = "unknown"
+
+INDEX_DIR: Final[None | Path] = (
+    None if pytest_is_running() else CACHE_DIR / "wordgame-index"
+)
+# the longest words are searched up to this length
+WORD_LENGTH_LIMIT: Final[int] = 256
+
 
 def get_module_info() -> ModuleInfo:
     """Create and return the ModuleInfo for this module."""
@@ -40,29 +67,157 @@ def get_module_info() -> ModuleInfo:
     )
 
 
-def find_solutions(word: str, ignore: Collection[str]) -> Stream[str]:
+class DeletionIndex:
+    """
+    Index of the words with one length.
+
+    Every word can be found by itself and by the strings that are created by
+    removing one of its letters.
+    """
+
+    __slots__ = ("neighbourhoods",)
+
+    # key → words separated by spaces, that's a lot more compact than tuples
+    neighbourhoods: dict[str, str]
+
+    def __init__(self, neighbourhoods: dict[str, str]) -> None:
+        """Initialize the index."""
+        self.neighbourhoods = neighbourhoods
+
+    @classmethod
+    def build(cls, words: Iterable[str]) -> DeletionIndex:
+        """Build the index from words of the same length."""
+        neighbourhoods: defaultdict[str, list[str]] = defaultdict(list)
+        for word in words:
+            neighbourhoods[word].append(word)
+            for deletion in get_deletions(word):
+                neighbourhoods[deletion].append(word)
+        return cls({key: " ".join(val) for key, val in neighbourhoods.items()})
+
+    @classmethod
+    def load_or_build(
+        cls, language: Language, length: int, directory: None | Path
+    ) -> DeletionIndex:
+        """Load the index from the directory or build and save it there."""
+        if length < 1:
+            return cls({})
+        path = (
+            directory / f"{language.value}-{length}-{WORDLISTS_VERSION}.json"
+            if directory
+            else None
+        )
+        if path:
+            with contextlib.suppress(FileNotFoundError, json.JSONDecodeError):
+                return cls(json.loads(path.read_bytes()))
+        if not (words := tuple(read_words_with_length(language, length))):
+            # don't save the indices of lengths without words
+            return cls({})
+        index = cls.build(words)
+        if path:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                temp_path.write_bytes(json.dumps(index.neighbourhoods))
+                os.replace(temp_path, path)
+            except OSError:
+                LOGGER.exception("Failed to save the index to %s", path)
+        return index
+
+    def lookup(self, key: str) -> list[str]:
+        """Get the words that can be found with the key."""
+        if words := self.neighbourhoods.get(key):
+            return words.split(" ")
+        return []
+
+
+def find_solutions(
+    word: str,
+    ignore: Collection[str],
+    language: Language = Language.DeBasicUmlauts,
+) -> Stream[str]:
     """Find words that have only one different letter."""
     word_len = len(word)
     ignore = {*ignore, word}
+    deletions = get_deletions(word)
+
+    shorter = get_index(language, word_len - 1)
+    same_length = get_index(language, word_len)
+
+    candidates = chain(
+        # words with one letter less
+        (found for deleted in deletions for found in shorter.lookup(deleted)),
+        # words with one different letter
+        (
+            found
+            for deleted in deletions
+            for found in same_length.lookup(deleted)
+        ),
+        # words with one letter more
+        get_index(language, word_len + 1).lookup(word),
+    )
 
     return (
-        Stream((word_len - 1, word_len, word_len + 1))
-        .flat_map(
-            lambda length: read_words_with_length(
-                Language.DeBasicUmlauts, length
-            )
-        )
+        Stream(dict.fromkeys(candidates))
         .exclude(ignore.__contains__)
         .filter(
-            lambda test_word: bounded_edit_distance(word, test_word, 2) == 1
+            # words with the same length could also have swapped letters
+            lambda test_word: bounded_edit_distance(word, test_word, 2)
+            == 1
         )
     )
 
 
+def get_deletions(word: str) -> set[str]:
+    """Get the strings that are created by removing one letter of the word."""
+    return {word[:i] + word[i + 1 :] for i in range(len(word))}
+
+
+def get_index(language: Language, length: int) -> DeletionIndex:
+    """
+    Get the index of the words with the length.
+
+    The indices are cached for every length that words exist with, building
+    or loading an index blocks, so this should be run in a thread.
+    """
+    if not 0 < length <= get_max_word_length(language.value):
+        return EMPTY_INDEX
+    key = (language.value, length)
+    if (index := INDICES.get(key)) is None:
+        with INDICES_LOCK:  # don't build the same index in multiple threads
+            if (index := INDICES.get(key)) is None:
+                index = INDICES[key] = DeletionIndex.load_or_build(
+                    language, length, INDEX_DIR
+                )
+    return index
+
+
+@cache
+def get_max_word_length(language: str) -> int:
+    """Get the length of the longest words, cached by language name."""
+    parsed = Language.parse_string(language)
+    return max(
+        (
+            length
+            for length in range(1, WORD_LENGTH_LIMIT + 1)
+            if next(iter(read_words_with_length(parsed, length)), None)
+        ),
+        default=0,
+    )
+
+
+EMPTY_INDEX: Final = DeletionIndex({})
+INDICES: Final[dict[tuple[str, int], DeletionIndex]] = {}
+INDICES_LOCK: Final = threading.Lock()
+
+
 def get_ranked_solutions(
     word: str, before: Collection[str] = ()
 ) -> list[tuple[int, str]]:
-    """Find solutions for the word and rank them."""
+    """
+    Find solutions for the word and rank them.
+
+    This blocks (see get_index), so it should be run in a thread.
+    """
     if not word:
         return []
     before_with_word = {*before, word}
@@ -92,7 +247,7 @@ class WordgameSolver(HTMLRequestHandler):
         await self.render(
             "pages/wordgame_solver.html",
             word=word,
-            words=get_ranked_solutions(word, before),
+            words=await asyncio.to_thread(get_ranked_solutions, word, before),
             before=", ".join(before),
             new_before=", ".join(new_before),
         )
@@ -114,5 +269,7 @@ class WordgameSolverAPI(APIRequestHandler):
         return await self.finish_dict(
             before=before,
             word=word,
-            solutions=get_ranked_solutions(word, before),
+            solutions=await asyncio.to_thread(
+                get_ranked_solutions, word, before
+            ),
         )
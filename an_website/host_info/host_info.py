@@ -17,20 +17,34 @@ The host info page of the website.
 Only to inform, not to brag.
 """
 
+import asyncio
+import logging
 import shutil
+import struct
 import sys
-from collections.abc import Mapping
-from ctypes import c_char
-from multiprocessing import Array
-from typing import Final
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from ctypes import c_char, c_double
+from dataclasses import dataclass
+from multiprocessing import Array, Value
+from multiprocessing.sharedctypes import Synchronized, SynchronizedArray
+from typing import Final, Self
 
 import regex
-from tornado.web import HTTPError as HTTPEwwow
-
-from .. import CONTAINERIZED, DIR as ROOT_DIR, NAME, traversable_to_file
+from tornado.web import Application, HTTPError as HTTPEwwow
+
+from .. import (
+    CONTAINERIZED,
+    DIR as ROOT_DIR,
+    EVENT_SHUTDOWN,
+    NAME,
+    traversable_to_file,
+)
 from ..utils.request_handler import HTMLRequestHandler
 from ..utils.utils import ModuleInfo, PageInfo, run
 
+LOGGER: Final = logging.getLogger(__name__)
+
 SCREENFETCH: Final = (
     shutil.which("bash") or "bash",
     traversable_to_file(ROOT_DIR / "vendored" / "screenfetch").as_posix(),
@@ -43,6 +57,13 @@ ENV: Final[Mapping[str, str]] = {
     ),
 }
 
+# created at, return code and count of the parts
+SNAPSHOT_HEADER: Final = struct.Struct("!dqI")
+PART_HEADER: Final = struct.Struct("!I")
+
+# the programs run by this worker at the same time
+SUBPROCESSES: Final = asyncio.Semaphore(1)
+
 
 def get_module_info() -> ModuleInfo:
     """Create and return the ModuleInfo for this module."""
@@ -70,6 +91,7 @@ def get_module_info() -> ModuleInfo:
         ),
         keywords=("Host", "Informationen", "Screenfetch"),
         hidden=CONTAINERIZED,
+        required_background_tasks=(refresh_snapshots,),
     )
 
 
@@ -80,29 +102,200 @@ def minify_ansi_art(string: bytes) -> bytes:
     )  # for arch: 1059 → 898
 
 
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """The output of a program at one point in time."""
+
+    created_at: float
+    return_code: int
+    parts: tuple[bytes, ...]
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> None | Self:
+        """Read a snapshot, return None if there is none."""
+        created_at, return_code, count = SNAPSHOT_HEADER.unpack_from(data)
+        if not created_at:
+            return None
+        offset = SNAPSHOT_HEADER.size
+        parts: list[bytes] = []
+        for _ in range(count):
+            (length,) = PART_HEADER.unpack_from(data, offset)
+            offset += PART_HEADER.size
+            parts.append(data[offset : offset + length])
+            offset += length
+        return cls(created_at, return_code, tuple(parts))
+
+    def get_age(self) -> float:
+        """Get the age of the snapshot in seconds."""
+        return max(0.0, time.time() - self.created_at)
+
+    def to_bytes(self) -> bytes:
+        """Write the snapshot as bytes."""
+        return b"".join(
+            (
+                SNAPSHOT_HEADER.pack(
+                    self.created_at, self.return_code, len(self.parts)
+                ),
+                *(PART_HEADER.pack(len(part)) + part for part in self.parts),
+            )
+        )
+
+
+class SnapshotProvider:
+    """
+    The latest snapshot of the output of a program, shared by the workers.
+
+    One of the workers refreshes the snapshot every interval seconds in the
+    background. Requests are answered with the latest snapshot, the program is
+    only run for a request if there is no snapshot yet.
+    """
+
+    __slots__ = (
+        "_claimed_at",
+        "_latest",
+        "_refresh",
+        "_shared",
+        "create",
+        "interval",
+    )
+
+    # pylint: disable-next=unsubscriptable-object
+    _claimed_at: Synchronized[float]
+    # the snapshot last read or created by this worker
+    _latest: None | Snapshot
+    _refresh: None | asyncio.Task[Snapshot]
+    # pylint: disable-next=unsubscriptable-object
+    _shared: SynchronizedArray[bytes]
+    create: Callable[[], Awaitable[Snapshot]]
+    interval: float
+
+    def __init__(
+        self,
+        create: Callable[[], Awaitable[Snapshot]],
+        *,
+        interval: float = 60,
+        size: int = 1024**2,
+    ) -> None:
+        """Initialize the provider without a snapshot."""
+        self._claimed_at = Value(c_double, 0)
+        self._latest = None
+        self._refresh = None
+        self._shared = Array(c_char, size)
+        self.create = create
+        self.interval = interval
+
+    async def _create(self) -> Snapshot:
+        """Run the program and share the snapshot with the other workers."""
+        async with SUBPROCESSES:
+            snapshot = await self.create()
+        data = snapshot.to_bytes()
+        if len(data) > len(self._shared):
+            LOGGER.error(
+                "Not sharing the snapshot, it is too big (%d bytes)", len(data)
+            )
+        else:
+            with self._shared.get_lock():
+                self._shared[: len(data)] = data
+        self._latest = snapshot
+        return snapshot
+
+    def _forget_refresh(self, task: asyncio.Task[Snapshot]) -> None:
+        """Forget the finished task refreshing the snapshot."""
+        if self._refresh is task:
+            self._refresh = None
+
+    def claim(self) -> bool:
+        """Claim the next refresh, return False if it isn't due yet."""
+        now = time.time()
+        with self._claimed_at.get_lock():
+            if now - self._claimed_at.value < self.interval:
+                return False
+            self._claimed_at.value = now
+        return True
+
+    async def get(self) -> Snapshot:
+        """Get the latest snapshot, create one if there is none yet."""
+        if (snapshot := self.get_latest()) is not None:
+            return snapshot
+        return await self.refresh()
+
+    def get_latest(self) -> None | Snapshot:
+        """Get the latest snapshot of all workers."""
+        with self._shared.get_lock():
+            created_at = SNAPSHOT_HEADER.unpack(
+                self._shared[: SNAPSHOT_HEADER.size]
+            )[0]
+            if self._latest and self._latest.created_at == created_at:
+                return self._latest
+            self._latest = Snapshot.from_bytes(self._shared.raw)
+        return self._latest
+
+    async def refresh(self) -> Snapshot:
+        """Run the program (only once at a time in every worker)."""
+        if not (task := self._refresh):
+            task = asyncio.create_task(self._create())
+            self._refresh = task
+            task.add_done_callback(self._forget_refresh)
+        return await asyncio.shield(task)
+
+
+async def create_screenfetch_snapshot() -> Snapshot:
+    """Run screenFetch and create a snapshot of the logo and the output."""
+    logo = minify_ansi_art((await run(*SCREENFETCH, "-L"))[1])
+    return_code, output, _ = await run(*SCREENFETCH, "-n", env=ENV)
+    return Snapshot(
+        time.time(), -1 if return_code is None else return_code, (logo, output)
+    )
+
+
+async def create_uwufetch_snapshot() -> Snapshot:
+    """Wun UwUFetch and cweate a snapshot of the output."""
+    if not UWUFETCH_PATH:
+        return Snapshot(time.time(), 127, ())
+    return_code, output, _ = await run(
+        UWUFETCH_PATH, "-w", env={"UWUFETCH_CACHE_ENABLED": "0", **ENV}
+    )
+    return Snapshot(
+        time.time(), -1 if return_code is None else return_code, (output,)
+    )
+
+
+SCREENFETCH_SNAPSHOT: Final = SnapshotProvider(create_screenfetch_snapshot)
+UWUFETCH_SNAPSHOT: Final = SnapshotProvider(create_uwufetch_snapshot)
+
+
+async def refresh_snapshots(*, app: Application, worker: int | None) -> None:
+    """Refresh the snapshots of the host info when they are due."""
+    # pylint: disable=unused-argument
+    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
+        for provider in (SCREENFETCH_SNAPSHOT, UWUFETCH_SNAPSHOT):
+            if not provider.claim():
+                continue
+            try:
+                await provider.refresh()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Refreshing the host info failed")
+        await asyncio.sleep(1)
+
+
 class HostInfo(HTMLRequestHandler):
     """The request handler for the host info page."""
 
     RATELIMIT_GET_LIMIT = 1
 
-    SCREENFETCH_CACHE = Array(c_char, 1024**2)
-
     async def get(self, *, head: bool = False) -> None:
         """
         Handle GET requests to the host info page.
 
-        Use screenFetch to generate the page.
+        Use the latest snapshot of the output of screenFetch.
         """
+        snapshot = await SCREENFETCH_SNAPSHOT.get()
+        self.set_header("Age", str(int(snapshot.get_age())))
+
         if head:
             return
 
-        logo = self.SCREENFETCH_CACHE.value
-
-        if not logo:
-            logo = minify_ansi_art((await run(*SCREENFETCH, "-L"))[1])
-            self.SCREENFETCH_CACHE.value = logo
-
-        screenfetch_bytes = (await run(*SCREENFETCH, "-n", env=ENV))[1]
+        logo, screenfetch_bytes = snapshot.parts
 
         if self.content_type == "text/plain":
             return await self.finish(logo + b"\n\n" + screenfetch_bytes)
@@ -127,20 +320,10 @@ class UwUHostInfo(HTMLRequestHandler):
         """
         Handwe the GET wequests to coowew the host info page.
 
-        Use UwUFetch to genyewate the page.
+        Use the watest snapshot of the output of UwUFetch.
         """
-        cache_enabwed = int(
-            head or not self.get_bool_argument("cache_disabled", False)
-        )
-
-        if UWUFETCH_PATH:
-            wetuwn_code, uwufetch_bytes, _ = await run(
-                UWUFETCH_PATH,
-                "-w",
-                env={"UWUFETCH_CACHE_ENABLED": str(cache_enabwed), **ENV},
-            )
-        else:
-            wetuwn_code, uwufetch_bytes = 127, b""
+        snapshot = await UWUFETCH_SNAPSHOT.get()
+        wetuwn_code = snapshot.return_code
 
         if wetuwn_code == 127:
             raise HTTPEwwow(
@@ -154,9 +337,13 @@ class UwUHostInfo(HTMLRequestHandler):
                 reason=f"UwUFetch has exited with wetuwn code {wetuwn_code}",
             )
 
+        self.set_header("Age", str(int(snapshot.get_age())))
+
         if head:
             return
 
+        (uwufetch_bytes,) = snapshot.parts
+
         if self.content_type == "text/plain":
             return await self.finish(uwufetch_bytes)
 
@@ -66,6 +66,7 @@ from typed_stream import Stream
 from . import (
     CA_BUNDLE_PATH,
     DIR,
+    EVENT_ELASTICSEARCH,
     EVENT_SHUTDOWN,
     NAME,
     TEMPLATES_DIR,
@@ -74,22 +75,25 @@ from . import (
     pytest_is_running,
 )
 from .contact.contact import apply_contact_stuff_to_app
+from .reporting.ingest import ReportQueue
 from .utils import background_tasks, static_file_handling
 from .utils.base_request_handler import BaseRequestHandler, request_ctx_var
 from .utils.better_config_parser import BetterConfigParser
 from .utils.elasticsearch_setup import setup_elasticsearch
+from .utils.header_sets import HeaderSetCache
 from .utils.logging import WebhookFormatter, WebhookHandler
+from .utils.path_suggestions import PathSuggestions
 from .utils.request_handler import NotFoundHandler
 from .utils.static_file_from_traversable import TraversableStaticFileHandler
 from .utils.template_loader import TemplateLoader
 from .utils.utils import (
+    GEOIP_CACHE,
     ArgparseNamespace,
     Handler,
     ModuleInfo,
     Permission,
     Timer,
     create_argument_parser,
-    geoip,
     get_arguments_without_help,
     time_function,
 )
@@ -309,6 +313,7 @@ def get_all_handlers(module_infos: Iterable[ModuleInfo]) -> list[Handler]:
             {
                 "root": Path(".well-known"),
                 "headers": (("Access-Control-Allow-Origin", "*"),),
+                "immutable": False,  # e.g. ACME challenges
             },
         )
     )
@@ -373,6 +378,7 @@ def make_app(config: ConfigParser) -> str | Application:
             duration,
         )
     handlers = get_all_handlers(module_infos)
+    normed_paths = get_normed_paths_from_module_infos(module_infos)
     return Application(
         handlers,
         MODULE_INFOS=module_infos,
@@ -380,7 +386,10 @@ def make_app(config: ConfigParser) -> str | Application:
         .exclude(lambda info: info.hidden)
         .filter(lambda info: info.path)
         .empty(),
-        NORMED_PATHS=get_normed_paths_from_module_infos(module_infos),
+        NORMED_PATHS=normed_paths,
+        PATH_SUGGESTIONS=PathSuggestions(normed_paths),
+        HEADER_SETS=HeaderSetCache(),
+        REPORT_QUEUE=ReportQueue(),
         HANDLERS=handlers,
         # General settings
         autoreload=False,
@@ -436,6 +445,31 @@ def apply_config_to_app(app: Application, config: BetterConfigParser) -> None:
 
     app.settings["REDIS_PREFIX"] = config.get("REDIS", "PREFIX", fallback=NAME)
 
+    app.settings["GEOIP_DATABASE_DIR"] = (
+        Path(database_dir)
+        if (database_dir := config.get("GEOIP", "DATABASE_DIR", fallback=None))
+        else None
+    )
+
+    app.settings["HANGMAN_SOLVER_POOL_SIZE"] = config.getint(
+        "HANGMAN_SOLVER", "POOL_SIZE", fallback=2
+    )
+    app.settings["HANGMAN_SOLVER_MAX_QUEUED"] = config.getint(
+        "HANGMAN_SOLVER", "MAX_QUEUED", fallback=16
+    )
+    if "an_website.hangman_solver.hangman_solver" in sys.modules:
+        # pylint: disable-next=import-outside-toplevel
+        from .hangman_solver.hangman_solver import SOLVER_POOL
+
+        SOLVER_POOL.configure(
+            app.settings["HANGMAN_SOLVER_POOL_SIZE"],
+            app.settings["HANGMAN_SOLVER_MAX_QUEUED"],
+        )
+
+    app.settings["QUOTE_IMAGE_CACHE_ON_DISK"] = config.getboolean(
+        "QUOTES", "IMAGE_CACHE_ON_DISK", fallback=False
+    )
+
     app.settings["REPORTING"] = config.getboolean(
         "REPORTING", "ENABLED", fallback=True
     )
@@ -488,6 +522,10 @@ def apply_config_to_app(app: Application, config: BetterConfigParser) -> None:
 
     apply_contact_stuff_to_app(app, config)
 
+    # the default headers depend on the settings
+    if (header_sets := app.settings.get("HEADER_SETS")) is not None:
+        header_sets.invalidate()
+
 
 def get_ssl_context(  # pragma: no cover
     config: ConfigParser,
@@ -729,6 +767,9 @@ def setup_apm(app: Application) -> None:  # pragma: no cover
     if app.settings["ELASTIC_APM"]["ENABLED"]:
         app.settings["ELASTIC_APM"]["CLIENT"] = ElasticAPM(app).client
 
+    if (header_sets := app.settings.get("HEADER_SETS")) is not None:
+        header_sets.invalidate()
+
 
 def setup_app_search(app: Application) -> None:  # pragma: no cover
     """Setup Elastic App Search."""  # noqa: D401
@@ -935,6 +976,15 @@ def main(  # noqa: C901  # pragma: no cover
 
     setproctitle(NAME)
 
+    if (
+        getattr(sys.modules["__main__"], "__spec__", None) is None
+        and f"{__package__}.__main__" in sys.modules
+    ):
+        # started through the console script, make the package the main
+        # module, so that multiprocessing doesn't run the script (and import
+        # all of the website) again in the processes it starts
+        sys.modules["__main__"] = sys.modules[f"{__package__}.__main__"]
+
     install_signal_handler()
 
     parser = create_argument_parser()
@@ -1089,7 +1139,19 @@ def main(  # noqa: C901  # pragma: no cover
             del AUTHORS_CACHE.control.created_by_ultra  # type: ignore[attr-defined]
             del QUOTES_CACHE.control.created_by_ultra  # type: ignore[attr-defined]
             del WRONG_QUOTES_CACHE.control.created_by_ultra  # type: ignore[attr-defined]
-        del (geoip.__kwdefaults__ or {})["caches"].control.created_by_ultra
+        if "an_website.quotes.image" in sys.modules:
+            from .quotes.image import (  # pylint: disable=import-outside-toplevel
+                IMAGE_CACHE,
+            )
+
+            del IMAGE_CACHE.images.control.created_by_ultra  # type: ignore[attr-defined]
+            del IMAGE_CACHE.last_used.control.created_by_ultra  # type: ignore[attr-defined]
+        if "an_website.hangman_solver.hangman_solver" in sys.modules:
+            # pylint: disable-next=import-outside-toplevel
+            from .hangman_solver.hangman_solver import SOLUTION_CACHE
+
+            del SOLUTION_CACHE.shared.control.created_by_ultra  # type: ignore[attr-defined]
+        del GEOIP_CACHE.shared.control.created_by_ultra  # type: ignore[attr-defined]
 
         if unix_socket_path:
             sockets.append(
@@ -1155,6 +1217,12 @@ def main(  # noqa: C901  # pragma: no cover
                     redis.aclose(close_connection_pool=True)
                 )
             if elasticsearch := app.settings.get("ELASTICSEARCH"):
+                report_queue = app.settings.get("REPORT_QUEUE")
+                if report_queue and EVENT_ELASTICSEARCH.is_set():
+                    prefix = app.settings.get("ELASTICSEARCH_PREFIX", NAME)
+                    loop.run_until_complete(
+                        report_queue.flush(elasticsearch, f"{prefix}-reports")
+                    )
                 loop.run_until_complete(elasticsearch.close())
         finally:
             try:
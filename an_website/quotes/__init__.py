@@ -16,6 +16,7 @@
 from tornado.web import RedirectHandler
 
 from ..utils.utils import ModuleInfo, PageInfo
+from .cache import update_cache_periodically
 from .create import CreatePage1, CreatePage2
 from .generator import QuoteGenerator, QuoteGeneratorAPI
 from .image import QuoteAsImage
@@ -27,7 +28,7 @@ from .quote_of_the_day import (
 )
 from .quotes import QuoteAPIHandler, QuoteById, QuoteMainPage, QuoteRedirectAPI
 from .share import ShareQuote
-from .utils import update_cache_periodically
+from .utils import flush_votes_periodically
 
 
 def get_module_info() -> ModuleInfo:
@@ -164,5 +165,7 @@ def get_module_info() -> ModuleInfo:
             "falsche Zitate",
             "falsch zugeordnete Zitate",
         ),
-        required_background_tasks=frozenset({update_cache_periodically}),
+        required_background_tasks=frozenset(
+            {flush_votes_periodically, update_cache_periodically}
+        ),
     )
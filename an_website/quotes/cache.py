@@ -0,0 +1,367 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Update the caches of the quotes, authors and wrong quotes."""
+
+import asyncio
+import contextlib
+import logging
+import sys
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any, Final, cast
+
+import elasticapm
+import orjson as json
+import typed_stream
+from redis.asyncio import Redis
+from tornado.web import Application
+
+from .. import EVENT_REDIS, EVENT_SHUTDOWN, NAME, ORJSON_OPTIONS
+from ..utils.utils import ModuleInfo
+from .utils import (
+    AUTHORS_CACHE,
+    QUOTES_CACHE,
+    WRONG_QUOTES_CACHE,
+    WRONG_QUOTES_INDEX,
+    Author,
+    Quote,
+    QuotesObjBase,
+    WrongQuote,
+    add_pending_votes,
+    get_pending_votes,
+    make_api_request,
+    parse_author,
+    parse_quote,
+    parse_wrong_quote,
+)
+
+LOGGER: Final = logging.getLogger(__name__)
+
+
+async def parse_list_of_quote_data[Q: QuotesObjBase](  # noqa: D103
+    json_list: str | Iterable[Mapping[str, Any]],
+    parse_fun: Callable[[Mapping[str, Any]], Q],
+) -> tuple[Q, ...]:
+    """Parse a list of quote data."""
+    if not json_list:
+        return ()
+    if isinstance(json_list, str):
+        json_list = cast(list[dict[str, Any]], json.loads(json_list))
+    json_list = list(json_list)
+    return_list: list[Q] = []
+    for start in range(0, len(json_list), 100):
+        # don't invalidate the index for every parsed entry
+        with WRONG_QUOTES_INDEX.batch_update():
+            return_list.extend(
+                parse_fun(json_data)
+                for json_data in json_list[start : start + 100]
+            )
+        await asyncio.sleep(0)
+    return tuple(return_list)
+
+
+async def update_cache_periodically(
+    app: Application, worker: int | None
+) -> None:
+    """Start updating the cache every hour."""
+    # pylint: disable=too-complex, too-many-branches
+    if "/troet" in typed_stream.Stream(
+        cast(Iterable[ModuleInfo], app.settings.get("MODULE_INFOS", ()))
+    ).map(lambda m: m.path):
+        app.settings["SHOW_SHARING_ON_MASTODON"] = True
+    if worker:
+        return
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(EVENT_REDIS.wait(), 5)
+    redis: Redis[str] = cast("Redis[str]", app.settings.get("REDIS"))
+    prefix: str = app.settings.get("REDIS_PREFIX", NAME).removesuffix("-dev")
+    apm: None | elasticapm.Client
+    if EVENT_REDIS.is_set():  # pylint: disable=too-many-nested-blocks
+        pending_votes = await get_pending_votes(
+            redis, app.settings.get("REDIS_PREFIX", NAME)
+        )
+        await parse_list_of_quote_data(
+            await redis.get(f"{prefix}:cached-quote-data:authors"),  # type: ignore[arg-type]  # noqa: B950
+            parse_author,
+        )
+        await parse_list_of_quote_data(
+            await redis.get(f"{prefix}:cached-quote-data:quotes"),  # type: ignore[arg-type]  # noqa: B950
+            parse_quote,
+        )
+        await parse_list_of_quote_data(
+            await redis.get(f"{prefix}:cached-quote-data:wrongquotes"),  # type: ignore[arg-type]  # noqa: B950
+            lambda data: parse_wrong_quote(
+                add_pending_votes(data, pending_votes)
+            ),
+        )
+        if QUOTES_CACHE and AUTHORS_CACHE and WRONG_QUOTES_CACHE:
+            last_update = await redis.get(
+                f"{prefix}:cached-quote-data:last-update"
+            )
+            if last_update:
+                last_update_int = int(last_update)
+                since_last_update = int(time.time()) - last_update_int
+                if 0 <= since_last_update < 60 * 60:
+                    # wait until the last update is at least one hour old
+                    update_cache_in = 60 * 60 - since_last_update
+                    if not sys.flags.dev_mode and update_cache_in > 60:
+                        # if in production mode update wrong quotes just to be sure
+                        try:
+                            await update_cache(
+                                app, update_quotes=False, update_authors=False
+                            )
+                        except Exception:  # pylint: disable=broad-except
+                            LOGGER.exception("Updating quotes cache failed")
+                            apm = app.settings.get("ELASTIC_APM", {}).get(
+                                "CLIENT"
+                            )
+                            if apm:
+                                apm.capture_exception()
+                        else:
+                            LOGGER.info("Updated quotes cache successfully")
+                    LOGGER.info(
+                        "Next update of quotes cache in %d seconds",
+                        update_cache_in,
+                    )
+                    await asyncio.sleep(update_cache_in)
+
+    # update the cache every hour and parse everything once a day
+    failed = updates = 0
+    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
+        updates += 1
+        try:
+            await update_cache(app, full=not updates % 24)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Updating quotes cache failed")
+            if apm := app.settings.get("ELASTIC_APM", {}).get("CLIENT"):
+                apm.capture_exception()
+            failed += 1
+            await asyncio.sleep(pow(min(failed * 2, 60), 2))  # 4,16,...,60*60
+        else:
+            LOGGER.info("Updated quotes cache successfully")
+            failed = 0
+            await asyncio.sleep(60 * 60)
+
+
+@dataclass(slots=True)
+class CacheUpdateStats:
+    """The numbers of entries that were changed by a cache update."""
+
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+async def update_cache(  # pylint: disable=too-complex,too-many-branches,too-many-locals,too-many-statements  # noqa: B950,C901
+    app: Application,
+    update_wrong_quotes: bool = True,
+    update_quotes: bool = True,
+    update_authors: bool = True,
+    *,
+    full: bool = False,
+) -> dict[str, CacheUpdateStats]:
+    """
+    Fill the cache with all data from the API.
+
+    Unless full is true, only the entries that changed since the last update
+    (according to the data saved in Redis) get parsed.
+    """
+    LOGGER.info("Updating quotes cache")
+    redis: Redis[str] = cast("Redis[str]", app.settings.get("REDIS"))
+    prefix: str = app.settings.get("REDIS_PREFIX", NAME).removesuffix("-dev")
+    redis_available = EVENT_REDIS.is_set()
+    exceptions: list[Exception] = []
+    stats: dict[str, CacheUpdateStats] = {}
+
+    if update_wrong_quotes:
+        try:
+            # the votes in the queue aren't included in the API's ratings
+            pending_votes = (
+                await get_pending_votes(
+                    redis, app.settings.get("REDIS_PREFIX", NAME)
+                )
+                if redis_available
+                else {}
+            )
+            _, stats["wrongquotes"] = await _update_cache(
+                WrongQuote,
+                lambda data: parse_wrong_quote(
+                    add_pending_votes(data, pending_votes)
+                ),
+                lambda data: (
+                    int(data["quote"]["id"]),
+                    int(data["author"]["id"]),
+                )
+                in WRONG_QUOTES_CACHE,
+                redis,
+                prefix,
+                full=full,
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            exceptions.append(err)
+
+    deleted_quotes: set[int] = set()
+
+    if update_quotes:
+        try:
+            all_quote_ids, stats["quotes"] = await _update_cache(
+                Quote,
+                parse_quote,
+                lambda data: int(data["id"]) in QUOTES_CACHE,
+                redis,
+                prefix,
+                full=full,
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            exceptions.append(err)
+        else:
+            with QUOTES_CACHE.lock:
+                max_quote_id = max(all_quote_ids)
+                old_ids_in_cache = {
+                    _id for _id in QUOTES_CACHE if _id <= max_quote_id
+                }
+                deleted_quotes = old_ids_in_cache - all_quote_ids
+                for _id in deleted_quotes:
+                    del QUOTES_CACHE[_id]
+                if deleted_quotes:
+                    WRONG_QUOTES_INDEX.invalidate()
+
+                if len(QUOTES_CACHE) < len(all_quote_ids):
+                    LOGGER.error("Cache has less elements than just fetched")
+
+    deleted_authors: set[int] = set()
+
+    if update_authors:
+        try:
+            all_author_ids, stats["authors"] = await _update_cache(
+                Author,
+                parse_author,
+                lambda data: int(data["id"]) in AUTHORS_CACHE,
+                redis,
+                prefix,
+                full=full,
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            exceptions.append(err)
+        else:
+            with AUTHORS_CACHE.lock:
+                max_author_id = max(all_author_ids)
+                old_ids_in_cache = {
+                    _id for _id in AUTHORS_CACHE if _id <= max_author_id
+                }
+                deleted_authors = old_ids_in_cache - all_author_ids
+                for _id in deleted_authors:
+                    del AUTHORS_CACHE[_id]
+
+                if len(AUTHORS_CACHE) < len(all_author_ids):
+                    LOGGER.error("Cache has less elements than just fetched")
+
+    if deleted_authors or deleted_quotes:
+        deleted_wrong_quotes: set[tuple[int, int]] = set()
+        with WRONG_QUOTES_CACHE.lock:
+            for qid, aid in tuple(WRONG_QUOTES_CACHE):
+                if qid in deleted_quotes or aid in deleted_authors:
+                    deleted_wrong_quotes.add((qid, aid))
+                    del WRONG_QUOTES_CACHE[(qid, aid)]
+            if deleted_wrong_quotes:
+                WRONG_QUOTES_INDEX.invalidate()
+        LOGGER.warning(
+            "Deleted %d wrong quotes: %r",
+            len(deleted_wrong_quotes),
+            deleted_wrong_quotes,
+        )
+
+    if exceptions:
+        raise ExceptionGroup("Cache could not be updated", exceptions)
+
+    if (
+        redis_available
+        and update_wrong_quotes
+        and update_quotes
+        and update_authors
+    ):
+        await redis.setex(
+            f"{prefix}:cached-quote-data:last-update",
+            60 * 60 * 24 * 30,
+            int(time.time()),
+        )
+
+    return stats
+
+
+async def _update_cache[Q: QuotesObjBase](  # pylint: disable=too-many-arguments
+    klass: type[Q],
+    parse: Callable[[Mapping[str, Any]], Q],
+    is_cached: Callable[[Mapping[str, Any]], bool],
+    redis: Redis[str],
+    redis_prefix: str,
+    *,
+    full: bool,
+) -> tuple[set[int], CacheUpdateStats]:
+    """Update the cache and return the ids of all the fetched entries."""
+    endpoint = klass.fetch_all_endpoint()
+    redis_key = f"{redis_prefix}:cached-quote-data:{endpoint}"
+    stats = CacheUpdateStats()
+    wq_data: None | list[dict[str, Any]] = await make_api_request(
+        endpoint, entity_should_exist=True
+    )
+    if wq_data is None:
+        LOGGER.error("%s returned 404", endpoint)
+        return set(), stats
+    if not wq_data:
+        # don't treat this as if everything has been removed
+        raise ValueError(f"{endpoint} returned no entries")
+
+    old_data: dict[int, Mapping[str, Any]] = {}
+    if EVENT_REDIS.is_set() and (snapshot := await redis.get(redis_key)):
+        old_data = {
+            int(data["id"]): data
+            for data in cast(list[dict[str, Any]], json.loads(snapshot))
+        }
+
+    changed_data: list[Mapping[str, Any]] = []
+    for data in wq_data:
+        old = old_data.pop(int(data["id"]), None)
+        if old is None:
+            stats.added += 1
+        elif old != data:
+            stats.changed += 1
+        else:
+            stats.unchanged += 1
+            if not full and is_cached(data):
+                continue
+        changed_data.append(data)
+    stats.removed = len(old_data)
+
+    await parse_list_of_quote_data(changed_data, parse)
+    LOGGER.info(
+        "Updated %s: %d added, %d changed, %d removed, %d unchanged",
+        endpoint,
+        stats.added,
+        stats.changed,
+        stats.removed,
+        stats.unchanged,
+    )
+    if wq_data and EVENT_REDIS.is_set():
+        if stats.added or stats.changed or stats.removed:
+            await redis.setex(
+                redis_key,
+                60 * 60 * 24 * 30,
+                json.dumps(wq_data, option=ORJSON_OPTIONS),
+            )
+        else:  # nothing changed, keep the saved data
+            await redis.expire(redis_key, 60 * 60 * 24 * 30)
+    return {int(data["id"]) for data in wq_data}, stats
@@ -17,12 +17,12 @@ import random
 
 from ..utils.request_handler import APIRequestHandler
 from .utils import (
+    WRONG_QUOTES_INDEX,
     Author,
     Quote,
     QuoteReadyCheckHandler,
     get_authors,
     get_quotes,
-    get_wrong_quotes,
 )
 
 
@@ -37,7 +37,9 @@ def get_authors_and_quotes(count: int) -> tuple[list[Author], list[Quote]]:
     if len(authors) <= 1 or len(quotes) <= 1:
         return authors, quotes
 
-    wrong_quote = get_wrong_quotes(lambda wq: wq.rating > 0, shuffle=True)[0]
+    wrong_quote = random.choice(  # nosec: B311
+        WRONG_QUOTES_INDEX.get_by_rating(above=0)
+    )
 
     if (wq_author := wrong_quote.author) not in authors:
         authors[random.randrange(0, len(authors))] = wq_author  # nosec: B311
@@ -14,6 +14,7 @@
 """A module that generates an image from a wrong quote."""
 
 import asyncio
+import contextlib
 import io
 import logging
 import math
@@ -22,19 +23,26 @@ import sys
 import textwrap
 import time
 from collections import ChainMap
-from collections.abc import Iterable, Mapping, Set
+from collections.abc import Callable, Iterable, Mapping, Set
+from ctypes import c_ulonglong
+from functools import partial
+from multiprocessing import Value
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Any, ClassVar, Final
 
 import openmoji_dist
 import qoi_rs
+from blake3 import blake3
 from openmoji_dist import get_openmoji_font_data
 from PIL import Image, ImageDraw, ImageFont
 from PIL.Image import new as create_empty_image
 from tornado.web import HTTPError
 from typed_stream import Stream
+from UltraDict import UltraDict  # type: ignore[import-untyped]
 
-from .. import EPOCH
+from .. import CACHE_DIR, EPOCH, VERSION
 from ..utils import static_file_handling
 from ..utils.emoji import (
     split_text_into_emoji_and_non_emoji_parts,
@@ -42,9 +50,10 @@ from ..utils.emoji import (
 )
 from .utils import (
     DIR,
+    WRONG_QUOTES_INDEX,
     QuoteReadyCheckHandler,
+    UltraDictType,
     get_wrong_quote,
-    get_wrong_quotes,
 )
 
 try:
@@ -432,6 +441,152 @@ def create_image(  # noqa: C901  # pylint: disable=too-complex
     return buffer.getvalue()
 
 
+class QuoteImageCache:
+    """
+    A bounded cache for rendered quote images.
+
+    The images are kept in memory shared by all workers and are optionally
+    also written to a directory, which outlives the in-memory cache.
+    """
+
+    __slots__ = (
+        "_clock",
+        "_images",
+        "_last_used",
+        "_size",
+        "max_disk_size",
+        "max_size",
+    )
+
+    # counts the uses of the cache to order them
+    _clock: Synchronized[int]
+    _images: UltraDictType[str, bytes]
+    # the clock values of the last uses of the images, so that a cache hit
+    # doesn't have to write the image again to mark it as recently used
+    _last_used: UltraDictType[str, int]
+    # the size of the images in memory, only changed with the lock of _images
+    _size: c_ulonglong
+    max_disk_size: int
+    max_size: int
+
+    def __init__(self, max_size: int, max_disk_size: int) -> None:
+        """Initialize the cache with the maximum sizes in bytes."""
+        self._clock = Value(c_ulonglong, 0)
+        self._images = UltraDict(buffer_size=max_size // 2)
+        self._last_used = UltraDict()
+        self._size = Value(c_ulonglong, 0, lock=False)
+        self.max_disk_size = max_disk_size
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(*args: object) -> str:
+        """Get the key for the arguments used to create an image."""
+        hasher = blake3(f"{VERSION} {sys.flags.dev_mode}".encode("UTF-8"))
+        for arg in args:
+            hasher.update(repr(arg).encode("UTF-8"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    @property
+    def images(self) -> UltraDictType[str, bytes]:
+        """The images in memory."""
+        return self._images
+
+    @property
+    def last_used(self) -> UltraDictType[str, int]:
+        """The clock values of the last uses of the images in memory."""
+        return self._last_used
+
+    def _tick(self) -> int:
+        """Advance the clock and return its new value."""
+        with self._clock.get_lock():
+            self._clock.value += 1
+            return self._clock.value
+
+    def get(self, key: str) -> None | bytes:
+        """Get an image from memory and mark it as recently used."""
+        if (image := self._images.get(key)) is not None:
+            self._last_used[key] = self._tick()
+        return image
+
+    def put(self, key: str, image: bytes) -> None:
+        """
+        Put an image into memory.
+
+        Evict the least recently used images if the cache is too big.
+        """
+        if len(image) > self.max_size:
+            return
+        with self._images.lock:
+            size = self._size.value + len(image)
+            if (old_image := self._images.pop(key, None)) is not None:
+                size -= len(old_image)
+            self._images[key] = image
+            self._last_used[key] = self._tick()
+            if size > self.max_size:
+                for old_key in sorted(
+                    self._images, key=lambda k: self._last_used.get(k, 0)
+                ):
+                    if size <= self.max_size:
+                        break
+                    size -= len(self._images.pop(old_key))
+                    self._last_used.pop(old_key, None)
+                # hits on images evicted by another worker leave entries behind
+                for old_key in self._last_used.keys() - self._images.keys():
+                    self._last_used.pop(old_key, None)
+            self._size.value = size
+
+    def load_or_create(
+        self, key: str, create: Callable[[], bytes], directory: None | Path
+    ) -> bytes:
+        """
+        Load an image from the directory or create it.
+
+        This blocks, so it should be run in a thread.
+        """
+        if directory is None:
+            return create()
+        path = directory / key
+        with contextlib.suppress(OSError):
+            image = path.read_bytes()
+            os.utime(path)
+            return image
+        image = create()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_bytes(image)
+            temp_path.replace(path)
+            self._prune_directory(directory)
+        except OSError:
+            LOGGER.exception("Failed to write quote image to %s", directory)
+        return image
+
+    def _prune_directory(self, directory: Path) -> None:
+        """Delete the least recently used images in the directory."""
+        files: list[tuple[float, int, str]] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(file[1] for file in files)
+        files.sort()
+        for _, file_size, file_path in files:
+            if size <= self.max_disk_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(file_path)
+            size -= file_size
+
+
+IMAGE_CACHE: Final = QuoteImageCache(
+    max_size=16 * 1024**2, max_disk_size=256 * 1024**2
+)
+IMAGE_CACHE_DIR: Final[Path] = CACHE_DIR / "quote-images"
+
+
 class QuoteAsImage(QuoteReadyCheckHandler):
     """Quote as image request handler."""
 
@@ -470,9 +625,7 @@ class QuoteAsImage(QuoteReadyCheckHandler):
         wrong_quote = (
             await get_wrong_quote(int_quote_id, int(author_id))
             if author_id
-            else (
-                get_wrong_quotes(lambda wq: wq.id == int_quote_id) or (None,)
-            )[0]
+            else WRONG_QUOTES_INDEX.get_by_id(int_quote_id)
         )
         if wrong_quote is None:
             raise HTTPError(404, reason="Falsches Zitat nicht gefunden")
@@ -495,33 +648,45 @@ class QuoteAsImage(QuoteReadyCheckHandler):
         if file_type == "gif" and self.get_bool_argument("small", False):
             file_type = "4-color-gif"
 
-        return await self.finish(
-            await asyncio.to_thread(
-                create_image,
-                (
-                    self.sub_stanley(wrong_quote.quote.quote)
-                    if self.stanley()
-                    else wrong_quote.quote.quote
-                ),
+        create = partial(
+            create_image,
+            (
+                self.sub_stanley(wrong_quote.quote.quote)
+                if self.stanley()
+                else wrong_quote.quote.quote
+            ),
+            (
+                self.sub_stanley(wrong_quote.author.name)
+                if self.stanley()
+                else wrong_quote.author.name
+            ),
+            rating=(
+                None
+                if self.get_bool_argument("no_rating", False)
+                else wrong_quote.rating
+            ),
+            source=(
+                None
+                if self.get_bool_argument("no_source", False)
+                else f"{self.request.host_name}/z/{wrong_quote.get_id_as_str(True)}"
+            ),
+            file_type=file_type,
+            include_kangaroo=not self.get_bool_argument("no_kangaroo", False),
+            wq_id=wrong_quote.get_id_as_str(),
+        )
+        key = IMAGE_CACHE.get_key(*create.args, sorted(create.keywords.items()))
+
+        if (image := IMAGE_CACHE.get(key)) is None:
+            image = await asyncio.to_thread(
+                IMAGE_CACHE.load_or_create,
+                key,
+                create,
                 (
-                    self.sub_stanley(wrong_quote.author.name)
-                    if self.stanley()
-                    else wrong_quote.author.name
+                    IMAGE_CACHE_DIR
+                    if self.settings.get("QUOTE_IMAGE_CACHE_ON_DISK")
+                    else None
                 ),
-                rating=(
-                    None
-                    if self.get_bool_argument("no_rating", False)
-                    else wrong_quote.rating
-                ),
-                source=(
-                    None
-                    if self.get_bool_argument("no_source", False)
-                    else f"{self.request.host_name}/z/{wrong_quote.get_id_as_str(True)}"
-                ),
-                file_type=file_type,
-                include_kangaroo=not self.get_bool_argument(
-                    "no_kangaroo", False
-                ),
-                wq_id=wrong_quote.get_id_as_str(),
             )
-        )
+            IMAGE_CACHE.put(key, image)
+
+        return await self.finish(image)
@@ -0,0 +1,198 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The secondary indices over the cached wrong quotes."""
+
+import contextlib
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Mapping, Sequence
+from ctypes import c_ulonglong
+from dataclasses import dataclass, field
+from multiprocessing import Value
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from multiprocessing.sharedctypes import Synchronized
+
+    from .utils import Quote, WrongQuote
+
+WRONGQUOTE_DELETED: Final[int] = -2
+WRONGQUOTE_UNKNOWN: Final[int] = -1
+
+
+@dataclass(frozen=True, slots=True)
+class _WrongQuotesIndexState:
+    """An immutable snapshot of the indices over the wrong quotes."""
+
+    # sorted by rating (highest first), real quotes are excluded
+    by_rating: tuple[WrongQuote, ...] = ()
+    # the negated ratings of by_rating, sorted ascending for bisect
+    negated_ratings: tuple[int, ...] = ()
+    by_id: Mapping[int, WrongQuote] = field(default_factory=dict)
+    by_quote_id: Mapping[int, tuple[WrongQuote, ...]] = field(
+        default_factory=dict
+    )
+    by_author_id: Mapping[int, tuple[WrongQuote, ...]] = field(
+        default_factory=dict
+    )
+    # the wrong quotes that have an id in the API, sorted by rating
+    rated: tuple[WrongQuote, ...] = ()
+
+
+class WrongQuotesIndex:
+    """
+    Secondary indices over the cached wrong quotes.
+
+    The indices are built per process and rebuilt lazily, if the shared
+    generation changed since they were last built.
+    """
+
+    __slots__ = (
+        "_batch_depth",
+        "_dirty",
+        "_generation",
+        "_quotes",
+        "_shared_generation",
+        "_state",
+        "_wrong_quotes",
+    )
+
+    _batch_depth: int
+    _dirty: bool
+    _generation: int
+    _quotes: Mapping[int, Quote]
+    # incremented on every change of the cached quote data
+    # pylint: disable-next=unsubscriptable-object
+    _shared_generation: Synchronized[int]
+    _state: _WrongQuotesIndexState
+    _wrong_quotes: Mapping[tuple[int, int], WrongQuote]
+
+    def __init__(
+        self,
+        quotes: Mapping[int, Quote],
+        wrong_quotes: Mapping[tuple[int, int], WrongQuote],
+    ) -> None:
+        """Initialize the empty index over the caches."""
+        self._batch_depth = 0
+        self._dirty = False
+        self._generation = -1
+        self._quotes = quotes
+        self._shared_generation = Value(c_ulonglong, 0)
+        self._state = _WrongQuotesIndexState()
+        self._wrong_quotes = wrong_quotes
+
+    @contextlib.contextmanager
+    def batch_update(self) -> Iterator[None]:
+        """
+        Invalidate the index only once after all the changes are done.
+
+        Don't await anything in the with statement, other changes would
+        only invalidate the index after the batch update, too.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self.invalidate()
+
+    def invalidate(self) -> None:
+        """Mark the index as outdated in all processes."""
+        if self._batch_depth:
+            self._dirty = True
+            return
+        with self._shared_generation.get_lock():
+            self._shared_generation.value += 1
+
+    @property
+    def generation(self) -> int:
+        """The generation of the cached quote data, changes with it."""
+        return self._shared_generation.value
+
+    def _get_state(self) -> _WrongQuotesIndexState:
+        """Get the current state, rebuild it if it is outdated."""
+        generation = self._shared_generation.value
+        if generation != self._generation:
+            self._state = self._build_state()
+            self._generation = generation
+        return self._state
+
+    def _build_state(self) -> _WrongQuotesIndexState:
+        """Build the indices from the wrong quotes in the cache."""
+        wrong_quotes: list[WrongQuote] = []
+        for wrong_quote in self._wrong_quotes.values():
+            quote = self._quotes.get(wrong_quote.quote_id)
+            if quote is None or quote.author_id != wrong_quote.author_id:
+                wrong_quotes.append(wrong_quote)
+        wrong_quotes.sort(key=lambda wq: wq.rating, reverse=True)
+
+        by_id: dict[int, WrongQuote] = {}
+        by_quote_id: dict[int, list[WrongQuote]] = {}
+        by_author_id: dict[int, list[WrongQuote]] = {}
+        for wrong_quote in wrong_quotes:
+            if wrong_quote.id not in {WRONGQUOTE_UNKNOWN, WRONGQUOTE_DELETED}:
+                by_id[wrong_quote.id] = wrong_quote
+            by_quote_id.setdefault(wrong_quote.quote_id, []).append(wrong_quote)
+            by_author_id.setdefault(wrong_quote.author_id, []).append(
+                wrong_quote
+            )
+
+        return _WrongQuotesIndexState(
+            by_rating=tuple(wrong_quotes),
+            negated_ratings=tuple(-wq.rating for wq in wrong_quotes),
+            by_id=by_id,
+            by_quote_id={key: tuple(val) for key, val in by_quote_id.items()},
+            by_author_id={key: tuple(val) for key, val in by_author_id.items()},
+            rated=tuple(
+                wq
+                for wq in wrong_quotes
+                if wq.id not in {WRONGQUOTE_UNKNOWN, None}
+            ),
+        )
+
+    def get_all(self) -> Sequence[WrongQuote]:
+        """Get all wrong quotes sorted by rating (highest first)."""
+        return self._get_state().by_rating
+
+    def get_by_id(self, wrong_quote_id: int) -> WrongQuote | None:
+        """Get the wrong quote with the id."""
+        return self._get_state().by_id.get(wrong_quote_id)
+
+    def get_by_quote_id(self, quote_id: int) -> Sequence[WrongQuote]:
+        """Get the wrong quotes with the quote sorted by rating."""
+        return self._get_state().by_quote_id.get(quote_id, ())
+
+    def get_by_author_id(self, author_id: int) -> Sequence[WrongQuote]:
+        """Get the wrong quotes with the author sorted by rating."""
+        return self._get_state().by_author_id.get(author_id, ())
+
+    def get_by_rating(
+        self, *, above: int | None = None, below: int | None = None
+    ) -> Sequence[WrongQuote]:
+        """Get the wrong quotes with above < rating < below sorted by rating."""
+        state = self._get_state()
+        start = (
+            0 if below is None else bisect_right(state.negated_ratings, -below)
+        )
+        end = (
+            len(state.by_rating)
+            if above is None
+            else bisect_left(state.negated_ratings, -above)
+        )
+        return state.by_rating[start:end]
+
+    def get_rated(self) -> Sequence[WrongQuote]:
+        """Get the wrong quotes that have been rated in the API."""
+        return self._get_state().rated
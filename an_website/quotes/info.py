@@ -25,7 +25,7 @@ from tornado.web import HTTPError
 
 from .. import CA_BUNDLE_PATH, EVENT_REDIS
 from ..utils.request_handler import HTMLRequestHandler
-from .utils import get_author_by_id, get_quote_by_id, get_wrong_quotes
+from .utils import WRONG_QUOTES_INDEX, get_author_by_id, get_quote_by_id
 
 LOGGER: Final = logging.getLogger(__name__)
 
@@ -43,7 +43,7 @@ class QuotesInfoPage(HTMLRequestHandler):
             raise HTTPError(404)
         if head:
             return
-        wqs = get_wrong_quotes(lambda wq: wq.quote_id == quote_id, sort=True)
+        wqs = WRONG_QUOTES_INDEX.get_by_quote_id(quote_id)
         await self.render(
             "pages/quotes/quote_info.html",
             quote=quote,
@@ -187,10 +187,7 @@ class AuthorsInfoPage(HTMLRequestHandler):
                         "|".join(author.info[0:2]),  # type: ignore[arg-type]
                     )
 
-        wqs = get_wrong_quotes(
-            lambda wq: wq.author_id == author_id,
-            sort=True,
-        )
+        wqs = WRONG_QUOTES_INDEX.get_by_author_id(author_id)
 
         await self.render(
             "pages/quotes/author_info.html",
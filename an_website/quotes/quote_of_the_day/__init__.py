@@ -13,7 +13,10 @@
 
 """Get a random quote for a given day."""
 
+import asyncio
 import logging
+import random
+from collections.abc import Sequence
 from datetime import date, datetime, timedelta, timezone
 from typing import ClassVar, Final
 
@@ -21,16 +24,16 @@ from tornado.web import HTTPError
 
 from ...utils.request_handler import APIRequestHandler
 from ..utils import (
+    WRONG_QUOTES_INDEX,
     QuoteReadyCheckHandler,
     WrongQuote,
     get_wrong_quote,
-    get_wrong_quotes,
 )
 from .data import QuoteOfTheDayData
 from .store import (
     QUOTE_COUNT_TO_SHOW_IN_FEED,
     QuoteOfTheDayStore,
-    RedisQuoteOfTheDayStore,
+    get_redis_store,
 )
 
 LOGGER: Final = logging.getLogger(__name__)
@@ -46,15 +49,7 @@ class QuoteOfTheDayBaseHandler(QuoteReadyCheckHandler):
         if isinstance(wq_date, str):
             wq_date = date.fromisoformat(wq_date)
 
-        wq_id = await self.qod_store.get_quote_id_by_date(wq_date)
-        if not wq_id:
-            return None
-        wrong_quote = await get_wrong_quote(*wq_id)
-        if not wrong_quote:
-            return None
-        return QuoteOfTheDayData(
-            wq_date, wrong_quote, self.get_scheme_and_netloc()
-        )
+        return (await self.get_quotes_by_dates((wq_date,)))[0]
 
     async def get_quote_of_today(self) -> None | QuoteOfTheDayData:
         """Get the quote for today."""
@@ -62,20 +57,46 @@ class QuoteOfTheDayBaseHandler(QuoteReadyCheckHandler):
         quote_data = await self.get_quote_by_date(today)
         if quote_data:  # if was saved already
             return quote_data
-        quotes = get_wrong_quotes(lambda wq: wq.rating > 1, shuffle=True)
+        quotes = list(WRONG_QUOTES_INDEX.get_by_rating(above=1))
+        random.shuffle(quotes)
         if not quotes:
             LOGGER.error("No quotes available")
             return None
-        for quote in quotes:
-            if await self.qod_store.has_quote_been_used(quote.get_id()):
+        used = await self.qod_store.have_quotes_been_used(
+            [quote.get_id() for quote in quotes]
+        )
+        for quote, quote_used in zip(quotes, used, strict=True):
+            if quote_used:
                 continue
-            wq_id = quote.get_id()
-            await self.qod_store.set_quote_to_used(wq_id)
-            await self.qod_store.set_quote_id_by_date(today, wq_id)
+            wq_id = await self.qod_store.set_quote_of_the_day(
+                today, quote.get_id()
+            )
+            if wq_id != quote.get_id():  # another worker was faster
+                return await self.get_quote_by_date(today)
             return QuoteOfTheDayData(today, quote, self.get_scheme_and_netloc())
         LOGGER.critical("Failed to generate a new quote of the day")
         return None
 
+    async def get_quotes_by_dates(
+        self, dates: Sequence[date]
+    ) -> list[None | QuoteOfTheDayData]:
+        """Get the quotes of the dates with one request to the store."""
+        wq_ids = await self.qod_store.get_quote_ids_by_dates(dates)
+        wrong_quotes = await asyncio.gather(
+            *[get_wrong_quote(*wq_id) for wq_id in wq_ids if wq_id]
+        )
+        wrong_quotes_iter = iter(wrong_quotes)
+        scheme_and_netloc = self.get_scheme_and_netloc()
+        quotes: list[None | QuoteOfTheDayData] = []
+        for wq_date, wq_id in zip(dates, wq_ids, strict=True):
+            wrong_quote = next(wrong_quotes_iter) if wq_id else None
+            quotes.append(
+                QuoteOfTheDayData(wq_date, wrong_quote, scheme_and_netloc)
+                if wrong_quote
+                else None
+            )
+        return quotes
+
     def get_scheme_and_netloc(self) -> str:
         """Get the beginning of the URL."""
         return f"{self.request.protocol}://{self.request.host}"
@@ -83,7 +104,7 @@ class QuoteOfTheDayBaseHandler(QuoteReadyCheckHandler):
     @property
     def qod_store(self) -> QuoteOfTheDayStore:
         """Get the store used for storing the quote of the day."""
-        return RedisQuoteOfTheDayStore(self.redis, self.redis_prefix)
+        return get_redis_store(self.redis, self.redis_prefix)
 
 
 class QuoteOfTheDayRSS(QuoteOfTheDayBaseHandler):
@@ -101,10 +122,12 @@ class QuoteOfTheDayRSS(QuoteOfTheDayBaseHandler):
         today = datetime.now(timezone.utc).date()
         quotes = (
             await self.get_quote_of_today(),
-            *[
-                await self.get_quote_by_date(today - timedelta(days=i))
-                for i in range(1, QUOTE_COUNT_TO_SHOW_IN_FEED)
-            ],
+            *await self.get_quotes_by_dates(
+                [
+                    today - timedelta(days=i)
+                    for i in range(1, QUOTE_COUNT_TO_SHOW_IN_FEED)
+                ]
+            ),
         )
         await self.render(
             "rss/quote_of_the_day.xml",
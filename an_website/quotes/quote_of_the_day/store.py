@@ -14,7 +14,9 @@
 """Stores that contain the ids of old quotes of the day."""
 
 import abc
+from collections.abc import Sequence
 from datetime import date, datetime, timezone
+from functools import lru_cache
 from typing import ClassVar, Final
 
 from redis.asyncio import Redis
@@ -23,6 +25,8 @@ from tornado.web import HTTPError
 from ... import EVENT_REDIS
 
 QUOTE_COUNT_TO_SHOW_IN_FEED: Final[int] = 8
+#  we have over 720 funny wrong quotes, so 420 should be ok
+QUOTE_TTL_DAYS: Final[int] = 420
 
 
 class QuoteOfTheDayStore(abc.ABC):
@@ -35,11 +39,38 @@ class QuoteOfTheDayStore(abc.ABC):
         """Get the quote id for the given date."""
         raise NotImplementedError
 
+    async def get_quote_ids_by_dates(
+        self, dates: Sequence[date]
+    ) -> list[tuple[int, int] | None]:
+        """Get the quote ids for the given dates."""
+        return [await self.get_quote_id_by_date(date_) for date_ in dates]
+
     @abc.abstractmethod
     async def has_quote_been_used(self, quote_id: tuple[int, int]) -> bool:
         """Check if the quote has been used already."""
         raise NotImplementedError
 
+    async def have_quotes_been_used(
+        self, quote_ids: Sequence[tuple[int, int]]
+    ) -> list[bool]:
+        """Check for every quote if it has been used already."""
+        return [
+            await self.has_quote_been_used(quote_id) for quote_id in quote_ids
+        ]
+
+    async def set_quote_of_the_day(
+        self, date_: date, quote_id: tuple[int, int]
+    ) -> tuple[int, int]:
+        """
+        Set the quote id for the given date and the quote as used.
+
+        Returns the id of the quote of the date, which is a different one if
+        the quote of the date has been set concurrently.
+        """
+        await self.set_quote_to_used(quote_id)
+        await self.set_quote_id_by_date(date_, quote_id)
+        return quote_id
+
     @abc.abstractmethod
     async def set_quote_id_by_date(
         self, date_: date, quote_id: tuple[int, int]
@@ -54,7 +85,12 @@ class QuoteOfTheDayStore(abc.ABC):
 
 
 class QuoteOfTheDayStoreWithCache(QuoteOfTheDayStore, abc.ABC):
-    """Quote of the day store with an in memory cache."""
+    """
+    Quote of the day store with an in memory cache.
+
+    The quote of a date never changes once it is set, so the cache keeps
+    every known quote id until it expires in the store.
+    """
 
     # pylint: disable=abstract-method
 
@@ -67,15 +103,14 @@ class QuoteOfTheDayStoreWithCache(QuoteOfTheDayStore, abc.ABC):
 
     @classmethod
     def _populate_cache(cls, date_: date, quote_id: tuple[int, int]) -> None:
-        """Populate the cache for the quote of today."""
+        """Populate the cache with the quote id of a date."""
         today = datetime.now(timezone.utc).date()
-        # old entries are rarely used, they don't need to be cached
-        if (today - date_).days > QUOTE_COUNT_TO_SHOW_IN_FEED:
+        if 0 <= (today - date_).days < QUOTE_TTL_DAYS:
             cls.CACHE[date_] = quote_id
 
         for key in tuple(cls.CACHE):
-            # remove old entries from cache to save memory
-            if (today - key).days > QUOTE_COUNT_TO_SHOW_IN_FEED:
+            # remove expired entries from cache to save memory
+            if (today - key).days >= QUOTE_TTL_DAYS:
                 del cls.CACHE[key]
 
 
@@ -97,17 +132,39 @@ class RedisQuoteOfTheDayStore(QuoteOfTheDayStoreWithCache):
 
     async def get_quote_id_by_date(self, date_: date) -> tuple[int, int] | None:
         """Get the quote id for the given date."""
-        if date_ in self.CACHE:
-            return self.CACHE[date_]
+        return (await self.get_quote_ids_by_dates((date_,)))[0]
+
+    async def get_quote_ids_by_dates(
+        self, dates: Sequence[date]
+    ) -> list[tuple[int, int] | None]:
+        """Get the quote ids for the given dates with one request."""
+        quote_ids = [self._get_quote_id_from_cache(date_) for date_ in dates]
+        missing = [
+            date_
+            for date_, quote_id in zip(dates, quote_ids, strict=True)
+            if quote_id is None
+        ]
+        if not missing:
+            return quote_ids
         if not EVENT_REDIS.is_set():
             raise HTTPError(503)
-        wq_id = await self.redis.get(self.get_redis_quote_date_key(date_))
-        if not wq_id:
-            return None
-        quote, author = wq_id.split("-")
-        quote_id = int(quote), int(author)
-        self._populate_cache(date_, quote_id)
-        return quote_id
+        found: dict[date, tuple[int, int]] = {}
+        for date_, wq_id in zip(
+            missing,
+            await self.redis.mget(
+                [self.get_redis_quote_date_key(date_) for date_ in missing]
+            ),
+            strict=True,
+        ):
+            if not wq_id:
+                continue
+            quote, author = wq_id.split("-")
+            found[date_] = int(quote), int(author)
+            self._populate_cache(date_, found[date_])
+        return [
+            quote_id or found.get(date_)
+            for date_, quote_id in zip(dates, quote_ids, strict=True)
+        ]
 
     def get_redis_quote_date_key(self, wq_date: date) -> str:
         """Get the Redis key for getting quotes by date."""
@@ -120,11 +177,59 @@ class RedisQuoteOfTheDayStore(QuoteOfTheDayStoreWithCache):
 
     async def has_quote_been_used(self, quote_id: tuple[int, int]) -> bool:
         """Check if the quote has been used already."""
-        if quote_id in self.CACHE.values():
-            return True
+        return (await self.have_quotes_been_used((quote_id,)))[0]
+
+    async def have_quotes_been_used(
+        self, quote_ids: Sequence[tuple[int, int]]
+    ) -> list[bool]:
+        """Check for every quote if it has been used with one request."""
+        cached = set(self.CACHE.values())
+        missing = [quote_id for quote_id in quote_ids if quote_id not in cached]
+        if not missing:
+            return [True] * len(quote_ids)
+        if not EVENT_REDIS.is_set():
+            raise HTTPError(503)
+        used = cached.union(
+            quote_id
+            for quote_id, value in zip(
+                missing,
+                await self.redis.mget(
+                    [self.get_redis_used_key(quote_id) for quote_id in missing]
+                ),
+                strict=True,
+            )
+            if value
+        )
+        return [quote_id in used for quote_id in quote_ids]
+
+    async def set_quote_of_the_day(
+        self, date_: date, quote_id: tuple[int, int]
+    ) -> tuple[int, int]:
+        """
+        Set the quote id for the given date and the quote as used.
+
+        Returns the id of the quote of the date, which is a different one if
+        another worker has set the quote of the date first.
+        """
         if not EVENT_REDIS.is_set():
             raise HTTPError(503)
-        return bool(await self.redis.get(self.get_redis_used_key(quote_id)))
+        key = self.get_redis_quote_date_key(date_)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(
+                key,
+                "-".join(map(str, quote_id)),  # pylint: disable=bad-builtin
+                ex=60 * 60 * 24 * QUOTE_TTL_DAYS,
+                nx=True,
+            )
+            pipe.get(key)
+            was_set, wq_id = await pipe.execute()
+        if was_set:
+            await self.set_quote_to_used(quote_id)
+        else:
+            quote, author = wq_id.split("-")
+            quote_id = int(quote), int(author)
+        self._populate_cache(date_, quote_id)
+        return quote_id
 
     async def set_quote_id_by_date(
         self, date_: date, quote_id: tuple[int, int]
@@ -134,7 +239,7 @@ class RedisQuoteOfTheDayStore(QuoteOfTheDayStoreWithCache):
             raise HTTPError(503)
         await self.redis.setex(
             self.get_redis_quote_date_key(date_),
-            60 * 60 * 24 * 420,  # TTL
+            60 * 60 * 24 * QUOTE_TTL_DAYS,  # TTL
             "-".join(map(str, quote_id)),  # pylint: disable=bad-builtin
         )
         self._populate_cache(date_, quote_id)
@@ -146,7 +251,14 @@ class RedisQuoteOfTheDayStore(QuoteOfTheDayStoreWithCache):
 
         await self.redis.setex(
             self.get_redis_used_key(quote_id),
-            #  we have over 720 funny wrong quotes, so 420 should be ok
-            60 * 60 * 24 * 420,  # TTL
+            60 * 60 * 24 * QUOTE_TTL_DAYS,  # TTL
             1,  # True
         )
+
+
+@lru_cache(4)
+def get_redis_store(
+    redis: Redis[str], redis_prefix: str
+) -> RedisQuoteOfTheDayStore:
+    """Get the Redis quote of the day store for the client and the prefix."""
+    return RedisQuoteOfTheDayStore(redis, redis_prefix)
@@ -35,13 +35,13 @@ from .image import IMAGE_CONTENT_TYPES, create_image
 from .quote_of_the_day import QuoteOfTheDayBaseHandler
 from .utils import (
     WRONG_QUOTES_CACHE,
+    WRONG_QUOTES_INDEX,
     QuoteReadyCheckHandler,
     WrongQuote,
     create_wq_and_vote,
     get_authors,
     get_random_id,
     get_wrong_quote,
-    get_wrong_quotes,
 )
 
 LOGGER: Final = logging.getLogger(__name__)
@@ -97,11 +97,11 @@ def get_next_id(rating_filter: RatingFilter) -> tuple[int, int]:
         case "all":
             return get_random_id()
         case "w":
-            wrong_quotes = get_wrong_quotes(lambda wq: wq.rating > 0)
+            wrong_quotes = WRONG_QUOTES_INDEX.get_by_rating(above=0)
         case "n":
-            wrong_quotes = get_wrong_quotes(lambda wq: wq.rating < 0)
+            wrong_quotes = WRONG_QUOTES_INDEX.get_by_rating(below=0)
         case "rated":
-            wrong_quotes = get_wrong_quotes(lambda wq: wq.id not in {-1, None})
+            wrong_quotes = WRONG_QUOTES_INDEX.get_rated()
         case _:
             LOGGER.error("Invalid rating filter %s", rating_filter)
             return get_random_id()
@@ -203,7 +203,8 @@ class QuoteMainPage(QuoteBaseHandler, QuoteOfTheDayBaseHandler):
             return
 
         wrong_quotes = (
-            get_wrong_quotes(lambda wq: wq.rating > 0) or get_wrong_quotes()
+            WRONG_QUOTES_INDEX.get_by_rating(above=0)
+            or WRONG_QUOTES_INDEX.get_all()
         )
         await self.render(
             "pages/quotes/main_page.html",
@@ -279,10 +280,10 @@ class QuoteById(QuoteBaseHandler):
         """Handle GET requests to this page and render the quote."""
         int_quote_id = int(quote_id)
         if author_id is None:
-            wqs = get_wrong_quotes(lambda wq: wq.id == int_quote_id)
-            if not wqs:
+            wq = WRONG_QUOTES_INDEX.get_by_id(int_quote_id)
+            if wq is None:
                 raise HTTPError(404, f"No wrong quote with id {quote_id}")
-            return self.redirect(self.fix_url(self.LONG_PATH % wqs[0].get_id()))
+            return self.redirect(self.fix_url(self.LONG_PATH % wq.get_id()))
 
         if head:
             return
@@ -398,10 +399,10 @@ class QuoteById(QuoteBaseHandler):
         """
         quote_id = int(quote_id_str)
         if author_id_str is None:
-            wqs = get_wrong_quotes(lambda wq: wq.id == quote_id)
-            if not wqs:
+            wq = WRONG_QUOTES_INDEX.get_by_id(quote_id)
+            if wq is None:
                 raise HTTPError(404, f"No wrong quote with id {quote_id}")
-            return self.redirect(self.fix_url(self.LONG_PATH % wqs[0].get_id()))
+            return self.redirect(self.fix_url(self.LONG_PATH % wq.get_id()))
 
         author_id = int(author_id_str)
 
@@ -428,10 +429,21 @@ class QuoteById(QuoteBaseHandler):
 
         # do the voting
         wrong_quote = await create_wq_and_vote(
-            to_vote, quote_id, author_id, contributed_by
+            to_vote,
+            quote_id,
+            author_id,
+            contributed_by,
+            fast=True,
+            redis=self.redis,
+            redis_prefix=self.redis_prefix,
         )
         if abs(vote_diff) == 2:
-            await wrong_quote.vote(to_vote, lazy=True)
+            await wrong_quote.vote(
+                to_vote,
+                lazy=True,
+                redis=self.redis,
+                redis_prefix=self.redis_prefix,
+            )
 
         await self.render_wrong_quote(wrong_quote, new_vote)
 
@@ -15,12 +15,10 @@
 
 import abc
 import asyncio
-import contextlib
 import logging
 import multiprocessing.synchronize
 import random
-import sys
-import time
+from collections import Counter
 from collections.abc import (
     Callable,
     Iterable,
@@ -34,9 +32,7 @@ from typing import Any, Final, Literal, cast
 from urllib.parse import urlencode
 
 import dill  # type: ignore[import-untyped]  # nosec: B403
-import elasticapm
 import orjson as json
-import typed_stream
 from redis.asyncio import Redis
 from tornado.httpclient import AsyncHTTPClient
 from tornado.web import Application, HTTPError
@@ -48,10 +44,10 @@ from .. import (
     EVENT_REDIS,
     EVENT_SHUTDOWN,
     NAME,
-    ORJSON_OPTIONS,
 )
 from ..utils.request_handler import HTMLRequestHandler
-from ..utils.utils import ModuleInfo, Permission, ratelimit
+from ..utils.utils import Permission, ratelimit
+from .index import WRONGQUOTE_DELETED, WRONGQUOTE_UNKNOWN, WrongQuotesIndex
 
 DIR: Final = ROOT_DIR / "quotes"
 
@@ -60,9 +56,6 @@ LOGGER: Final = logging.getLogger(__name__)
 # TODO: make this configurable and move it into app settings
 API_URL: str = "https://zitate.prapsschnalinen.de/api"
 
-WRONGQUOTE_DELETED: Final[int] = -2
-WRONGQUOTE_UNKNOWN: Final[int] = -1
-
 
 # pylint: disable-next=too-few-public-methods
 class UltraDictType[K, V](MutableMapping[K, V], abc.ABC):
@@ -80,6 +73,7 @@ AUTHORS_CACHE: Final[UltraDictType[int, Author]] = UltraDict(
 WRONG_QUOTES_CACHE: Final[UltraDictType[tuple[int, int], WrongQuote]] = (
     UltraDict(buffer_size=1024**2, serializer=dill)
 )
+WRONG_QUOTES_INDEX: Final = WrongQuotesIndex(QUOTES_CACHE, WRONG_QUOTES_CACHE)
 
 
 @dataclass(init=False, slots=True)
@@ -267,6 +261,7 @@ class WrongQuote(QuotesObjBase):
                 self.id = WRONGQUOTE_UNKNOWN
             else:
                 del WRONG_QUOTES_CACHE[(self.quote_id, self.author_id)]
+                WRONG_QUOTES_INDEX.invalidate()
             return self
         return parse_wrong_quote(api_data, self)
 
@@ -312,21 +307,24 @@ class WrongQuote(QuotesObjBase):
         }
 
     async def vote(
-        # pylint: disable=unused-argument
         self,
         vote: Literal[-1, 1],
         lazy: bool = False,
+        *,
+        redis: None | Redis[str] = None,
+        redis_prefix: str = NAME,
     ) -> WrongQuote | None:
-        """Vote for the wrong quote."""
+        """
+        Vote for the wrong quote.
+
+        If lazy is true and Redis is available, the vote is only queued.
+        The queued votes get sent to the API by flush_votes_periodically().
+        """
         if self.id == WRONGQUOTE_UNKNOWN:
             raise ValueError("Can't vote for a not existing quote.")
-        # if lazy:  # simulate the vote and do the actual voting later
-        #     self.rating += vote
-        #     asyncio.get_running_loop().call_soon_threadsafe(
-        #         self.vote,
-        #         vote,
-        #     )
-        #     return self
+        if lazy and redis is not None and EVENT_REDIS.is_set():
+            # simulate the vote and do the actual voting later
+            return await queue_vote(self, vote, redis, redis_prefix)
         # do the voting
         data = await make_api_request(
             f"wrongquotes/{self.id}",
@@ -354,16 +352,19 @@ def get_wrong_quotes(
     if shuffle and sort:
         raise ValueError("Sort and shuffle can't be both true.")
 
-    iterable: Iterable[WrongQuote] = WRONG_QUOTES_CACHE.values()
+    iterable: Iterable[WrongQuote]
+    if filter_real_quotes:
+        # already sorted by rating
+        iterable = WRONG_QUOTES_INDEX.get_all()
+    else:
+        iterable = WRONG_QUOTES_CACHE.values()
     if filter_fun:
         iterable = filter(filter_fun, iterable)  # pylint: disable=bad-builtin
-    if filter_real_quotes:
-        iterable = (wq for wq in iterable if wq.quote.author_id != wq.author_id)
     wqs = list(iterable)
 
     if shuffle:
         random.shuffle(wqs)
-    elif sort:
+    elif sort and not filter_real_quotes:
         wqs.sort(key=lambda wq: wq.rating, reverse=True)
     return wqs
 
@@ -462,8 +463,12 @@ def parse_author(json_data: Mapping[str, Any]) -> Author:
         elif author.name != name:
             author.name = name
             author.info = None  # reset info
+        else:  # nothing changed, don't write to the shared memory
+            return author
 
         AUTHORS_CACHE[author.id] = author
+    # invalidate after the write, so that no index is built from the old data
+    WRONG_QUOTES_INDEX.invalidate()
 
     return author
 
@@ -495,11 +500,18 @@ def parse_quote(
         if quote is None:  # new quote
             # pylint: disable=too-many-function-args
             quote = Quote(quote_id, quote_str, author.id)
+        elif (
+            quote.quote == quote_str
+            and quote.author_id == author.id
+            and quote.id in QUOTES_CACHE
+        ):  # nothing changed, don't write to the shared memory
+            return quote
         else:  # quote was already saved
             quote.quote = quote_str
             quote.author_id = author.id
 
         QUOTES_CACHE[quote.id] = quote
+    WRONG_QUOTES_INDEX.invalidate()
 
     return quote
 
@@ -520,7 +532,14 @@ def parse_wrong_quote(
         wrong_quote.rating = rating
 
     with WRONG_QUOTES_CACHE.lock:
-        wrong_quote = WRONG_QUOTES_CACHE.get(id_tuple, wrong_quote)
+        cached_wrong_quote = WRONG_QUOTES_CACHE.get(id_tuple)
+        if (
+            cached_wrong_quote is not None
+            and cached_wrong_quote.id == wrong_quote_id
+            and cached_wrong_quote.rating == rating
+        ):  # nothing changed, don't write to the shared memory
+            return cached_wrong_quote
+        wrong_quote = cached_wrong_quote or wrong_quote
         if wrong_quote is None:
             wrong_quote = WrongQuote(  # pylint: disable=unexpected-keyword-arg
                 id=wrong_quote_id,
@@ -532,219 +551,11 @@ def parse_wrong_quote(
             wrong_quote.id = wrong_quote_id
             wrong_quote.rating = rating
         WRONG_QUOTES_CACHE[id_tuple] = wrong_quote
+    WRONG_QUOTES_INDEX.invalidate()
 
     return wrong_quote
 
 
-async def parse_list_of_quote_data[Q: QuotesObjBase](  # noqa: D103
-    json_list: str | Iterable[Mapping[str, Any]],
-    parse_fun: Callable[[Mapping[str, Any]], Q],
-) -> tuple[Q, ...]:
-    """Parse a list of quote data."""
-    if not json_list:
-        return ()
-    if isinstance(json_list, str):
-        json_list = cast(list[dict[str, Any]], json.loads(json_list))
-    return_list = []
-    for json_data in json_list:
-        _ = parse_fun(json_data)
-        await asyncio.sleep(0)
-        return_list.append(_)
-    return tuple(return_list)
-
-
-async def update_cache_periodically(
-    app: Application, worker: int | None
-) -> None:
-    """Start updating the cache every hour."""
-    # pylint: disable=too-complex, too-many-branches
-    if "/troet" in typed_stream.Stream(
-        cast(Iterable[ModuleInfo], app.settings.get("MODULE_INFOS", ()))
-    ).map(lambda m: m.path):
-        app.settings["SHOW_SHARING_ON_MASTODON"] = True
-    if worker:
-        return
-    with contextlib.suppress(asyncio.TimeoutError):
-        await asyncio.wait_for(EVENT_REDIS.wait(), 5)
-    redis: Redis[str] = cast("Redis[str]", app.settings.get("REDIS"))
-    prefix: str = app.settings.get("REDIS_PREFIX", NAME).removesuffix("-dev")
-    apm: None | elasticapm.Client
-    if EVENT_REDIS.is_set():  # pylint: disable=too-many-nested-blocks
-        await parse_list_of_quote_data(
-            await redis.get(f"{prefix}:cached-quote-data:authors"),  # type: ignore[arg-type]  # noqa: B950
-            parse_author,
-        )
-        await parse_list_of_quote_data(
-            await redis.get(f"{prefix}:cached-quote-data:quotes"),  # type: ignore[arg-type]  # noqa: B950
-            parse_quote,
-        )
-        await parse_list_of_quote_data(
-            await redis.get(f"{prefix}:cached-quote-data:wrongquotes"),  # type: ignore[arg-type]  # noqa: B950
-            parse_wrong_quote,
-        )
-        if QUOTES_CACHE and AUTHORS_CACHE and WRONG_QUOTES_CACHE:
-            last_update = await redis.get(
-                f"{prefix}:cached-quote-data:last-update"
-            )
-            if last_update:
-                last_update_int = int(last_update)
-                since_last_update = int(time.time()) - last_update_int
-                if 0 <= since_last_update < 60 * 60:
-                    # wait until the last update is at least one hour old
-                    update_cache_in = 60 * 60 - since_last_update
-                    if not sys.flags.dev_mode and update_cache_in > 60:
-                        # if in production mode update wrong quotes just to be sure
-                        try:
-                            await update_cache(
-                                app, update_quotes=False, update_authors=False
-                            )
-                        except Exception:  # pylint: disable=broad-except
-                            LOGGER.exception("Updating quotes cache failed")
-                            apm = app.settings.get("ELASTIC_APM", {}).get(
-                                "CLIENT"
-                            )
-                            if apm:
-                                apm.capture_exception()
-                        else:
-                            LOGGER.info("Updated quotes cache successfully")
-                    LOGGER.info(
-                        "Next update of quotes cache in %d seconds",
-                        update_cache_in,
-                    )
-                    await asyncio.sleep(update_cache_in)
-
-    # update the cache every hour
-    failed = 0
-    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
-        try:
-            await update_cache(app)
-        except Exception:  # pylint: disable=broad-except
-            LOGGER.exception("Updating quotes cache failed")
-            if apm := app.settings.get("ELASTIC_APM", {}).get("CLIENT"):
-                apm.capture_exception()
-            failed += 1
-            await asyncio.sleep(pow(min(failed * 2, 60), 2))  # 4,16,...,60*60
-        else:
-            LOGGER.info("Updated quotes cache successfully")
-            failed = 0
-            await asyncio.sleep(60 * 60)
-
-
-async def update_cache(  # pylint: disable=too-complex,too-many-branches,too-many-locals,too-many-statements  # noqa: B950,C901
-    app: Application,
-    update_wrong_quotes: bool = True,
-    update_quotes: bool = True,
-    update_authors: bool = True,
-) -> None:
-    """Fill the cache with all data from the API."""
-    LOGGER.info("Updating quotes cache")
-    redis: Redis[str] = cast("Redis[str]", app.settings.get("REDIS"))
-    prefix: str = app.settings.get("REDIS_PREFIX", NAME).removesuffix("-dev")
-    redis_available = EVENT_REDIS.is_set()
-    exceptions: list[Exception] = []
-
-    if update_wrong_quotes:
-        try:
-            await _update_cache(WrongQuote, parse_wrong_quote, redis, prefix)
-        except Exception as err:  # pylint: disable=broad-exception-caught
-            exceptions.append(err)
-
-    deleted_quotes: set[int] = set()
-
-    if update_quotes:
-        try:
-            quotes = await _update_cache(Quote, parse_quote, redis, prefix)
-        except Exception as err:  # pylint: disable=broad-exception-caught
-            exceptions.append(err)
-        else:
-            with QUOTES_CACHE.lock:
-                all_quote_ids = {q.id for q in quotes}
-                max_quote_id = max(all_quote_ids)
-                old_ids_in_cache = {
-                    _id for _id in QUOTES_CACHE if _id <= max_quote_id
-                }
-                deleted_quotes = old_ids_in_cache - all_quote_ids
-                for _id in deleted_quotes:
-                    del QUOTES_CACHE[_id]
-
-                if len(QUOTES_CACHE) < len(quotes):
-                    LOGGER.error("Cache has less elements than just fetched")
-
-    deleted_authors: set[int] = set()
-
-    if update_authors:
-        try:
-            authors = await _update_cache(Author, parse_author, redis, prefix)
-        except Exception as err:  # pylint: disable=broad-exception-caught
-            exceptions.append(err)
-        else:
-            with AUTHORS_CACHE.lock:
-                all_author_ids = {q.id for q in authors}
-                max_author_id = max(all_author_ids)
-                old_ids_in_cache = {
-                    _id for _id in AUTHORS_CACHE if _id <= max_author_id
-                }
-                deleted_authors = old_ids_in_cache - all_author_ids
-                for _id in deleted_authors:
-                    del AUTHORS_CACHE[_id]
-
-                if len(AUTHORS_CACHE) < len(authors):
-                    LOGGER.error("Cache has less elements than just fetched")
-
-    if deleted_authors or deleted_quotes:
-        deleted_wrong_quotes: set[tuple[int, int]] = set()
-        with WRONG_QUOTES_CACHE.lock:
-            for qid, aid in tuple(WRONG_QUOTES_CACHE):
-                if qid in deleted_quotes or aid in deleted_authors:
-                    deleted_wrong_quotes.add((qid, aid))
-                    del WRONG_QUOTES_CACHE[(qid, aid)]
-        LOGGER.warning(
-            "Deleted %d wrong quotes: %r",
-            len(deleted_wrong_quotes),
-            deleted_wrong_quotes,
-        )
-
-    if exceptions:
-        raise ExceptionGroup("Cache could not be updated", exceptions)
-
-    if (
-        redis_available
-        and update_wrong_quotes
-        and update_quotes
-        and update_authors
-    ):
-        await redis.setex(
-            f"{prefix}:cached-quote-data:last-update",
-            60 * 60 * 24 * 30,
-            int(time.time()),
-        )
-
-
-async def _update_cache[Q: QuotesObjBase](
-    klass: type[Q],
-    parse: Callable[[Mapping[str, Any]], Q],
-    redis: Redis[str],
-    redis_prefix: str,
-) -> tuple[Q, ...]:
-    wq_data = await make_api_request(
-        klass.fetch_all_endpoint(), entity_should_exist=True
-    )
-    if wq_data is None:
-        LOGGER.error("%s returned 404", klass.fetch_all_endpoint())
-        return ()
-    parsed_data = await parse_list_of_quote_data(
-        wq_data,
-        parse,
-    )
-    if wq_data and EVENT_REDIS.is_set():
-        await redis.setex(
-            f"{redis_prefix}:cached-quote-data:{klass.fetch_all_endpoint()}",
-            60 * 60 * 24 * 30,
-            json.dumps(wq_data, option=ORJSON_OPTIONS),
-        )
-    return parsed_data
-
-
 async def get_author_by_id(author_id: int) -> Author | None:
     """Get an author by its id."""
     author = AUTHORS_CACHE.get(author_id)
@@ -828,12 +639,15 @@ def get_random_id() -> tuple[int, int]:
     )
 
 
-async def create_wq_and_vote(
+async def create_wq_and_vote(  # pylint: disable=too-many-arguments
     vote: Literal[-1, 1],
     quote_id: int,
     author_id: int,
     contributed_by: str,
     fast: bool = False,
+    *,
+    redis: None | Redis[str] = None,
+    redis_prefix: str = NAME,
 ) -> WrongQuote:
     """
     Vote for the wrong_quote with the API.
@@ -844,7 +658,12 @@ async def create_wq_and_vote(
     if (
         wrong_quote
         and wrong_quote.id != WRONGQUOTE_UNKNOWN
-        and (result := await wrong_quote.vote(vote, fast)) is not None
+        and (
+            result := await wrong_quote.vote(
+                vote, fast, redis=redis, redis_prefix=redis_prefix
+            )
+        )
+        is not None
     ):
         return result
     if wrong_quote and wrong_quote.id == WRONGQUOTE_DELETED:
@@ -868,7 +687,11 @@ async def create_wq_and_vote(
     wrong_quote = parse_wrong_quote(data)
     if wrong_quote.id == WRONGQUOTE_DELETED:
         raise HTTPError(404)
-    if (result := await wrong_quote.vote(vote, lazy=True)) is not None:
+    if (
+        result := await wrong_quote.vote(
+            vote, lazy=True, redis=redis, redis_prefix=redis_prefix
+        )
+    ) is not None:
         return result
     LOGGER.error(
         "Voting just created wrong quote (%s) failed with 404",
@@ -877,6 +700,123 @@ async def create_wq_and_vote(
     raise HTTPError(500)
 
 
+def get_vote_queue_key(redis_prefix: str) -> str:
+    """Get the key of the Redis hash with the queued votes."""
+    return f"{redis_prefix}:quote-vote-queue"
+
+
+async def get_pending_votes(
+    redis: Redis[str], redis_prefix: str
+) -> Mapping[int, int]:
+    """Get the sum of the votes per wrong quote that haven't been sent yet."""
+    queue_key = get_vote_queue_key(redis_prefix)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hgetall(queue_key)
+        pipe.hgetall(f"{queue_key}:flushing")
+        queues: list[dict[str, str]] = await pipe.execute()
+    pending_votes: Counter[int] = Counter()
+    for queue in queues:
+        pending_votes.update(
+            {int(wq_id): int(votes) for wq_id, votes in queue.items()}
+        )
+    return pending_votes
+
+
+def add_pending_votes(
+    json_data: Mapping[str, Any], pending_votes: Mapping[int, int]
+) -> Mapping[str, Any]:
+    """Add the votes that haven't been sent yet to the rating from the API."""
+    wrong_quote_id = int(json_data.get("id") or WRONGQUOTE_UNKNOWN)
+    if not (votes := pending_votes.get(wrong_quote_id)):
+        return json_data
+    return {**json_data, "rating": json_data["rating"] + votes}
+
+
+async def queue_vote(
+    wrong_quote: WrongQuote,
+    vote: Literal[-1, 1],
+    redis: Redis[str],
+    redis_prefix: str,
+) -> WrongQuote:
+    """Update the rating in the cache and queue the vote in Redis."""
+    await redis.hincrby(
+        get_vote_queue_key(redis_prefix), str(wrong_quote.id), vote
+    )
+    with WRONG_QUOTES_CACHE.lock:
+        wrong_quote = WRONG_QUOTES_CACHE.get(wrong_quote.get_id(), wrong_quote)
+        wrong_quote.rating += vote
+        WRONG_QUOTES_CACHE[wrong_quote.get_id()] = wrong_quote
+    WRONG_QUOTES_INDEX.invalidate()
+    return wrong_quote
+
+
+async def flush_votes(redis: Redis[str], redis_prefix: str) -> int:
+    """
+    Send the queued votes to the API and return how many were sent.
+
+    The votes for every wrong quote are summed up and the queue is renamed
+    before sending them. Every sent vote is subtracted from the renamed queue,
+    so votes that weren't sent (e.g. because of a crash) get sent next time.
+    """
+    queue_key = get_vote_queue_key(redis_prefix)
+    flushing_key = f"{queue_key}:flushing"
+    if not await redis.exists(flushing_key):
+        if not await redis.exists(queue_key):
+            return 0
+        await redis.rename(queue_key, flushing_key)
+
+    sent = 0
+    for wq_id, votes_str in (await redis.hgetall(flushing_key)).items():
+        votes = int(votes_str)
+        vote: Literal[-1, 1] = -1 if votes < 0 else 1
+        data: None | Mapping[str, Any] = None
+        for _ in range(abs(votes)):
+            data = await make_api_request(
+                f"wrongquotes/{wq_id}",
+                method="POST",
+                body={"vote": str(vote)},
+                entity_should_exist=True,
+            )
+            if data is None:
+                LOGGER.warning(
+                    "Dropping %d votes for deleted wrong quote %s",
+                    abs(votes),
+                    wq_id,
+                )
+                break
+            await redis.hincrby(flushing_key, wq_id, -vote)
+            votes -= vote
+            sent += 1
+        await redis.hdel(flushing_key, wq_id)
+        if data is not None:
+            # use the rating of the API plus the votes queued in the meantime
+            queued_votes = int(await redis.hget(queue_key, wq_id) or 0)
+            parse_wrong_quote(
+                add_pending_votes(data, {int(wq_id): queued_votes})
+            )
+    return sent
+
+
+async def flush_votes_periodically(
+    app: Application, worker: int | None
+) -> None:
+    """Send the queued votes to the API every 30 seconds."""
+    if worker:
+        return
+    redis: Redis[str] = cast("Redis[str]", app.settings.get("REDIS"))
+    prefix: str = app.settings.get("REDIS_PREFIX", NAME)
+    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
+        if EVENT_REDIS.is_set():
+            try:
+                if sent := await flush_votes(redis, prefix):
+                    LOGGER.info("Sent %d queued votes", sent)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Sending queued votes failed")
+                if apm := app.settings.get("ELASTIC_APM", {}).get("CLIENT"):
+                    apm.capture_exception()
+        await asyncio.sleep(30)
+
+
 class QuoteReadyCheckHandler(HTMLRequestHandler):
     """Class that checks if quotes have been loaded."""
 
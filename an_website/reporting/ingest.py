@@ -0,0 +1,161 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The queue of the reports that haven't been saved in Elasticsearch yet."""
+
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any, Final
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+from tornado.web import Application
+
+from .. import EVENT_ELASTICSEARCH, EVENT_SHUTDOWN, NAME
+
+LOGGER: Final = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ReportQueueStats:
+    """The numbers of reports that went through a queue."""
+
+    dropped: int = 0
+    failed: int = 0
+    queued: int = 0
+    saved: int = 0
+
+
+class ReportQueue:
+    """
+    The reports received by one worker.
+
+    Reports are saved in bulk requests of up to batch_size reports, as soon as
+    enough of them are queued or after flush_interval seconds. If more than
+    max_size reports are queued, new reports are dropped. If saving a batch
+    fails, it stays in the queue and is saved with the next flush.
+    """
+
+    __slots__ = (
+        "_flush_lock",
+        "_reports",
+        "_wakeup",
+        "batch_size",
+        "flush_interval",
+        "max_size",
+        "stats",
+    )
+
+    _flush_lock: asyncio.Lock
+    _reports: deque[dict[str, Any]]
+    _wakeup: asyncio.Event
+    batch_size: int
+    flush_interval: float
+    max_size: int
+    stats: ReportQueueStats
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 2,
+    ) -> None:
+        """Initialize the empty queue."""
+        self._flush_lock = asyncio.Lock()
+        self._reports = deque()
+        self._wakeup = asyncio.Event()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.stats = ReportQueueStats()
+
+    def __len__(self) -> int:
+        """Get the count of the queued reports."""
+        return len(self._reports)
+
+    async def flush(self, elasticsearch: AsyncElasticsearch, index: str) -> int:
+        """Save all queued reports in Elasticsearch, return the saved count."""
+        saved = 0
+        async with self._flush_lock:
+            while self._reports:  # pylint: disable=while-used
+                batch = [
+                    self._reports.popleft()
+                    for _ in range(min(self.batch_size, len(self._reports)))
+                ]
+                try:
+                    success, errors = await async_bulk(
+                        elasticsearch, batch, index=index, raise_on_error=False
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception("Saving %d reports failed", len(batch))
+                    # keep the order, try again with the next flush
+                    self._reports.extendleft(reversed(batch))
+                    break
+                if errors:
+                    LOGGER.warning(
+                        "Saving %d of %d reports failed: %r",
+                        len(errors),
+                        len(batch),
+                        errors[:3],
+                    )
+                    self.stats.failed += len(errors)
+                saved += success
+        self.stats.saved += saved
+        return saved
+
+    def put(self, reports: Iterable[dict[str, Any]]) -> int:
+        """Queue the reports, return the count of the queued ones."""
+        count = 0
+        for report in reports:
+            if len(self._reports) >= self.max_size:
+                self.stats.dropped += 1
+                continue
+            self._reports.append(report)
+            count += 1
+        self.stats.queued += count
+        if len(self._reports) >= self.batch_size:
+            self._wakeup.set()
+        return count
+
+    async def wait(self) -> None:
+        """Wait until a batch is full or the flush interval has passed."""
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+        self._wakeup.clear()
+
+
+async def save_queued_reports(*, app: Application, worker: int | None) -> None:
+    """Save the queued reports in Elasticsearch."""
+    # pylint: disable=unused-argument
+    queue: None | ReportQueue = app.settings.get("REPORT_QUEUE")
+    if queue is None:
+        return
+    logged_dropped = 0
+    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
+        await queue.wait()
+        if queue.stats.dropped > logged_dropped:
+            LOGGER.warning(
+                "Dropped %d reports, because the queue was full",
+                queue.stats.dropped - logged_dropped,
+            )
+            logged_dropped = queue.stats.dropped
+        if not queue or not EVENT_ELASTICSEARCH.is_set():
+            continue
+        await queue.flush(
+            app.settings["ELASTICSEARCH"],
+            f"{app.settings.get('ELASTICSEARCH_PREFIX', NAME)}-reports",
+        )
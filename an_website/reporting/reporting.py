@@ -26,6 +26,7 @@ from tornado.web import HTTPError
 from .. import EVENT_ELASTICSEARCH, ORJSON_OPTIONS
 from ..utils.request_handler import APIRequestHandler
 from ..utils.utils import ModuleInfo, Permission
+from .ingest import ReportQueue, save_queued_reports
 
 LOGGER: Final = logging.getLogger(__name__)
 
@@ -43,6 +44,7 @@ def get_module_info() -> ModuleInfo:
         ),
         path="/api/reports",
         hidden=True,
+        required_background_tasks=(save_queued_reports,),
     )
 
 
@@ -237,6 +239,10 @@ class ReportingAPI(APIRequestHandler):
             report["ecs"] = {"version": "8.17.0"}
             report["_op_type"] = "create"
             report.pop("_index", None)  # DO NOT REMOVE
+        queue: None | ReportQueue = self.settings.get("REPORT_QUEUE")
+        if queue is not None:
+            queue.put(reports)
+            return
         await async_bulk(
             self.elasticsearch,
             reports,
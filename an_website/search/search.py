@@ -18,22 +18,25 @@ import logging
 from typing import Any, Final, Literal, TypeAlias, cast
 
 import orjson as json
+from tornado.web import Application
 from typed_stream import Stream
 
-from .. import NAME
+from .. import EVENT_SHUTDOWN, NAME
 from ..quotes.utils import (
+    AUTHORS_CACHE,
+    QUOTES_CACHE,
+    WRONG_QUOTES_INDEX,
     Author,
     Quote,
     WrongQuote,
     get_authors,
     get_quotes,
-    get_wrong_quotes,
 )
 from ..soundboard.data import ALL_SOUNDS, SoundInfo
 from ..utils import search
 from ..utils.decorators import get_setting_or_default, requires_settings
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
-from ..utils.utils import AwaitableValue, ModuleInfo, PageInfo
+from ..utils.utils import AwaitableValue, ModuleInfo, PageInfo, Timer
 
 LOGGER: Final = logging.getLogger(__name__)
 
@@ -45,6 +48,66 @@ UnscoredPageInfo: TypeAlias = tuple[
 OldSearchPageInfo: TypeAlias = search.ScoredValue[UnscoredPageInfo]
 
 
+class QuotesSearchIndices:
+    """The search indices of the cached quotes, synced in the background."""
+
+    __slots__ = ("authors", "generation", "quotes", "wrong_quotes")
+
+    authors: search.SearchIndex[int, Author]
+    generation: int
+    quotes: search.SearchIndex[int, Quote]
+    wrong_quotes: search.SearchIndex[tuple[int, int], WrongQuote]
+
+    def __init__(self) -> None:
+        """Initialize the empty indices."""
+        self.authors = search.SearchIndex(lambda author: author.name)
+        self.generation = -1
+        self.quotes = search.SearchIndex(
+            lambda quote: (quote.quote, quote.author.name)
+        )
+        self.wrong_quotes = search.SearchIndex(
+            lambda wq: (wq.quote.quote, wq.author.name)
+        )
+
+    def sync(self) -> None:
+        """
+        Update the indices, if the cached quotes changed.
+
+        Quotes and wrong quotes with a quote or author that isn't cached are
+        left out, because their fields can't be indexed.
+        """
+        if (generation := WRONG_QUOTES_INDEX.generation) == self.generation:
+            return
+        timer = Timer()
+        changes = (
+            self.authors.sync((author.id, author) for author in get_authors())
+            + self.quotes.sync(
+                (quote.id, quote)
+                for quote in get_quotes()
+                if quote.author_id in AUTHORS_CACHE
+            )
+            + self.wrong_quotes.sync(
+                (wq.get_id(), wq)
+                for wq in WRONG_QUOTES_INDEX.get_by_rating(above=0)
+                if wq.quote_id in QUOTES_CACHE
+                if wq.author_id in AUTHORS_CACHE
+            )
+        )
+        self.generation = generation
+        LOGGER.debug(
+            "Updated %d search index entries in %.3fs", changes, timer.stop()
+        )
+
+
+QUOTES_SEARCH_INDICES: Final = QuotesSearchIndices()
+SOUNDS_SEARCH_INDEX: Final[search.SearchIndex[int, SoundInfo]] = (
+    search.SearchIndex(
+        lambda sound_info: (sound_info.text, sound_info.person.value),
+        enumerate(ALL_SOUNDS),
+    )
+)
+
+
 def get_module_info() -> ModuleInfo:
     """Create and return the ModuleInfo for this module."""
     return ModuleInfo(
@@ -57,9 +120,25 @@ def get_module_info() -> ModuleInfo:
         aliases=("/search",),
         keywords=("Suche",),
         path="/suche",
+        required_background_tasks=(sync_quotes_search_indices,),
     )
 
 
+async def sync_quotes_search_indices(
+    *, app: Application, worker: int | None
+) -> None:
+    """Update the search indices of the worker, if the quotes changed."""
+    # pylint: disable=unused-argument
+    while not EVENT_SHUTDOWN.is_set():  # pylint: disable=while-used
+        try:
+            QUOTES_SEARCH_INDICES.sync()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Updating the quotes search indices failed")
+            if apm := app.settings.get("ELASTIC_APM", {}).get("CLIENT"):
+                apm.capture_exception()
+        await asyncio.sleep(10)
+
+
 class Search(HTMLRequestHandler):
     """The request handler for the search page."""
 
@@ -98,6 +177,7 @@ class Search(HTMLRequestHandler):
 
     async def search(self) -> list[dict[str, float | str]]:
         """Search the website."""
+        timer = Timer()
         result: list[dict[str, str | float]] | None = None
         if query := self.get_query():
             try:
@@ -106,9 +186,12 @@ class Search(HTMLRequestHandler):
                 LOGGER.exception("App Search request failed")
                 if self.apm_client:
                     self.apm_client.capture_exception()  # type: ignore[no-untyped-call]
-        if result is not None:
-            return result
-        return self.search_old(query)
+        if result is None:
+            result = self.search_old(query)
+        self.set_header(
+            "Server-Timing", f"search;dur={timer.stop() * 1000:.3f}"
+        )
+        return result
 
     @requires_settings("APP_SEARCH", return_=AwaitableValue(None))
     @get_setting_or_default("APP_SEARCH_ENGINE", NAME.removesuffix("-dev"))
@@ -166,7 +249,7 @@ class Search(HTMLRequestHandler):
         self, query: str, limit: int = 20
     ) -> list[dict[str, str | float]]:
         """Search the website using the old search engine."""
-        page_infos = self.search_old_internal(query)
+        page_infos = self.search_old_internal(query, limit)
 
         page_infos.sort(reverse=True)
 
@@ -175,7 +258,9 @@ class Search(HTMLRequestHandler):
             for scored_value in page_infos[:limit]
         ]
 
-    def search_old_internal(self, query: str) -> list[OldSearchPageInfo]:
+    def search_old_internal(
+        self, query: str, limit: None | int = None
+    ) -> list[OldSearchPageInfo]:
         """Search authors and quotes."""
         if not (query_object := search.Query(query)):
             return list(
@@ -194,13 +279,9 @@ class Search(HTMLRequestHandler):
                 self.convert_page_info_to_simple_tuple,
             )
         )
-        soundboard: search.DataProvider[SoundInfo, UnscoredPageInfo] = (
-            search.DataProvider(
-                ALL_SOUNDS,
-                lambda sound_info: (
-                    sound_info.text,
-                    sound_info.person.value,
-                ),
+        soundboard: search.IndexedDataProvider[SoundInfo, UnscoredPageInfo] = (
+            search.IndexedDataProvider(
+                SOUNDS_SEARCH_INDEX,
                 lambda sound_info: (
                     (
                         "url",
@@ -213,10 +294,9 @@ class Search(HTMLRequestHandler):
                 ),
             )
         )
-        authors: search.DataProvider[Author, UnscoredPageInfo] = (
-            search.DataProvider(
-                get_authors,
-                lambda author: author.name,
+        authors: search.IndexedDataProvider[Author, UnscoredPageInfo] = (
+            search.IndexedDataProvider(
+                QUOTES_SEARCH_INDICES.authors,
                 lambda author: (
                     ("url", self.fix_url(author.get_path())),
                     ("title", "Autoren-Info"),
@@ -224,10 +304,9 @@ class Search(HTMLRequestHandler):
                 ),
             )
         )
-        quotes: search.DataProvider[Quote, UnscoredPageInfo] = (
-            search.DataProvider(
-                get_quotes,
-                lambda quote: (quote.quote, quote.author.name),
+        quotes: search.IndexedDataProvider[Quote, UnscoredPageInfo] = (
+            search.IndexedDataProvider(
+                QUOTES_SEARCH_INDICES.quotes,
                 lambda q: (
                     ("url", self.fix_url(q.get_path())),
                     ("title", "Zitat-Info"),
@@ -235,24 +314,30 @@ class Search(HTMLRequestHandler):
                 ),
             )
         )
-        wrong_quotes: search.DataProvider[WrongQuote, UnscoredPageInfo] = (
-            search.DataProvider(
-                lambda: get_wrong_quotes(lambda wq: wq.rating > 0),
-                lambda wq: (wq.quote.quote, wq.author.name),
-                lambda wq: (
-                    ("url", self.fix_url(wq.get_path())),
-                    ("title", "Falsches Zitat"),
-                    ("description", str(wq)),
-                ),
-            )
+        wrong_quotes: search.IndexedDataProvider[
+            WrongQuote, UnscoredPageInfo
+        ] = search.IndexedDataProvider(
+            QUOTES_SEARCH_INDICES.wrong_quotes,
+            lambda wq: (
+                ("url", self.fix_url(wq.get_path())),
+                ("title", "Falsches Zitat"),
+                ("description", str(wq)),
+            ),
         )
         return search.search(
             query_object,
             cast(search.DataProvider[object, UnscoredPageInfo], pages),
-            cast(search.DataProvider[object, UnscoredPageInfo], soundboard),
-            cast(search.DataProvider[object, UnscoredPageInfo], authors),
-            cast(search.DataProvider[object, UnscoredPageInfo], quotes),
-            cast(search.DataProvider[object, UnscoredPageInfo], wrong_quotes),
+            cast(
+                search.IndexedDataProvider[object, UnscoredPageInfo],
+                soundboard,
+            ),
+            cast(search.IndexedDataProvider[object, UnscoredPageInfo], authors),
+            cast(search.IndexedDataProvider[object, UnscoredPageInfo], quotes),
+            cast(
+                search.IndexedDataProvider[object, UnscoredPageInfo],
+                wrong_quotes,
+            ),
+            limit=limit,
         )
 
 
@@ -20,6 +20,7 @@ from tornado.web import RedirectHandler
 from .. import DIR as ROOT_DIR
 from ..utils.static_file_from_traversable import TraversableStaticFileHandler
 from ..utils.utils import ModuleInfo, PageInfo
+from .data import FILE_HASHES
 from .soundboard import SoundboardHTMLHandler, SoundboardRSSHandler
 
 DIR: Final = ROOT_DIR / "soundboard"
@@ -40,7 +41,7 @@ def get_module_info() -> ModuleInfo:
             (
                 r"/soundboard/files/(.*mp3)",
                 TraversableStaticFileHandler,
-                {"root": DIR / "files", "hashes": {}},
+                {"root": DIR / "files", "hashes": FILE_HASHES},
             ),
             (
                 r"/soundboard/feed",
@@ -24,10 +24,12 @@ import orjson as json
 import regex
 
 from .. import DIR as ROOT_DIR
-from ..utils.fix_static_path_impl import hash_file
+from ..utils.fix_static_path_impl import FileHashes
 from ..utils.utils import name_to_id, replace_umlauts, size_of_file
 
 DIR: Final = ROOT_DIR / "soundboard"
+
+FILE_HASHES: Final = FileHashes(DIR / "files", "/soundboard/files/")
 with (DIR / "info.json").open("r", encoding="UTF-8") as file:
     info = json.loads(file.read())
 
@@ -177,7 +179,8 @@ class SoundInfo(Info):
         file = self.filename  # pylint: disable=redefined-outer-name
         href = fix_url_func(f"/soundboard/{self.person.name}")
         path = f"files/{file}.mp3"
-        file_url = f"/soundboard/{path}?v={hash_file(DIR / path)}"
+        file_url = f"/soundboard/{path}"
+        file_url = f"{file_url}?v={FILE_HASHES[file_url]}"
         return (
             f"<li id={file!r}>"
             f"<a href={href!r} class='a_hover'>"
@@ -294,22 +294,38 @@ class SwappedWordsConfig:  # pylint: disable=eq-without-hash
             )
             if line
         )
+        self._regex: None | Pattern[str] = None
+        # the index of the group of a word pair in the regex → word pair
+        self._pairs_by_group: dict[int, WordPair] = {}
 
     def get_regex(self) -> Pattern[str]:
         """Get the regex that matches every word in this."""
-        return regex.compile(
-            "|".join(
-                tuple(
-                    f"(?P<n{i}>{word_pair.to_pattern_str()})"
-                    for i, word_pair in enumerate(self.lines)
-                    if isinstance(word_pair, WordPair)
-                )
-            ),
-            regex.IGNORECASE,
-        )
+        if self._regex is None:
+            pattern = regex.compile(
+                "|".join(
+                    tuple(
+                        f"(?P<n{i}>{word_pair.to_pattern_str()})"
+                        for i, word_pair in enumerate(self.lines)
+                        if isinstance(word_pair, WordPair)
+                    )
+                ),
+                regex.IGNORECASE,
+            )
+            self._pairs_by_group = {
+                pattern.groupindex[f"n{i}"]: word_pair
+                for i, word_pair in enumerate(self.lines)
+                if isinstance(word_pair, WordPair)
+            }
+            self._regex = pattern
+        return self._regex
 
     def get_replaced_word(self, match: Match[str]) -> str:
         """Get the replaced word with the same case as the match."""
+        # the group of the word pair is always the last one to be closed
+        if (index := match.lastindex) and (
+            word_pair := self._pairs_by_group.get(index)
+        ):
+            return word_pair.get_replacement(match[index])
         for key, word in match.groupdict().items():
             if isinstance(word, str) and key.startswith("n"):
                 return self.get_replacement_by_group_name(key, word)
@@ -354,6 +370,17 @@ class SwappedWordsConfig:  # pylint: disable=eq-without-hash
         )
 
 
+@lru_cache(64)
+def _get_config(config: str) -> SwappedWordsConfig:
+    """Parse a normalized config string and cache the result."""
+    return SwappedWordsConfig(config)
+
+
+def get_config(config: str) -> SwappedWordsConfig:
+    """Get the (cached) parsed config, don't modify it."""
+    return _get_config(config.replace("\r\n", "\n").strip())
+
+
 def minify(config: str) -> str:
     """Minify a config string."""
     return SwappedWordsConfig(config).to_config_str(True)
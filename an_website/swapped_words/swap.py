@@ -23,13 +23,13 @@ from tornado.web import HTTPError, MissingArgumentError
 from .. import DIR as ROOT_DIR
 from ..utils.data_parsing import parse_args
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
-from .config_file import InvalidConfigError, SwappedWordsConfig
+from .config_file import InvalidConfigError, SwappedWordsConfig, get_config
 
 # the max char count of the text to process
 MAX_CHAR_COUNT: Final[int] = 32769 - 1
 
 with (ROOT_DIR / "swapped_words/config.sw").open("r", encoding="UTF-8") as file:
-    DEFAULT_CONFIG: Final[SwappedWordsConfig] = SwappedWordsConfig(file.read())
+    DEFAULT_CONFIG: Final[SwappedWordsConfig] = get_config(file.read())
 
 
 def check_text_too_long(text: str) -> None:
@@ -105,7 +105,7 @@ class SwappedWords(HTMLRequestHandler):
             sw_config = (
                 DEFAULT_CONFIG
                 if args.config is None or args.reset
-                else SwappedWordsConfig(args.config)
+                else get_config(args.config)
             )
         except InvalidConfigError as exc:
             self.set_status(400)
@@ -146,7 +146,7 @@ class SwappedWordsAPI(APIRequestHandler):
             sw_config = (
                 DEFAULT_CONFIG
                 if args.config is None
-                else SwappedWordsConfig(args.config)
+                else get_config(args.config)
             )
 
             if args.return_config:
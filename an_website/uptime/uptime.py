@@ -13,9 +13,11 @@
 
 """The uptime page that shows the time the website is running."""
 
+import asyncio
 import logging
 import math
 import time
+from functools import lru_cache
 from typing import Final, TypedDict
 
 import regex
@@ -103,6 +105,78 @@ async def get_availability_data(
     )
 
 
+class AvailabilityCache:
+    """
+    Cache the availability data of one worker.
+
+    Concurrent requests share one Elasticsearch query. After refresh_interval
+    the data gets refreshed in the background, until then the old data is
+    used. Data older than max_age is only used if the refresh fails.
+    """
+
+    __slots__ = (
+        "_checked_at",
+        "_data",
+        "_task",
+        "_updated_at",
+        "max_age",
+        "queries",
+        "refresh_interval",
+    )
+
+    _checked_at: float
+    _data: None | tuple[int, int]
+    _task: None | asyncio.Task[None | tuple[int, int]]
+    _updated_at: float
+    max_age: float
+    queries: int
+    refresh_interval: float
+
+    def __init__(
+        self, refresh_interval: float = 60, max_age: float = 60 * 10
+    ) -> None:
+        """Initialize the empty cache."""
+        self._checked_at = -math.inf
+        self._data = None
+        self._task = None
+        self._updated_at = -math.inf
+        self.max_age = max_age
+        self.queries = 0
+        self.refresh_interval = refresh_interval
+
+    async def _query(
+        self, elasticsearch: AsyncElasticsearch
+    ) -> None | tuple[int, int]:
+        """Query the availability data and cache it."""
+        self.queries += 1
+        try:
+            data = await get_availability_data(elasticsearch)
+        finally:
+            self._checked_at = time.monotonic()
+            self._task = None
+        if data is None:  # keep the old data
+            return self._data
+        self._data = data
+        self._updated_at = self._checked_at
+        return data
+
+    async def get(
+        self, elasticsearch: AsyncElasticsearch
+    ) -> None | tuple[int, int]:
+        """Get the availability data (up, down)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return self._data
+        if self._task is None:
+            self._task = asyncio.create_task(self._query(elasticsearch))
+        if now - self._updated_at < self.max_age:
+            return self._data  # the task refreshes it in the background
+        return await asyncio.shield(self._task)
+
+
+AVAILABILITY_CACHE: Final = AvailabilityCache()
+
+
 def get_availability_dict(up: int, down: int) -> AvailabilityDict:
     """Get the availability data as a dict."""
     return {
@@ -132,6 +206,12 @@ AVAILABILITY_CHART: Final[str] = regex.sub(
 )
 
 
+@lru_cache(256)
+def get_availability_chart(availability: float) -> str:
+    """Get the SVG chart of the availability (between 0 and 1)."""
+    return AVAILABILITY_CHART % (math.pi * 10 * availability)
+
+
 class UptimeHandler(HTMLRequestHandler):
     """The request handler for the uptime page."""
 
@@ -155,7 +235,7 @@ class UptimeHandler(HTMLRequestHandler):
     ) -> dict[str, str | float | AvailabilityDict]:
         """Get uptime data."""
         availability_data = (
-            await get_availability_data(self.elasticsearch)
+            await AVAILABILITY_CACHE.get(self.elasticsearch)
             if EVENT_ELASTICSEARCH.is_set()
             else None
         ) or (0, 0)
@@ -178,7 +258,7 @@ class AvailabilityChartHandler(BaseRequestHandler):
         if not (availability := self.get_argument("a", None)):
             if not EVENT_ELASTICSEARCH.is_set():
                 raise HTTPError(503)
-            availability_data = await get_availability_data(self.elasticsearch)
+            availability_data = await AVAILABILITY_CACHE.get(self.elasticsearch)
             if not availability_data:
                 raise HTTPError(503)
             self.redirect(
@@ -205,9 +285,7 @@ class AvailabilityChartHandler(BaseRequestHandler):
         )
         if head:
             return
-        await self.finish(
-            AVAILABILITY_CHART % (math.pi * 10 * float(availability))
-        )
+        await self.finish(get_availability_chart(float(availability)))
 
 
 class UptimeAPIHandler(APIRequestHandler, UptimeHandler):
@@ -45,7 +45,6 @@ import tornado.web
 import yaml
 from accept_types import get_best_match  # type: ignore[import-untyped]
 from ansi2html import Ansi2HTMLConverter
-from bs4 import BeautifulSoup
 from dateutil.easter import easter
 from elastic_transport import ApiError, TransportError
 from elasticsearch import AsyncElasticsearch
@@ -72,12 +71,19 @@ from .. import (
     pytest_is_running,
 )
 from .decorators import is_authorized
+from .fragments import (
+    FRAGMENT_BOUNDARY,
+    FRAGMENT_CONTENT_TYPES,
+    PageFragments,
+)
+from .header_sets import NONCE_PLACEHOLDER, HeaderSet, HeaderSetCache
 from .options import ColourScheme, Options
 from .static_file_handling import FILE_HASHES_DICT, fix_static_path
 from .themes import RANDOM_THEMES
 from .utils import (
     ModuleInfo,
     Permission,
+    RatelimitBucket,
     add_args_to_url,
     ansi_replace,
     apply,
@@ -87,7 +93,7 @@ from .utils import (
     geoip,
     hash_bytes,
     is_prime,
-    ratelimit,
+    ratelimit_buckets,
     str_to_bool,
 )
 
@@ -174,10 +180,15 @@ class _RequestHandler(tornado.web.RequestHandler):
         """Get GeoIP information."""
         if not ip:
             ip = self.request.remote_ip
+        database_dir = self.settings.get("GEOIP_DATABASE_DIR")
         if not EVENT_ELASTICSEARCH.is_set():
-            return geoip(ip, database)
+            return geoip(ip, database, database_dir=database_dir)
         return geoip(
-            ip, database, self.elasticsearch, allow_fallback=allow_fallback
+            ip,
+            database,
+            self.elasticsearch,
+            allow_fallback=allow_fallback,
+            database_dir=database_dir,
         )
 
     async def get_time(self) -> datetime:
@@ -257,11 +268,16 @@ class _RequestHandler(tornado.web.RequestHandler):
         ):
             return
 
-        if self.request.method != "OPTIONS" and not await self.ratelimit(True):
-            await self.ratelimit()
+        if self.request.method != "OPTIONS":
+            await self.ratelimit(True)
 
     async def ratelimit(self, global_ratelimit: bool = False) -> bool:
-        """Take b1nzy to space using Redis."""
+        """
+        Take b1nzy to space using Redis.
+
+        If global_ratelimit is True the global bucket is checked together
+        with the bucket of the handler in a single round trip to Redis.
+        """
         if (
             not self.settings.get("RATELIMITS")
             or self.request.method == "OPTIONS"
@@ -279,43 +295,12 @@ class _RequestHandler(tornado.web.RequestHandler):
             )
             raise HTTPError(503)
 
-        if global_ratelimit:  # TODO: add to _RequestHandler
-            ratelimited, headers = await ratelimit(
-                self.redis,
-                self.redis_prefix,
-                str(self.request.remote_ip),
-                bucket=None,
-                max_burst=99,  # limit = 100
-                count_per_period=20,  # 20 requests per second
-                period=1,
-                tokens=10 if self.settings.get("UNDER_ATTACK") else 1,
-            )
-        else:
-            method = (
-                "GET" if self.request.method == "HEAD" else self.request.method
-            )
-            if not (limit := getattr(self, f"RATELIMIT_{method}_LIMIT", 0)):
-                return False
-            ratelimited, headers = await ratelimit(
-                self.redis,
-                self.redis_prefix,
-                str(self.request.remote_ip),
-                bucket=getattr(
-                    self,
-                    f"RATELIMIT_{method}_BUCKET",
-                    self.__class__.__name__.lower(),
-                ),
-                max_burst=limit - 1,
-                count_per_period=getattr(  # request count per period
-                    self,
-                    f"RATELIMIT_{method}_COUNT_PER_PERIOD",
-                    30,
-                ),
-                period=getattr(
-                    self, f"RATELIMIT_{method}_PERIOD", 60  # period in seconds
-                ),
-                tokens=1 if self.request.method != "HEAD" else 0,
-            )
+        ratelimited, headers = await ratelimit_buckets(
+            self.redis,
+            self.redis_prefix,
+            str(self.request.remote_ip),
+            *self.get_ratelimit_buckets(global_ratelimit),
+        )
 
         for header, value in headers.items():
             self.set_header(header, value)
@@ -330,6 +315,46 @@ class _RequestHandler(tornado.web.RequestHandler):
 
         return ratelimited
 
+    def get_ratelimit_buckets(
+        self, global_ratelimit: bool = False
+    ) -> list[RatelimitBucket]:
+        """Get the ratelimit buckets for the current request."""
+        buckets: list[RatelimitBucket] = []
+        if global_ratelimit:  # TODO: add to _RequestHandler
+            buckets.append(
+                RatelimitBucket(
+                    bucket=None,
+                    max_burst=99,  # limit = 100
+                    count_per_period=20,  # 20 requests per second
+                    period=1,
+                    tokens=10 if self.settings.get("UNDER_ATTACK") else 1,
+                )
+            )
+        method = "GET" if self.request.method == "HEAD" else self.request.method
+        if limit := getattr(self, f"RATELIMIT_{method}_LIMIT", 0):
+            buckets.append(
+                RatelimitBucket(
+                    bucket=getattr(
+                        self,
+                        f"RATELIMIT_{method}_BUCKET",
+                        self.__class__.__name__.lower(),
+                    ),
+                    max_burst=limit - 1,
+                    count_per_period=getattr(  # request count per period
+                        self,
+                        f"RATELIMIT_{method}_COUNT_PER_PERIOD",
+                        30,
+                    ),
+                    period=getattr(
+                        self,
+                        f"RATELIMIT_{method}_PERIOD",
+                        60,  # period in seconds
+                    ),
+                    tokens=1 if self.request.method != "HEAD" else 0,
+                )
+            )
+        return buckets
+
     def redirect_to_canonical_domain(self) -> bool:
         """Redirect to the canonical domain."""
         if (
@@ -477,40 +502,32 @@ class BaseRequestHandler(_RequestHandler):
         ):
             return self._finish(chunk)
 
-        chunk = chunk.decode("UTF-8") if isinstance(chunk, bytes) else chunk
+        fragments = PageFragments.from_page(
+            chunk.decode("UTF-8") if isinstance(chunk, bytes) else chunk
+        )
 
         if as_markdown:
             return self._finish(
                 f"# {self.title}\n\n"
-                + html2text.html2text(chunk, self.request.full_url()).strip()
+                + html2text.html2text(
+                    fragments.body, self.request.full_url()
+                ).strip()
             )
 
-        soup = BeautifulSoup(chunk, features="lxml")
-
         if as_plain_text:
-            return self._finish(soup.get_text("\n", True))
+            return self._finish(fragments.get_text())
 
+        resources = fragments.get_resources()
         dictionary: dict[str, object] = {
             "url": self.fix_url(include_protocol_and_host=True),
             "title": self.title,
             "short_title": (
                 self.short_title if self.title != self.short_title else None
             ),
-            "body": "".join(
-                str(element)
-                for element in soup.find_all(name="main")[0].contents
-            ).strip(),
-            "scripts": [
-                {"script": script.string, **script.attrs}
-                for script in soup.find_all("script")
-            ],
-            "stylesheets": [
-                stylesheet.get("href")
-                for stylesheet in soup.find_all("link", rel="stylesheet")
-            ],
-            "css": "\n".join(
-                (style.string or "") for style in soup.find_all("style")
-            ),
+            "body": fragments.body,
+            "scripts": resources.scripts,
+            "stylesheets": resources.stylesheets,
+            "css": "\n".join(resources.styles),
         }
 
         return self._finish(dictionary)
@@ -777,6 +794,11 @@ class BaseRequestHandler(_RequestHandler):
                 )
             ),
             form_appendix=self.user_settings.get_form_appendix(),
+            fragment_boundary=(
+                FRAGMENT_BOUNDARY
+                if self.content_type in FRAGMENT_CONTENT_TYPES
+                else ""
+            ),
             GH_ORG_URL=GH_ORG_URL,
             GH_PAGES_URL=GH_PAGES_URL,
             GH_REPO_URL=GH_REPO_URL,
@@ -1012,11 +1034,17 @@ class BaseRequestHandler(_RequestHandler):
 
     set_cookie.__doc__ = _RequestHandler.set_cookie.__doc__
 
-    def set_csp_header(self) -> None:
+    def set_csp_header(self, header_set: None | HeaderSet = None) -> None:
         """Set the Content-Security-Policy header."""
         self.nonce = secrets.token_urlsafe(16)
+        self.set_header(
+            "Content-Security-Policy",
+            (header_set or self.get_header_set()).get_csp(self.nonce),
+        )
 
-        script_src = ["'self'", f"'nonce-{self.nonce}'"]
+    def create_header_set(self) -> HeaderSet:
+        """Create the default headers that are the same for similar requests."""
+        script_src = ["'self'", f"'nonce-{NONCE_PLACEHOLDER}'"]
 
         if (
             self.apm_enabled
@@ -1045,8 +1073,56 @@ class BaseRequestHandler(_RequestHandler):
             + f"://{self.request.host}"
         )
 
-        self.set_header(
-            "Content-Security-Policy",
+        headers: dict[str, str] = {}
+        if self.settings.get("REPORTING"):
+            endpoint = self.get_reporting_api_endpoint()
+            headers["Reporting-Endpoints"] = (
+                f'default="{endpoint}"'  # noqa: B907
+            )
+            headers["Report-To"] = json.dumps(
+                {
+                    "group": "default",
+                    "max_age": 2592000,
+                    "endpoints": [{"url": endpoint}],
+                },
+                option=ORJSON_OPTIONS,
+            ).decode("UTF-8")
+            headers["NEL"] = '{"report_to":"default","max_age":2592000}'
+        headers["X-Content-Type-Options"] = "nosniff"
+        headers["Access-Control-Max-Age"] = "7200"
+        headers["Access-Control-Allow-Origin"] = "*"
+        headers["Access-Control-Allow-Headers"] = "*"
+        headers["Access-Control-Allow-Methods"] = ", ".join(
+            self.get_allowed_methods()
+        )
+        headers["Cross-Origin-Resource-Policy"] = "cross-origin"
+        headers["Permissions-Policy"] = (
+            "browsing-topics=(),"
+            "identity-credentials-get=(),"
+            "join-ad-interest-group=(),"
+            "private-state-token-issuance=(),"
+            "private-state-token-redemption=(),"
+            "run-ad-auction=()"
+        )
+        headers["Referrer-Policy"] = "same-origin"
+        headers["Cross-Origin-Opener-Policy"] = "same-origin;report-to=default"
+        if self.request.path == "/kaenguru-comics-alt":  # TODO: improve this
+            headers["Cross-Origin-Embedder-Policy"] = (
+                "credentialless;report-to=default"
+            )
+        else:
+            headers["Cross-Origin-Embedder-Policy"] = (
+                "require-corp;report-to=default"
+            )
+        if self.settings.get("HSTS"):
+            headers["Strict-Transport-Security"] = "max-age=63072000"
+        headers["Accept-CH"] = "Sec-CH-Prefers-Reduced-Motion"
+        headers["Critical-CH"] = "Sec-CH-Prefers-Reduced-Motion"
+        headers["Vary"] = (
+            "Accept,Authorization,Cookie,Sec-CH-Prefers-Reduced-Motion"
+        )
+
+        return HeaderSet.create(
             "default-src 'self';"
             f"script-src {' '.join(script_src)};"
             f"connect-src {' '.join(connect_src)};"
@@ -1063,65 +1139,36 @@ class BaseRequestHandler(_RequestHandler):
                 if self.settings.get("REPORTING")
                 else ""
             ),
+            headers,
+        )
+
+    def get_header_set(self) -> HeaderSet:
+        """
+        Get the default headers that are the same for similar requests.
+
+        They get cached in the HeaderSetCache of the application if it has one.
+        """
+        cache: None | HeaderSetCache = self.settings.get("HEADER_SETS")
+        if cache is None:
+            return self.create_header_set()
+        return cache.get(
+            (
+                type(self),
+                self.request.protocol,
+                self.request.host,
+                self.request.path == "/kaenguru-comics-alt",
+            ),
+            self.create_header_set,
         )
 
     @override
     def set_default_headers(self) -> None:
         """Set default headers."""
-        self.set_csp_header()
+        header_set = self.get_header_set()
+        self.set_csp_header(header_set)
         self.active_origin_trials = set()
-        if self.settings.get("REPORTING"):
-            endpoint = self.get_reporting_api_endpoint()
-            self.set_header(
-                "Reporting-Endpoints",
-                f'default="{endpoint}"',  # noqa: B907
-            )
-            self.set_header(
-                "Report-To",
-                json.dumps(
-                    {
-                        "group": "default",
-                        "max_age": 2592000,
-                        "endpoints": [{"url": endpoint}],
-                    },
-                    option=ORJSON_OPTIONS,
-                ),
-            )
-            self.set_header("NEL", '{"report_to":"default","max_age":2592000}')
-        self.set_header("X-Content-Type-Options", "nosniff")
-        self.set_header("Access-Control-Max-Age", "7200")
-        self.set_header("Access-Control-Allow-Origin", "*")
-        self.set_header("Access-Control-Allow-Headers", "*")
-        self.set_header(
-            "Access-Control-Allow-Methods",
-            ", ".join(self.get_allowed_methods()),
-        )
-        self.set_header("Cross-Origin-Resource-Policy", "cross-origin")
-        self.set_header(
-            "Permissions-Policy",
-            "browsing-topics=(),"
-            "identity-credentials-get=(),"
-            "join-ad-interest-group=(),"
-            "private-state-token-issuance=(),"
-            "private-state-token-redemption=(),"
-            "run-ad-auction=()",
-        )
-        self.set_header("Referrer-Policy", "same-origin")
-        self.set_header(
-            "Cross-Origin-Opener-Policy", "same-origin;report-to=default"
-        )
-        if self.request.path == "/kaenguru-comics-alt":  # TODO: improve this
-            self.set_header(
-                "Cross-Origin-Embedder-Policy",
-                "credentialless;report-to=default",
-            )
-        else:
-            self.set_header(
-                "Cross-Origin-Embedder-Policy",
-                "require-corp;report-to=default",
-            )
-        if self.settings.get("HSTS"):
-            self.set_header("Strict-Transport-Security", "max-age=63072000")
+        for name, value in header_set.headers:
+            self.set_header(name, value)
         if (
             onion_address := self.settings.get("ONION_ADDRESS")
         ) and not self.request.host_name.endswith(".onion"):
@@ -1145,11 +1192,6 @@ class BaseRequestHandler(_RequestHandler):
                 int(self.now_utc.microsecond) % len(CLACKS_OVERHEADS)
             ],
         )
-        self.set_header("Accept-CH", "Sec-CH-Prefers-Reduced-Motion")
-        self.set_header("Critical-CH", "Sec-CH-Prefers-Reduced-Motion")
-        self.set_header(
-            "Vary", "Accept,Authorization,Cookie,Sec-CH-Prefers-Reduced-Motion"
-        )
 
     set_default_headers.__doc__ = _RequestHandler.set_default_headers.__doc__
 
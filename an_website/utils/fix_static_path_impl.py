@@ -15,12 +15,14 @@
 
 import logging
 import os
-from collections.abc import Callable, Iterable, Mapping
+import sys
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from importlib.resources.abc import Traversable
 from pathlib import Path
 from types import MappingProxyType
-from typing import Final
+from typing import Any, Final
 
+import orjson as json
 from blake3 import blake3
 from openmoji_dist import VERSION as OPENMOJI_VERSION
 
@@ -29,6 +31,12 @@ if "STATIC_DIR" not in locals():
 
 LOGGER: Final = logging.getLogger(__name__)
 
+# created by scripts/compress_static_files.py
+MANIFEST_FILE_NAME: Final[str] = "static-manifest.json"
+MANIFEST_VERSION: Final[int] = 1
+
+UNHASHED_SUFFIXES: Final[tuple[str, ...]] = (".map", ".gz", ".zst")
+
 
 def recurse_directory(
     root: Traversable,
@@ -60,26 +68,128 @@ def hash_file(path: Traversable) -> str:
     return hasher.hexdigest(8)
 
 
+def load_manifest(root: Traversable) -> Mapping[str, Mapping[str, Any]]:
+    """Load the manifest of a static file directory."""
+    if sys.flags.dev_mode:  # the files change while developing
+        return {}
+    try:
+        manifest = json.loads((root / MANIFEST_FILE_NAME).read_bytes())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.exception("Failed to load the manifest of %s", root)
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        LOGGER.warning("Ignoring outdated manifest of %s", root)
+        return {}
+    files = {
+        path: entry
+        for path, entry in manifest["files"].items()
+        if manifest_entry_is_current(root, path, entry)
+    }
+    if len(files) != len(manifest["files"]):
+        LOGGER.warning(
+            "Ignoring %d changed files in the manifest of %s",
+            len(manifest["files"]) - len(files),
+            root,
+        )
+    return MappingProxyType(files)
+
+
+def manifest_entry_is_current(
+    root: Traversable, path: str, entry: Mapping[str, Any]
+) -> bool:
+    """Check whether the sizes in the manifest entry match the files."""
+    if not isinstance(root, Path):  # the files of a package don't change
+        return True
+    sizes: dict[str, int] = {path: entry["size"]}
+    for encoding, size in entry["variants"].items():
+        sizes[f"{path}.{encoding}"] = size
+    try:
+        return all(
+            (root / file).stat().st_size == size for file, size in sizes.items()
+        )
+    except FileNotFoundError:
+        return False
+
+
+class FileHashes(Mapping[str, str]):
+    """
+    The hashes of the files in a directory.
+
+    The hashes are taken from the manifest, the files that are missing in it
+    (or changed since it was created) get hashed when this is created.
+    """
+
+    __slots__ = ("aliases", "hashes", "prefix", "root")
+
+    aliases: Mapping[str, str]
+    hashes: dict[str, str]
+    prefix: str
+    root: Traversable
+
+    def __init__(
+        self,
+        root: Traversable,
+        prefix: str,
+        *,
+        aliases: Mapping[str, str] = MappingProxyType({}),
+        manifest: None | Mapping[str, Mapping[str, Any]] = None,
+    ) -> None:
+        """Initialize the file hashes with the hashes from the manifest."""
+        self.aliases = aliases
+        self.prefix = prefix
+        self.root = root
+        if manifest is None:
+            manifest = load_manifest(root)
+        self.hashes = {
+            f"{prefix}{path}": (
+                manifest[path]["hash"]
+                if path in manifest
+                else hash_file(root / path)
+            )
+            for path in recurse_directory(root, lambda path: path.is_file())
+            if not path.endswith(UNHASHED_SUFFIXES)
+        }
+
+    def __getitem__(self, key: str) -> str:
+        """Get the hash of a file."""
+        return self.hashes[self.aliases.get(key, key)]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys of the hashes."""
+        return iter(self.hashes)
+
+    def __len__(self) -> int:
+        """Return the count of the hashes."""
+        return len(self.hashes)
+
+
 def create_file_hashes_dict(
     filter_path_fun: Callable[[str], bool] | None = None,
 ) -> Mapping[str, str]:
     """Create a dict of file hashes."""
-    static = Path("/static")
-    file_hashes_dict = {
-        f"{(static / path).as_posix()}": hash_file(STATIC_DIR / path)
-        for path in recurse_directory(STATIC_DIR, lambda path: path.is_file())
-        if not path.endswith((".map", ".gz", ".zst"))
-        if filter_path_fun is None or filter_path_fun(path)
-    }
     if filter_path_fun is None:
-        file_hashes_dict["/favicon.png"] = file_hashes_dict[
-            "/static/favicon.png"
-        ]
-        file_hashes_dict["/favicon.jxl"] = file_hashes_dict[
-            "/static/favicon.jxl"
-        ]
-        file_hashes_dict["/humans.txt"] = file_hashes_dict["/static/humans.txt"]
-    return MappingProxyType(file_hashes_dict)
+        return FileHashes(
+            STATIC_DIR,
+            "/static/",
+            aliases={
+                "/favicon.png": "/static/favicon.png",
+                "/favicon.jxl": "/static/favicon.jxl",
+                "/humans.txt": "/static/humans.txt",
+            },
+        )
+    static = Path("/static")
+    return MappingProxyType(
+        {
+            f"{(static / path).as_posix()}": hash_file(STATIC_DIR / path)
+            for path in recurse_directory(
+                STATIC_DIR, lambda path: path.is_file()
+            )
+            if not path.endswith(UNHASHED_SUFFIXES)
+            if filter_path_fun(path)
+        }
+    )
 
 
 def fix_static_path_impl(path: str, file_hashes_dict: Mapping[str, str]) -> str:
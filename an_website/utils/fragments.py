@@ -0,0 +1,141 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The fragments of rendered pages.
+
+If a page gets requested in another format than HTML, the base template
+surrounds its blocks with FRAGMENT_BOUNDARY. The fragments can then be used
+without parsing the whole page.
+"""
+
+import secrets
+from collections.abc import Iterable
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Final, override
+
+# never sent to clients, so the content of a page can't contain it
+FRAGMENT_BOUNDARY: Final[str] = f"<!--{secrets.token_hex(16)}-->"
+
+FRAGMENT_CONTENT_TYPES: Final[frozenset[str]] = frozenset(
+    {
+        "application/vnd.asozial.dynload+json",
+        "text/markdown",
+        "text/plain",
+    }
+)
+
+# the tags that have to be collected from the body
+_BODY_TAGS: Final[tuple[str, ...]] = ("<link", "<script", "<style")
+
+
+@dataclass(slots=True)
+class PageFragments:
+    """The fragments of a page rendered with the base template."""
+
+    body: str
+    """The content of the main element."""
+    others: tuple[str, ...] = ()
+    """The head, the stylesheets and the rest of the page, in order."""
+
+    @classmethod
+    def from_page(cls, page: str) -> PageFragments:
+        """Split a rendered page into its fragments."""
+        parts = page.split(FRAGMENT_BOUNDARY)
+        if len(parts) != 7:  # not rendered with the base template
+            return cls(page)
+        pre_head, head, pre_stylesheets, stylesheets, pre_body, body, post = (
+            parts
+        )
+        return cls(
+            body.strip(),
+            (pre_head, head, pre_stylesheets, stylesheets, pre_body, post),
+        )
+
+    def get_resources(self) -> PageResources:
+        """Get the scripts and the styles of the page."""
+        resources = PageResources()
+        # the body is after everything except the end of the page
+        resources.feed_all(self.others[:-1])
+        if any(tag in self.body for tag in _BODY_TAGS):
+            resources.feed(self.body)
+        resources.feed_all(self.others[-1:])
+        resources.close()
+        return resources
+
+    def get_text(self) -> str:
+        """Get the text of the page without scripts and styles."""
+        resources = PageResources()
+        resources.feed_all((*self.others[:-1], self.body, *self.others[-1:]))
+        resources.close()
+        return "\n".join(resources.text)
+
+
+class PageResources(HTMLParser):
+    """Collect the scripts, stylesheets, styles and text of HTML fragments."""
+
+    _current: None | str
+    scripts: list[dict[str, None | str]]
+    styles: list[str]
+    stylesheets: list[None | str]
+    text: list[str]
+
+    def __init__(self) -> None:
+        """Initialize the parser."""
+        super().__init__()
+        self._current = None
+        self.scripts = []
+        self.styles = []
+        self.stylesheets = []
+        self.text = []
+
+    def feed_all(self, fragments: Iterable[str]) -> None:
+        """Feed all the fragments."""
+        for fragment in fragments:
+            self.feed(fragment)
+
+    @override
+    def handle_data(self, data: str) -> None:
+        """Handle the text and the content of scripts and styles."""
+        if self._current == "script":
+            self.scripts[-1]["script"] = (
+                self.scripts[-1]["script"] or ""
+            ) + data
+        elif self._current == "style":
+            self.styles[-1] += data
+        elif data := data.strip():
+            self.text.append(data)
+
+    @override
+    def handle_endtag(self, tag: str) -> None:
+        """Handle the end of scripts and styles."""
+        if tag == self._current:
+            self._current = None
+
+    @override
+    def handle_starttag(
+        self, tag: str, attrs: list[tuple[str, None | str]]
+    ) -> None:
+        """Handle the start of scripts, styles and stylesheets."""
+        attributes = {key: value or "" for key, value in attrs}
+        if tag == "script":
+            self._current = tag
+            self.scripts.append({"script": None, **attributes})
+        elif tag == "style":
+            self._current = tag
+            self.styles.append("")
+        elif (
+            tag == "link" and "stylesheet" in attributes.get("rel", "").split()
+        ):
+            self.stylesheets.append(attributes.get("href"))
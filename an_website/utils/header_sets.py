@@ -0,0 +1,86 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The default headers that are the same for similar requests."""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Final
+
+NONCE_PLACEHOLDER: Final[str] = "\0nonce\0"
+
+
+@dataclass(frozen=True, slots=True)
+class HeaderSet:
+    """The precomputed default headers of a request."""
+
+    csp_prefix: str
+    """The Content-Security-Policy before the nonce."""
+    csp_suffix: str
+    """The Content-Security-Policy after the nonce."""
+    headers: tuple[tuple[str, str], ...]
+    """The other headers in the order they should be set."""
+
+    @classmethod
+    def create(cls, csp: str, headers: dict[str, str]) -> HeaderSet:
+        """Create a header set from a CSP containing NONCE_PLACEHOLDER."""
+        csp_prefix, csp_suffix = csp.split(NONCE_PLACEHOLDER)
+        return cls(csp_prefix, csp_suffix, tuple(headers.items()))
+
+    def get_csp(self, nonce: str) -> str:
+        """Get the Content-Security-Policy with the nonce."""
+        return f"{self.csp_prefix}{nonce}{self.csp_suffix}"
+
+
+class HeaderSetCache:
+    """
+    Cache the header sets of the recently used keys.
+
+    The header sets depend on the settings of the application, so
+    invalidate has to be called whenever the settings change.
+    """
+
+    __slots__ = ("_header_sets", "hits", "max_size", "misses")
+
+    _header_sets: OrderedDict[Hashable, HeaderSet]
+    hits: int
+    max_size: int
+    misses: int
+
+    def __init__(self, max_size: int = 256) -> None:
+        """Initialize the empty cache."""
+        self._header_sets = OrderedDict()
+        self.hits = 0
+        self.max_size = max_size
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Get the count of the cached header sets."""
+        return len(self._header_sets)
+
+    def get(self, key: Hashable, create: Callable[[], HeaderSet]) -> HeaderSet:
+        """Get the header set of the key, create it if it isn't cached."""
+        if (header_set := self._header_sets.get(key)) is not None:
+            self.hits += 1
+            self._header_sets.move_to_end(key)
+            return header_set
+        self.misses += 1
+        header_set = self._header_sets[key] = create()
+        while len(self) > self.max_size:  # pylint: disable=while-used
+            self._header_sets.popitem(last=False)
+        return header_set
+
+    def invalidate(self) -> None:
+        """Forget all header sets, because the settings have changed."""
+        self._header_sets.clear()
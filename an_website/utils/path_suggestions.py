@@ -0,0 +1,178 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Suggest known paths for unknown paths."""
+
+import logging
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from typing import Final
+
+from rapidfuzz.distance.Levenshtein import distance
+
+LOGGER: Final = logging.getLogger(__name__)
+
+
+class BKNode:
+    """A node of a BK-tree."""
+
+    __slots__ = ("children", "max_length", "min_length", "word")
+
+    children: dict[int, BKNode]
+    max_length: int
+    min_length: int
+    word: str
+
+    def __init__(self, word: str) -> None:
+        """Initialize the node without children."""
+        self.children = {}
+        self.max_length = self.min_length = len(word)
+        self.word = word
+
+
+class BKTree:
+    """
+    A BK-tree of strings, ordered by their Levenshtein distance.
+
+    Every node knows the lengths of the words below it, so subtrees with only
+    too short or too long words can be skipped.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    _root: None | BKNode
+    _size: int
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        """Initialize the tree with the words."""
+        self._root = None
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        """Get the count of the words in the tree."""
+        return self._size
+
+    def add(self, word: str) -> None:
+        """Add a word to the tree."""
+        if self._root is None:
+            self._root = BKNode(word)
+            self._size = 1
+            return
+        path = [self._root]
+        # pylint: disable-next=while-used
+        while dist := distance(word, path[-1].word):
+            if dist not in path[-1].children:
+                path[-1].children[dist] = BKNode(word)
+                self._size += 1
+                for node in path:
+                    node.min_length = min(node.min_length, len(word))
+                    node.max_length = max(node.max_length, len(word))
+                return
+            path.append(path[-1].children[dist])
+
+    def find_closest(self, word: str, cutoff: float = 0.5) -> None | str:
+        """
+        Find the closest word relative to the length of the words.
+
+        This returns the same as get_close_matches(word, words, 1, cutoff)
+        for cutoffs below 1, but only visits the parts of the tree that can
+        contain a match.
+        """
+        if not word or self._root is None or not 0.0 <= cutoff < 1.0:
+            return None
+        best: None | tuple[float, str] = None
+        ratio = cutoff
+        stack = [self._root]
+        while stack:  # pylint: disable=while-used
+            node = stack.pop()
+            dist = distance(word, node.word)
+            if max_dist := max(len(word), len(node.word)):
+                candidate = (dist / max_dist, node.word)
+                if candidate[0] <= ratio and (best is None or candidate < best):
+                    best = candidate
+                    ratio = candidate[0]
+            # a word with the distance d can only have a ratio ≤ the best one
+            # if |len(word) - len(other)| ≤ d ≤ ratio * max(len(word), len(other))
+            radius = ratio * len(word) / (1 - ratio) + 1e-9
+            min_length = len(word) * (1 - ratio) - 1e-9
+            stack.extend(
+                child
+                for edge, child in node.children.items()
+                if abs(edge - dist) <= radius
+                if child.max_length >= min_length
+                if child.min_length <= len(word) + radius
+            )
+        return None if best is None else best[1]
+
+
+class PathSuggestions:
+    """
+    Find the known path an unknown path probably should have been.
+
+    The index is built once from the normalized paths, the suggestions for
+    the recently requested unknown paths are cached.
+    """
+
+    __slots__ = ("_cache", "_prefixes", "_tree", "cache_size", "paths")
+
+    _cache: OrderedDict[str, None | str]
+    _prefixes: dict[str, str]
+    _tree: BKTree
+    cache_size: int
+    paths: Mapping[str, str]
+
+    def __init__(
+        self, paths: Mapping[str, str], cache_size: int = 1024
+    ) -> None:
+        """Build the index of the normalized paths."""
+        self._cache = OrderedDict()
+        self._prefixes = {
+            path: replacement
+            for path, replacement in paths.items()
+            if f"/{path}" != replacement.lower()
+            if path != "api"  # api should not be a prefix
+        }
+        self._tree = BKTree(sorted(paths))
+        self.cache_size = cache_size
+        self.paths = paths
+
+    def _find_suggestion(self, path: str) -> None | str:
+        """Find the suggestion for a normalized path without the cache."""
+        prefixes = tuple(
+            (path[:index], self._prefixes[path[:index]])
+            for index, char in enumerate(path)
+            if char == "/"
+            if path[:index] in self._prefixes
+        )
+        if len(prefixes) == 1:
+            ((prefix, replacement),) = prefixes
+            return f"{replacement.strip('/')}{path.removeprefix(prefix)}"
+        if prefixes:
+            LOGGER.error("Too many prefixes %r for path %s", prefixes, path)
+
+        if match := self._tree.find_closest(path):
+            return self.paths[match]
+        return None
+
+    def suggest(self, path: str) -> None | str:
+        """Get the path to redirect a normalized unknown path to."""
+        if path in self._cache:
+            self._cache.move_to_end(path)
+            return self._cache[path]
+        suggestion = self._find_suggestion(path)
+        self._cache[path] = suggestion
+        while len(self._cache) > self.cache_size:  # pylint: disable=while-used
+            self._cache.popitem(last=False)
+        return suggestion
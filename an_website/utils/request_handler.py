@@ -27,12 +27,8 @@ import regex
 from tornado.web import HTTPError
 
 from .base_request_handler import BaseRequestHandler
-from .utils import (
-    SUS_PATHS,
-    get_close_matches,
-    remove_suffix_ignore_case,
-    replace_umlauts,
-)
+from .path_suggestions import PathSuggestions
+from .utils import SUS_PATHS, remove_suffix_ignore_case, replace_umlauts
 
 LOGGER: Final = logging.getLogger(__name__)
 
@@ -102,33 +98,11 @@ class NotFoundHandler(BaseRequestHandler):
         if len(this_path_normalized) <= 1 and self.request.path != "/":
             return self.redirect(self.fix_url(new_path="/"))
 
-        prefixes = tuple(
-            (p, repl)
-            for p, repl in paths.items()
-            if this_path_normalized.startswith(f"{p}/")
-            if f"/{p}" != repl.lower()
-            if p != "api"  # api should not be a prefix
+        suggestions: None | PathSuggestions = self.settings.get(
+            "PATH_SUGGESTIONS"
         )
-
-        if len(prefixes) == 1:
-            ((prefix, replacement),) = prefixes
-            return self.redirect(
-                self.fix_url(
-                    new_path=f"{replacement.strip('/')}"
-                    f"{this_path_normalized.removeprefix(prefix)}"
-                ),
-                False,
-            )
-        if prefixes:
-            LOGGER.error(
-                "Too many prefixes %r for path %s", prefixes, self.request.path
-            )
-
-        matches = get_close_matches(this_path_normalized, paths, count=1)
-        if matches:
-            return self.redirect(
-                self.fix_url(new_path=paths[matches[0]]), False
-            )
+        if suggestions and (p := suggestions.suggest(this_path_normalized)):
+            return self.redirect(self.fix_url(new_path=p), False)
 
         self.set_status(404)
         self.write_error(404)
@@ -11,19 +11,30 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-"""Module used for easy and simple searching in O(n) complexity."""
+"""Module used for easy and simple searching."""
 
 import dataclasses
-from collections.abc import Callable, Iterable, Iterator, Sequence
-from typing import Generic, NoReturn, TypeVar
+import heapq
+from collections.abc import (
+    Callable,
+    Collection,
+    Hashable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from typing import Any, Final, Generic, NoReturn, TypeVar
 
 import regex as re
 from typed_stream import Stream
 
+K = TypeVar("K", bound=Hashable)
 T = TypeVar("T")
 U = TypeVar("U")
 V = TypeVar("V")
 
+NGRAM_LENGTH: Final[int] = 3
+
 
 class Query:
     """Class representing a query."""
@@ -130,23 +141,215 @@ class DataProvider(Generic[T, U]):
         """Return the data."""
         return self._data if isinstance(self._data, Iterable) else self._data()
 
+    def convert(self, value: T) -> U:
+        """Convert a found value."""
+        return self._convert(value)
+
     def search(
         self, query: Query, excl_min_score: float = 0.0
     ) -> Iterator[ScoredValue[U]]:
         """Search this."""
+        for scored_value in self.search_unconverted(query, excl_min_score):
+            yield ScoredValue(
+                scored_value.score, self._convert(scored_value.value)
+            )
+
+    def search_unconverted(
+        self, query: Query, excl_min_score: float = 0.0
+    ) -> Iterator[ScoredValue[T]]:
+        """Search this without converting the values."""
         for value in self.data:
             score = query.score(self._value_to_fields(value))
             if score > excl_min_score:
-                yield ScoredValue(score, self._convert(value))
+                yield ScoredValue(score, value)
+
+
+def ngrams(string: str, length: int = NGRAM_LENGTH) -> set[str]:
+    """Get all the substrings with the length of a string."""
+    return {string[i : i + length] for i in range(len(string) - length + 1)}
+
+
+class SearchIndex(Generic[K, T]):
+    """
+    An inverted n-gram index.
+
+    Only documents that contain all the n-grams of a word of the query get
+    scored, the scores are the same as without the index.
+    """
+
+    __slots__ = ("_documents", "_key", "_postings")
+
+    _documents: dict[K, tuple[tuple[str, ...], tuple[str, ...], T]]
+    _key: Callable[[T], str | tuple[str, ...]]
+    _postings: dict[str, set[K]]
+
+    def __init__(
+        self,
+        key: Callable[[T], str | tuple[str, ...]],
+        items: Iterable[tuple[K, T]] = (),
+    ) -> None:
+        """Initialize this."""
+        self._documents = {}
+        self._key = key
+        self._postings = {}
+        for id_, value in items:
+            self.add(id_, value)
+
+    def __len__(self) -> int:
+        """Return the count of the documents."""
+        return len(self._documents)
+
+    def _get_fields(self, value: T) -> tuple[str, ...]:
+        """Get the fields of a value."""
+        return (
+            fields
+            if isinstance(fields := self._key(value), tuple)
+            else (fields,)
+        )
+
+    def add(self, id_: K, value: T) -> None:
+        """Add a document to the index, replacing the old one."""
+        self.remove(id_)
+        fields = self._get_fields(value)
+        lower_fields = tuple(field.lower() for field in fields)
+        self._documents[id_] = (fields, lower_fields, value)
+        for field in lower_fields:
+            for ngram in ngrams(field):
+                self._postings.setdefault(ngram, set()).add(id_)
+
+    def candidates(self, query: Query) -> Collection[K]:
+        """Get the ids of all the documents that could match the query."""
+        if not query.words or any(
+            len(word) < NGRAM_LENGTH for word in query.words
+        ):
+            return self._documents.keys()
+        candidates: set[K] = set()
+        for word in query.words:
+            postings = sorted(
+                (self._postings.get(ngram, set()) for ngram in ngrams(word)),
+                key=len,
+            )
+            candidates.update(postings[0].intersection(*postings[1:]))
+        return candidates
+
+    def remove(self, id_: K) -> None:
+        """Remove a document from the index."""
+        if (document := self._documents.pop(id_, None)) is None:
+            return
+        for field in document[1]:
+            for ngram in ngrams(field):
+                if postings := self._postings.get(ngram):
+                    postings.discard(id_)
+                    if not postings:
+                        del self._postings[ngram]
+
+    def search(
+        self, query: Query, excl_min_score: float = 0.0
+    ) -> Iterator[ScoredValue[T]]:
+        """Search the documents in the index."""
+        for id_ in self.candidates(query):
+            _, lower_fields, value = self._documents[id_]
+            score = query.score(lower_fields)
+            if score > excl_min_score:
+                yield ScoredValue(score, value)
+
+    def sync(self, items: Iterable[tuple[K, T]]) -> int:
+        """Update the index to only contain the items, return the changes."""
+        added: list[K] = []
+        seen: set[K] = set()
+        for id_, value in items:
+            seen.add(id_)
+            document = self._documents.get(id_)
+            if document is not None and document[0] == self._get_fields(value):
+                if document[2] is not value:
+                    self._documents[id_] = (document[0], document[1], value)
+                continue
+            self.add(id_, value)
+            added.append(id_)
+        removed = self._documents.keys() - seen
+        for id_ in removed:
+            self.remove(id_)
+        return len(added) + len(removed)
+
+
+class IndexedDataProvider(Generic[T, U]):
+    """Provide data from a SearchIndex."""
+
+    __slots__ = ("_convert", "_index")
+
+    _convert: Callable[[T], U]
+    _index: SearchIndex[Any, T] | Callable[[], SearchIndex[Any, T]]
+
+    def __init__(
+        self,
+        index: SearchIndex[Any, T] | Callable[[], SearchIndex[Any, T]],
+        convert: Callable[[T], U],
+    ) -> None:
+        """Initialize this."""
+        self._convert = convert
+        self._index = index
+
+    def convert(self, value: T) -> U:
+        """Convert a found value."""
+        return self._convert(value)
+
+    @property
+    def index(self) -> SearchIndex[Any, T]:
+        """Return the index."""
+        return (
+            self._index
+            if isinstance(self._index, SearchIndex)
+            else self._index()
+        )
+
+    def search(
+        self, query: Query, excl_min_score: float = 0.0
+    ) -> Iterator[ScoredValue[U]]:
+        """Search this."""
+        for scored_value in self.search_unconverted(query, excl_min_score):
+            yield ScoredValue(
+                scored_value.score, self._convert(scored_value.value)
+            )
+
+    def search_unconverted(
+        self, query: Query, excl_min_score: float = 0.0
+    ) -> Iterator[ScoredValue[T]]:
+        """Search this without converting the values."""
+        return self.index.search(query, excl_min_score)
 
 
 def search(
     query: Query,
-    *providers: DataProvider[object, T],
+    *providers: DataProvider[object, T] | IndexedDataProvider[object, T],
     excl_min_score: float = 0.0,
+    limit: None | int = None,
 ) -> list[ScoredValue[T]]:
-    """Search through data."""
-    return sorted(
-        Stream(providers).flat_map(lambda x: x.search(query, excl_min_score)),
-        key=lambda sv: sv.score,
+    """
+    Search through data.
+
+    Without a limit all the results are returned in ascending order,
+    with a limit only the best results are converted and returned in
+    descending order.
+    """
+    if limit is None:
+        return sorted(
+            Stream(providers).flat_map(
+                lambda x: x.search(query, excl_min_score)
+            ),
+            key=lambda sv: sv.score,
+        )
+    best = heapq.nlargest(
+        limit,
+        (
+            (scored_value, provider)
+            for provider in providers
+            for scored_value in provider.search_unconverted(
+                query, excl_min_score
+            )
+        ),
+        key=lambda item: item[0].score,
     )
+    return [
+        ScoredValue(scored_value.score, provider.convert(scored_value.value))
+        for scored_value, provider in best
+    ]
@@ -14,11 +14,22 @@
 
 """A static file handler for the Traversable abc."""
 
+import asyncio
 import contextlib
 import logging
+import os
 import sys
-from collections.abc import Awaitable, Iterable, Mapping, Sequence
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from dataclasses import dataclass
+from functools import cache
 from importlib.resources.abc import Traversable
+from pathlib import Path
 from types import MappingProxyType
 from typing import Any, Final, Literal, override
 from urllib.parse import urlsplit, urlunsplit
@@ -30,6 +41,7 @@ from typed_stream import Stream
 from an_website.utils.utils import size_of_file
 
 from .base_request_handler import _RequestHandler
+from .fix_static_path_impl import load_manifest
 from .static_file_handling import content_type_from_path
 
 type Encoding = Literal["gz", "zst"]
@@ -45,6 +57,94 @@ REVERSE_ENCODINGS_MAP: Mapping[Encoding, str] = {
     value: key for key, value in ENCODINGS
 }
 
+CHUNK_SIZE: Final[int] = 64 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class StaticFile:
+    """A resolved static file with everything needed to serve it."""
+
+    content_type: None | str
+    # the available encodings (None is the uncompressed file) with the size
+    variants: Mapping[None | Encoding, tuple[Traversable, int]]
+
+
+def resolve_static_file(root: Traversable, path: str) -> None | StaticFile:
+    """Resolve a static file, return None if it doesn't exist."""
+    absolute_path = root / path
+    if not absolute_path.is_file():
+        return None
+    variants: dict[None | Encoding, tuple[Traversable, int]] = {
+        None: (absolute_path, size_of_file(absolute_path))
+    }
+    for _, encoding in ENCODINGS:
+        compressed_path = root / f"{path}.{encoding}"
+        if compressed_path.is_file():
+            variants[encoding] = (
+                compressed_path,
+                size_of_file(compressed_path),
+            )
+    return StaticFile(
+        content_type_from_path(path, absolute_path),
+        MappingProxyType(variants),
+    )
+
+
+class StaticFileManifest:
+    """The static files of a root directory, every file is resolved once."""
+
+    __slots__ = ("entries", "files", "root")
+
+    entries: Mapping[str, Mapping[str, Any]]
+    files: dict[str, StaticFile]
+    root: Traversable
+
+    def __init__(
+        self,
+        root: Traversable,
+        entries: Mapping[str, Mapping[str, Any]] = MappingProxyType({}),
+    ) -> None:
+        """Initialize the manifest with the entries from the build."""
+        self.entries = entries
+        self.files = {}
+        self.root = root
+
+    def get(self, path: str) -> None | StaticFile:
+        """Get a static file, missing files aren't remembered."""
+        if (file := self.files.get(path)) is None:
+            if path in self.entries:
+                file = self.resolve_from_entry(path, self.entries[path])
+            else:
+                file = resolve_static_file(self.root, path)
+            if file is not None:
+                self.files[path] = file
+        return file
+
+    def resolve_from_entry(
+        self, path: str, entry: Mapping[str, Any]
+    ) -> StaticFile:
+        """Resolve a static file without touching the file system."""
+        absolute_path = self.root / path
+        variants: dict[None | Encoding, tuple[Traversable, int]] = {
+            None: (absolute_path, entry["size"])
+        }
+        for _, encoding in ENCODINGS:
+            if encoding in entry["variants"]:
+                variants[encoding] = (
+                    self.root / f"{path}.{encoding}",
+                    entry["variants"][encoding],
+                )
+        return StaticFile(
+            content_type_from_path(path, absolute_path, entry.get("type")),
+            MappingProxyType(variants),
+        )
+
+
+@cache
+def get_manifest(root: Traversable) -> StaticFileManifest:
+    """Get the manifest for a root directory."""
+    return StaticFileManifest(root, load_manifest(root))
+
 
 class TraversableStaticFileHandler(_RequestHandler):
     """A static file handler for the Traversable abc."""
@@ -52,6 +152,7 @@ class TraversableStaticFileHandler(_RequestHandler):
     root: Traversable
     file_hashes: Mapping[str, str] = {}
     headers: Iterable[tuple[str, str]] = ()
+    immutable: bool = True
 
     @override
     def compute_etag(self) -> None | str:
@@ -68,10 +169,13 @@ class TraversableStaticFileHandler(_RequestHandler):
         if path.startswith("/") or ".." in path.split("/") or "//" in path:
             raise HTTPError(404)
 
-        absolute_path, encoding = self.get_absolute_path_encoded(path)
+        for transform in self._transforms:
+            if isinstance(transform, GZipContentEncoding):
+                # pylint: disable=protected-access
+                transform._gzipping = False
 
-        if not absolute_path.is_file():
-            if self.get_absolute_path(path.lower()).is_file():
+        if not (file := self.get_static_file(path)):
+            if self.get_static_file(path.lower()):
                 if self.request.path.endswith(path):
                     self.replace_path_with_redirect(
                         self.request.path.removesuffix(path) + path.lower()
@@ -82,14 +186,15 @@ class TraversableStaticFileHandler(_RequestHandler):
                 )
             raise HTTPError(404)
 
+        encoding = self.get_encoding(file)
+        absolute_path, size = file.variants[encoding]
+
         self.set_header("Accept-Ranges", "bytes")
 
         if encoding:
             self.set_header("Content-Encoding", REVERSE_ENCODINGS_MAP[encoding])
-        if content_type := self.get_content_type(
-            path, self.get_absolute_path(path)
-        ):
-            self.set_header("Content-Type", content_type)
+        if file.content_type:
+            self.set_header("Content-Type", file.content_type)
         del path
 
         request_range = None
@@ -100,8 +205,6 @@ class TraversableStaticFileHandler(_RequestHandler):
             # pylint: disable-next=protected-access
             request_range = httputil._parse_request_range(range_header)
 
-        size: int = size_of_file(absolute_path)
-
         if request_range:
             start, end = request_range
             if start is not None and start < 0:
@@ -147,7 +250,9 @@ class TraversableStaticFileHandler(_RequestHandler):
             await self.finish()
             return
 
-        for chunk in self.get_content(absolute_path, start=start, end=end):
+        async for chunk in self.get_content_async(
+            absolute_path, start=start, end=end
+        ):
             self.write(chunk)
             try:
                 await self.flush()
@@ -168,35 +273,36 @@ class TraversableStaticFileHandler(_RequestHandler):
         """Get the absolute path of a file."""
         return self.root / path
 
-    def get_absolute_path_encoded(
-        self, path: str
-    ) -> tuple[Traversable, Encoding | None]:
-        """Get the absolute path and the encoding."""
-        for transform in self._transforms:
-            if isinstance(transform, GZipContentEncoding):
-                # pylint: disable=protected-access
-                transform._gzipping = False
-
-        accepted_encodings: frozenset[str] = (
-            Stream(self.request.headers.get_list("Accept-Encoding"))
-            .flat_map(str.split, ",")
-            .map(lambda string: string.split(";")[0])  # ignore quality specs
-            .map(str.strip)
-            .collect(frozenset)
-        )
-
-        absolute_path = self.get_absolute_path(path)
-        encoding: Encoding | None = None
-
-        for key, encoding in ENCODINGS:
-            if key in accepted_encodings:
-                compressed_path = self.get_absolute_path(f"{path}.{encoding}")
-                if compressed_path.is_file():
-                    absolute_path = compressed_path
-                    break
-            encoding = None  # pylint: disable=redefined-loop-name
+    @classmethod
+    async def get_content_async(
+        cls,
+        abspath: Traversable,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Read the content of a file in chunks without blocking the loop."""
+        if not isinstance(abspath, Path):
+            # e.g. a file in a zipapp, there is no file descriptor to read from
+            for chunk in cls.get_content(abspath, start=start, end=end):
+                yield chunk
+            return
 
-        return absolute_path, encoding
+        file = await asyncio.to_thread(abspath.open, "rb", buffering=0)
+        with file:
+            if end is None:
+                end = os.fstat(file.fileno()).st_size
+            position = start or 0
+            while position < end:  # pylint: disable=while-used
+                chunk = await asyncio.to_thread(
+                    os.pread,
+                    file.fileno(),
+                    min(CHUNK_SIZE, end - position),
+                    position,
+                )
+                if not chunk:
+                    return
+                position += len(chunk)
+                yield chunk
 
     @classmethod
     def get_content(
@@ -214,7 +320,7 @@ class TraversableStaticFileHandler(_RequestHandler):
             )
 
             while True:  # pylint: disable=while-used
-                chunk_size = 64 * 1024
+                chunk_size = CHUNK_SIZE
                 if remaining is not None and remaining < chunk_size:
                     chunk_size = remaining
                 chunk = file.read(chunk_size)
@@ -226,12 +332,30 @@ class TraversableStaticFileHandler(_RequestHandler):
                     assert not remaining
                     return
 
-    @classmethod
-    def get_content_type(
-        cls, path: str, absolute_path: Traversable
-    ) -> str | None:
-        """Get the content-type of a file."""
-        return content_type_from_path(path, absolute_path)
+    def get_encoding(self, file: StaticFile) -> Encoding | None:
+        """Get the best encoding of the file the client accepts."""
+        if len(file.variants) == 1:
+            return None
+
+        accepted_encodings: frozenset[str] = (
+            Stream(self.request.headers.get_list("Accept-Encoding"))
+            .flat_map(str.split, ",")
+            .map(lambda string: string.split(";")[0])  # ignore quality specs
+            .map(str.strip)
+            .collect(frozenset)
+        )
+
+        for key, encoding in ENCODINGS:
+            if key in accepted_encodings and encoding in file.variants:
+                return encoding
+
+        return None
+
+    def get_static_file(self, path: str) -> None | StaticFile:
+        """Get the resolved static file (not cached while developing)."""
+        if self.immutable and not sys.flags.dev_mode:
+            return get_manifest(self.root).get(path)
+        return resolve_static_file(self.root, path)
 
     def head(self, path: str) -> Awaitable[None]:
         """Handle HEAD requests for files in the static file directory."""
@@ -242,11 +366,13 @@ class TraversableStaticFileHandler(_RequestHandler):
         root: Traversable,
         hashes: Mapping[str, str] = MappingProxyType({}),
         headers: Iterable[tuple[str, str]] = (),
+        immutable: bool = True,
     ) -> None:
         """Initialize this handler with a root directory and file hashes."""
         self.root = root
         self.file_hashes = hashes
         self.headers = headers
+        self.immutable = immutable
         for name, value in headers:
             self.set_header(name, value)
         if not sys.flags.dev_mode:
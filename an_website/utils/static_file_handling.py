@@ -29,6 +29,7 @@ from openmoji_dist import get_openmoji_data
 
 from .. import DIR as ROOT_DIR, STATIC_DIR
 from .fix_static_path_impl import (
+    FileHashes,
     create_file_hashes_dict,
     fix_static_path_impl,
 )
@@ -37,6 +38,9 @@ from .utils import Handler
 LOGGER: Final = logging.getLogger(__name__)
 
 FILE_HASHES_DICT: Final[Mapping[str, str]] = create_file_hashes_dict()
+OPENMOJI_FILE_HASHES: Final[Mapping[str, str]] = FileHashes(
+    get_openmoji_data(), "/static/openmoji/", manifest={}
+)
 
 CONTENT_TYPES: Final[Mapping[str, str]] = json.loads(
     (ROOT_DIR / "vendored" / "media-types.json").read_bytes()
@@ -59,12 +63,12 @@ def get_handlers() -> list[Handler]:
         (
             r"/static/openmoji/(svg/[1-9A-F-]+\.svg)",
             NoRatelimitTraversableStaticFileHandler,
-            {"root": get_openmoji_data(), "hashes": {}},
+            {"root": get_openmoji_data(), "hashes": OPENMOJI_FILE_HASHES},
         ),
         (
             "/static/openmoji/(.*)",
             TraversableStaticFileHandler,
-            {"root": get_openmoji_data(), "hashes": {}},
+            {"root": get_openmoji_data(), "hashes": OPENMOJI_FILE_HASHES},
         ),
         (
             r"(?:/static)?/(\.env|favicon\.(?:png|jxl)|humans\.txt|robots\.txt|llms\.txt)",
@@ -117,9 +121,13 @@ def fix_static_path(path: str) -> str:
     return fix_static_path_impl(path, FILE_HASHES_DICT)
 
 
-def content_type_from_path(url_path: str, file: Traversable) -> str | None:
+def content_type_from_path(
+    url_path: str, file: Traversable, media_type: None | str = None
+) -> str | None:
     """Extract the Content-Type from a path."""
-    content_type: str | None = CONTENT_TYPES.get(Path(url_path).suffix[1:])
+    content_type: str | None = media_type or CONTENT_TYPES.get(
+        Path(url_path).suffix[1:]
+    )
     if not content_type:
         with file.open("rb") as io:
             content_type = defity.from_file(io)
@@ -23,6 +23,7 @@ import random
 import sys
 import time
 from base64 import b85encode
+from collections import OrderedDict
 from collections.abc import (
     Awaitable,
     Callable,
@@ -35,7 +36,7 @@ from collections.abc import (
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import IntFlag
-from functools import cache, partial
+from functools import cache, lru_cache, partial
 from hashlib import sha1
 from importlib.resources.abc import Traversable
 from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
@@ -57,10 +58,14 @@ import regex
 from blake3 import blake3
 from elastic_transport import ApiError, TransportError
 from elasticsearch import AsyncElasticsearch
-from geoip import geolite2  # type: ignore[import-untyped]
+from geoip import (  # type: ignore[import-untyped]
+    geolite2,
+    open_database,
+)
 from openmoji_dist import VERSION as OPENMOJI_VERSION
 from rapidfuzz.distance.Levenshtein import distance
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 from tornado.web import HTTPError, RequestHandler
 from typed_stream import Stream
 from UltraDict import UltraDict  # type: ignore[import-untyped]
@@ -148,6 +153,69 @@ class AwaitableValue[T](Awaitable[T]):
         self._value = value
 
 
+class LatencyHistogram:
+    """Histogram of durations in seconds with fixed bucket bounds."""
+
+    __slots__ = ("bounds", "count", "counts", "total")
+
+    bounds: tuple[float, ...]
+    count: int
+    counts: list[int]
+    total: float
+
+    def __init__(
+        self,
+        bounds: Iterable[float] = (
+            0.001,
+            0.0025,
+            0.005,
+            0.01,
+            0.025,
+            0.05,
+            0.1,
+            0.25,
+            0.5,
+            1,
+            2.5,
+            5,
+            10,
+        ),
+    ) -> None:
+        """Initialize the empty histogram."""
+        self.bounds = tuple(sorted(bounds))
+        self.count = 0
+        # the last bucket counts everything above the highest bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+
+    def observe(self, seconds: float) -> None:
+        """Count a duration."""
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, quantile: float) -> float:
+        """Get the upper bound of the bucket containing the quantile."""
+        rank = quantile * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts, strict=False):
+            seen += count
+            if seen and seen >= rank:
+                return bound
+        return float("inf") if self.counts[-1] else 0
+
+    def to_dict(self) -> dict[str, int | float]:
+        """Get the cumulative counts of the buckets like Prometheus does."""
+        result: dict[str, int | float] = {}
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts, strict=False):
+            seen += count
+            result[f"le_{bound:g}"] = seen
+        result["le_inf"] = self.count
+        result["sum"] = self.total
+        return result
+
+
 class Permission(IntFlag):
     """Permissions for accessing restricted stuff."""
 
@@ -389,57 +457,149 @@ EMOJI_MAPPING: Final[Mapping[str, str]] = {
 }
 
 
+GEOIP_PROPERTIES: Final[Mapping[str, None | tuple[str, ...]]] = {
+    "GeoLite2-City.mmdb": (
+        "continent_name",
+        "country_iso_code",
+        "country_name",
+        "region_iso_code",
+        "region_name",
+        "city_name",
+        "location",
+        "timezone",
+    ),
+    "GeoLite2-Country.mmdb": (
+        "continent_name",
+        "country_iso_code",
+        "country_name",
+    ),
+    "GeoLite2-ASN.mmdb": ("asn", "network", "organization_name"),
+}
+
+
+class GeoIPCache:
+    """A bounded cache for GeoIP information with a local and a shared tier."""
+
+    __slots__ = (
+        "hits",
+        "local",
+        "local_size",
+        "misses",
+        "negative_ttl",
+        "shared",
+        "shared_size",
+        "ttl",
+    )
+
+    hits: int
+    local: OrderedDict[str, tuple[float, None | dict[str, Any]]]
+    local_size: int
+    misses: int
+    negative_ttl: int
+    shared: UltraDict
+    shared_size: int
+    ttl: int
+
+    def __init__(
+        self,
+        *,
+        local_size: int = 1024,
+        shared_size: int = 16384,
+        ttl: int = 60 * 60 * 24,
+        negative_ttl: int = 60 * 60,
+    ) -> None:
+        """Initialize the cache."""
+        self.hits = 0
+        self.misses = 0
+        self.local = OrderedDict()
+        self.local_size = local_size
+        self.shared = UltraDict()
+        self.shared_size = shared_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def _put_local(
+        self, key: str, entry: tuple[float, None | dict[str, Any]]
+    ) -> None:
+        """Put an entry into the local tier."""
+        self.local[key] = entry
+        self.local.move_to_end(key)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove everything from the cache."""
+        self.local.clear()
+        with self.shared.lock:
+            self.shared.clear()
+
+    def get(self, ip: str, database: str) -> tuple[bool, None | dict[str, Any]]:
+        """Get the cached information and whether it was found."""
+        key = f"{database}|{ip}"
+        now = time.time()
+        if (entry := self.local.get(key)) and entry[0] > now:
+            self.local.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        if (entry := self.shared.get(key)) and entry[0] > now:
+            self._put_local(key, entry)
+            self.hits += 1
+            return True, entry[1]
+        self.misses += 1
+        return False, None
+
+    def put(self, ip: str, database: str, info: None | dict[str, Any]) -> None:
+        """Put information into the cache, empty results expire earlier."""
+        key = f"{database}|{ip}"
+        now = time.time()
+        entry = (now + (self.ttl if info else self.negative_ttl), info)
+        self._put_local(key, entry)
+        with self.shared.lock:
+            self.shared[key] = entry
+            if len(self.shared) <= self.shared_size:
+                return
+            expired = [k for k, (exp, _) in self.shared.items() if exp <= now]
+            for k in expired:
+                del self.shared[k]
+            # evict the oldest entries, with some headroom to not do it again
+            # on the next put
+            if (excess := len(self.shared) - self.shared_size * 9 // 10) > 0:
+                for k in list(self.shared)[:excess]:
+                    del self.shared[k]
+
+
+GEOIP_CACHE: Final = GeoIPCache()
+
+
 async def geoip(
     ip: None | str,
     database: str = "GeoLite2-City.mmdb",
     elasticsearch: None | AsyncElasticsearch = None,
     *,
     allow_fallback: bool = True,
-    caches: dict[str, dict[str, dict[str, Any]]] = UltraDict(),  # noqa: B008
+    database_dir: None | Path = None,
+    cache: GeoIPCache = GEOIP_CACHE,  # pylint: disable=redefined-outer-name
 ) -> None | dict[str, Any]:
     """Get GeoIP information."""
-    # pylint: disable=too-complex
     if not ip:
         return None
 
-    # pylint: disable-next=redefined-outer-name
-    cache = caches.get(ip, {})
-    if database not in cache:
-        if not elasticsearch:
-            if allow_fallback and database in {
-                "GeoLite2-City.mmdb",
-                "GeoLite2-Country.mmdb",
-            }:
-                return geoip_fallback(
-                    ip, country=database == "GeoLite2-City.mmdb"
-                )
-            return None
-
-        properties: None | tuple[str, ...]
-        if database == "GeoLite2-City.mmdb":
-            properties = (
-                "continent_name",
-                "country_iso_code",
-                "country_name",
-                "region_iso_code",
-                "region_name",
-                "city_name",
-                "location",
-                "timezone",
-            )
-        elif database == "GeoLite2-Country.mmdb":
-            properties = (
-                "continent_name",
-                "country_iso_code",
-                "country_name",
-            )
-        elif database == "GeoLite2-ASN.mmdb":
-            properties = ("asn", "network", "organization_name")
-        else:
-            properties = None
+    found, info = cache.get(ip, database)
+    if found:
+        return info
 
+    if database_dir and (path := database_dir / database).is_file():
+        info = geoip_local(ip, path)
+    elif not elasticsearch:
+        if allow_fallback and database in {
+            "GeoLite2-City.mmdb",
+            "GeoLite2-Country.mmdb",
+        }:
+            return geoip_fallback(ip, country=database == "GeoLite2-City.mmdb")
+        return None
+    else:
         try:
-            cache[database] = (
+            info = (
                 await elasticsearch.ingest.simulate(
                     pipeline={
                         "processors": [
@@ -447,7 +607,9 @@ async def geoip(
                                 "geoip": {
                                     "field": "ip",
                                     "database_file": database,
-                                    "properties": properties,
+                                    "properties": GEOIP_PROPERTIES.get(
+                                        database
+                                    ),
                                 }
                             }
                         ]
@@ -466,13 +628,58 @@ async def geoip(
                 )
             raise
 
-        if "country_iso_code" in cache[database]:
-            cache[database]["country_flag"] = country_code_to_flag(
-                cache[database]["country_iso_code"]
-            )
+    if info and "country_iso_code" in info:
+        info["country_flag"] = country_code_to_flag(info["country_iso_code"])
+
+    cache.put(ip, database, info)
+    return info
+
+
+def geoip_local(ip: str, path: Path) -> dict[str, Any]:
+    """Get GeoIP information from a local (memory mapped) MaxMind database."""
+    if not (result := open_geoip_database(path).lookup(ip)):
+        return {}
+
+    info_dict = result.get_info_dict()
+    subdivision = (info_dict.get("subdivisions") or [{}])[0]
+    location = info_dict.get("location", {})
+    country_iso_code = info_dict.get("country", {}).get("iso_code")
+
+    info = {
+        "continent_name": (
+            info_dict.get("continent", {}).get("names", {}).get("en")
+        ),
+        "country_iso_code": country_iso_code,
+        "country_name": info_dict.get("country", {}).get("names", {}).get("en"),
+        "region_iso_code": (
+            f"{country_iso_code}-{subdivision['iso_code']}"
+            if country_iso_code and subdivision.get("iso_code")
+            else None
+        ),
+        "region_name": subdivision.get("names", {}).get("en"),
+        "city_name": info_dict.get("city", {}).get("names", {}).get("en"),
+        "location": (
+            {"lat": location["latitude"], "lon": location["longitude"]}
+            if "latitude" in location and "longitude" in location
+            else None
+        ),
+        "timezone": location.get("time_zone"),
+        "asn": info_dict.get("autonomous_system_number"),
+        "organization_name": info_dict.get("autonomous_system_organization"),
+    }
+
+    properties = GEOIP_PROPERTIES.get(path.name)
+    return {
+        key: value
+        for key, value in info.items()
+        if value is not None and (properties is None or key in properties)
+    }
 
-        caches[ip] = cache
-    return cache[database]
+
+@cache
+def open_geoip_database(path: Path) -> Any:
+    """Open a MaxMind database, the file gets memory mapped."""
+    return open_database(str(path))
 
 
 def geoip_fallback(ip: str, country: bool = False) -> None | dict[str, Any]:
@@ -667,6 +874,44 @@ def parse_openmoji_arg(value: str, default: OpenMojiValue) -> OpenMojiValue:
     return default
 
 
+@dataclass(frozen=True, slots=True)
+class RatelimitBucket:
+    """A bucket that should be checked by ratelimit_buckets()."""
+
+    bucket: None | str
+    max_burst: int
+    count_per_period: int
+    period: int
+    tokens: int
+
+
+# take the tokens from the buckets until the first one is exhausted
+# see: https://github.com/brandur/redis-cell#usage
+RATELIMIT_SCRIPT: Final[str] = """
+local results = {}
+for i, key in ipairs(KEYS) do
+    results[i] = redis.call(
+        "CL.THROTTLE",
+        key,
+        ARGV[i * 4 - 3],
+        ARGV[i * 4 - 2],
+        ARGV[i * 4 - 1],
+        ARGV[i * 4]
+    )
+    if results[i][1] == 1 then
+        break
+    end
+end
+return results
+"""
+
+
+@lru_cache(4)
+def get_ratelimit_script(redis: Redis[str]) -> AsyncScript:
+    """Get the ratelimit script registered with the client."""
+    return redis.register_script(RATELIMIT_SCRIPT)
+
+
 # pylint: disable-next=too-many-arguments
 async def ratelimit(
     redis: Redis[str],
@@ -680,39 +925,81 @@ async def ratelimit(
     tokens: int,
 ) -> tuple[bool, dict[str, str]]:
     """Take b1nzy to space using Redis."""
+    return await ratelimit_buckets(
+        redis,
+        redis_prefix,
+        remote_ip,
+        RatelimitBucket(bucket, max_burst, count_per_period, period, tokens),
+    )
+
+
+async def ratelimit_buckets(
+    redis: Redis[str],
+    redis_prefix: str,
+    remote_ip: str,
+    *buckets: RatelimitBucket,
+) -> tuple[bool, dict[str, str]]:
+    """
+    Take b1nzy to space using Redis, but only once for all the buckets.
+
+    The buckets are checked in order. If a bucket is exhausted, the buckets
+    after it aren't checked and no tokens are taken from them.
+    """
+    if not buckets:
+        return False, {}
+
     remote_ip = hash_bytes(remote_ip.encode("ASCII"))
-    key = f"{redis_prefix}:ratelimit:{remote_ip}"
-    if bucket:
-        key = f"{key}:{bucket}"
 
-    # see: https://github.com/brandur/redis-cell#usage
-    result = await redis.execute_command(
-        # type: ignore[no-untyped-call]
-        "CL.THROTTLE",
-        key,
-        max_burst,
-        count_per_period,
-        period,
-        tokens,
-    )
+    keys: list[str] = []
+    args: list[int] = []
+    for bucket in buckets:
+        key = f"{redis_prefix}:ratelimit:{remote_ip}"
+        keys.append(f"{key}:{bucket.bucket}" if bucket.bucket else key)
+        args.extend(
+            (
+                bucket.max_burst,
+                bucket.count_per_period,
+                bucket.period,
+                bucket.tokens,
+            )
+        )
+    results: list[list[int]] = await get_ratelimit_script(redis)(keys, args)
 
     now = time.time()
 
     headers: dict[str, str] = {}
-
-    if result[0]:
-        headers["Retry-After"] = str(result[3])
-        if not bucket:
-            headers["X-RateLimit-Global"] = "true"
-
-    if bucket:
+    ratelimited = False
+    retry_after = -1
+    shown: None | tuple[RatelimitBucket, Any] = None
+
+    for bucket, result in zip(buckets, results, strict=False):
+        if result[0]:
+            ratelimited = True
+            retry_after = max(retry_after, result[3])
+            if not bucket.bucket:
+                headers["X-RateLimit-Global"] = "true"
+        # show the bucket that is closest to being exhausted
+        if bucket.bucket and (
+            shown is None
+            or (result[0], -result[2]) > (shown[1][0], -shown[1][2])
+        ):
+            shown = bucket, result
+
+    if ratelimited:
+        headers["Retry-After"] = str(retry_after)
+
+    if shown:
+        bucket, result = shown
+        assert bucket.bucket
         headers["X-RateLimit-Limit"] = str(result[1])
         headers["X-RateLimit-Remaining"] = str(result[2])
         headers["X-RateLimit-Reset"] = str(now + result[4])
         headers["X-RateLimit-Reset-After"] = str(result[4])
-        headers["X-RateLimit-Bucket"] = hash_bytes(bucket.encode("ASCII"))
+        headers["X-RateLimit-Bucket"] = hash_bytes(
+            bucket.bucket.encode("ASCII")
+        )
 
-    return bool(result[0]), headers
+    return ratelimited, headers
 
 
 def remove_suffix_ignore_case(string: str, suffix: str) -> str:
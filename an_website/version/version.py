@@ -13,20 +13,32 @@
 
 """The version page of the website."""
 
+import asyncio
+import contextlib
 import hashlib
-from collections.abc import Callable
-from ctypes import c_char
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from dataclasses import dataclass
 from functools import partial
-from multiprocessing import Array
-from typing import TYPE_CHECKING, Protocol
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar, Final, Protocol
 
-from .. import DIR as ROOT_DIR, VERSION
+from tornado.web import Application, HTTPError, RequestHandler
+
+from .. import CACHE_DIR, DIR as ROOT_DIR, VERSION, pytest_is_running
 from ..utils.fix_static_path_impl import recurse_directory
 from ..utils.request_handler import APIRequestHandler, HTMLRequestHandler
 from ..utils.utils import ModuleInfo
 
-FILE_HASHES = Array(c_char, 1024**2)
-HASH_OF_FILE_HASHES = Array(c_char, 40)
+try:
+    import fcntl
+except ModuleNotFoundError:  # on Windows, where there is only one process
+    fcntl = None  # type: ignore[assignment]  # pylint: disable=invalid-name
+
+LOGGER: Final = logging.getLogger(__name__)
 
 
 def get_module_info() -> ModuleInfo:
@@ -35,12 +47,14 @@ def get_module_info() -> ModuleInfo:
         handlers=(
             (r"/version(/full|)", Version),
             (r"/api/version", VersionAPI),
+            (r"/api/version/hashes", FileHashesAPI),
         ),
         name="Versions-Informationen",
         short_name="Versions-Info",
         description="Die aktuelle Version der Webseite",
         path="/version",
         keywords=("Version", "aktuell"),
+        required_background_tasks=(compute_fingerprint,),
     )
 
 
@@ -69,36 +83,186 @@ def hash_bytes(data: bytes) -> str:
     return _ripemd160(data).digest().decode("BRAILLE")
 
 
+def iter_file_hashes() -> Iterator[str]:
+    """Hash all files one after another and yield a line for every file."""
+    for path in sorted(
+        recurse_directory(ROOT_DIR, lambda path: path.is_file())
+    ):
+        if "__pycache__" not in path.split("/"):
+            yield f"{hash_bytes((ROOT_DIR / path).read_bytes())} {path}"
+
+
 def hash_all_files() -> str:
     """Hash all files."""
-    return "\n".join(
-        f"{hash_bytes((ROOT_DIR / path).read_bytes())} {path}"
-        for path in sorted(
-            recurse_directory(ROOT_DIR, lambda path: path.is_file())
+    return "\n".join(iter_file_hashes())
+
+
+@dataclass(frozen=True, slots=True)
+class Fingerprint:
+    """The hashes of the files of a version."""
+
+    file_hashes: tuple[str, ...]
+    """The lines with the hash and the path of every file."""
+    hash_of_file_hashes: str
+
+    @classmethod
+    def create(cls, file_hashes: str) -> Fingerprint:
+        """Create the fingerprint from the file hashes."""
+        return cls(
+            tuple(file_hashes.split("\n")),
+            hash_bytes(file_hashes.encode("UTF-8")),
         )
-        if "__pycache__" not in path.split("/")
-    )
+
+    def get_file_hashes(self) -> str:
+        """Get the file hashes as one string."""
+        return "\n".join(self.file_hashes)
+
+
+class FingerprintService:
+    """
+    Compute the fingerprint of this version in a background thread.
+
+    The file hashes are saved in the cache directory, so they only have to be
+    computed once per version. While one process hashes the files, the other
+    processes wait for it and load the file hashes from the cache file.
+    """
+
+    __slots__ = ("_future", "_lock", "cache_file")
+
+    _future: None | Future[Fingerprint]
+    _lock: threading.Lock
+    cache_file: None | Path
+
+    def __init__(self, cache_file: None | Path) -> None:
+        """Initialize the service without starting it."""
+        self._future = None
+        self._lock = threading.Lock()
+        self.cache_file = cache_file
+
+    def _compute(self, future: Future[Fingerprint]) -> None:
+        """Load or compute the fingerprint and set the result of the future."""
+        try:
+            future.set_result(Fingerprint.create(self._load_or_hash_files()))
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception("Computing the file hashes failed")
+            with self._lock:
+                self._future = None  # try again next time
+            future.set_exception(exc)
+
+    def _load_or_hash_files(self) -> str:
+        """Load the file hashes from the cache file or hash the files."""
+        if not self.cache_file:
+            return hash_all_files()
+        with contextlib.suppress(FileNotFoundError):
+            return self.cache_file.read_text("UTF-8")
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = self.cache_file.with_suffix(".lock").open("ab")
+        except OSError:
+            LOGGER.exception("Failed to open the lock of %s", self.cache_file)
+            return hash_all_files()
+        with lock_file:
+            if fcntl:  # wait for the process that is hashing the files
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with contextlib.suppress(FileNotFoundError):
+                return self.cache_file.read_text("UTF-8")
+            file_hashes = hash_all_files()
+            self._save(self.cache_file, file_hashes)
+        return file_hashes
+
+    @staticmethod
+    def _save(cache_file: Path, file_hashes: str) -> None:
+        """Save the file hashes in the cache file."""
+        try:
+            temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            temp_file.write_text(file_hashes, "UTF-8")
+            os.replace(temp_file, cache_file)
+        except OSError:
+            LOGGER.exception("Failed to save the hashes to %s", cache_file)
+
+    def get(self) -> Fingerprint:
+        """Get the fingerprint, wait for it if it isn't ready yet."""
+        return self.start().result()
+
+    def start(self) -> Future[Fingerprint]:
+        """Start computing the fingerprint if that hasn't been started yet."""
+        with self._lock:
+            if self._future is None:
+                self._future = future = Future()
+                future.set_running_or_notify_cancel()  # can't be cancelled
+                threading.Thread(
+                    target=self._compute,
+                    args=(future,),
+                    name="version-fingerprint",
+                    daemon=True,
+                ).start()
+            return self._future
+
+    async def wait(self, timeout: float) -> None | Fingerprint:
+        """Wait for the fingerprint, return None if it isn't ready in time."""
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(self.start())), timeout
+            )
+        except TimeoutError:
+            return None
+
+
+FINGERPRINT: Final = FingerprintService(
+    None
+    if pytest_is_running()
+    else CACHE_DIR / "version-fingerprint" / f"{VERSION.replace('/', '_')}.txt"
+)
 
 
 def get_file_hashes() -> str:
     """Return the file hashes."""
-    with FILE_HASHES:
-        if FILE_HASHES.value:
-            return FILE_HASHES.value.decode("UTF-8")
-        file_hashes = hash_all_files()
-        FILE_HASHES.value = file_hashes.encode("UTF-8")
-        return file_hashes
+    return FINGERPRINT.get().get_file_hashes()
 
 
 def get_hash_of_file_hashes() -> str:
     """Return a hash of the file hashes."""
-    with HASH_OF_FILE_HASHES:
-        if HASH_OF_FILE_HASHES.raw != bytes(40):
-            # .raw to fix bug with \x00 in hash
-            return HASH_OF_FILE_HASHES.raw.decode("UTF-16-BE")
-        hash_of_file_hashes = hash_bytes(get_file_hashes().encode("UTF-8"))
-        HASH_OF_FILE_HASHES.raw = hash_of_file_hashes.encode("UTF-16-BE")
-        return hash_of_file_hashes
+    return FINGERPRINT.get().hash_of_file_hashes
+
+
+async def compute_fingerprint(*, app: Application, worker: int | None) -> None:
+    """Compute the fingerprint at startup."""
+    # pylint: disable=unused-argument
+    await asyncio.wrap_future(FINGERPRINT.start())
+
+
+async def wait_for_fingerprint(handler: RequestHandler) -> Fingerprint:
+    """Wait for the fingerprint, fail if it isn't ready in a few seconds."""
+    if fingerprint := await FINGERPRINT.wait(10):
+        return fingerprint
+    handler.set_header("Retry-After", "10")
+    raise HTTPError(503, reason="Service available in a few seconds")
+
+
+class FileHashesAPI(APIRequestHandler):
+    """The request handler that streams the file hashes."""
+
+    POSSIBLE_CONTENT_TYPES: ClassVar[tuple[str, ...]] = ("text/plain",)
+
+    LINES_PER_CHUNK: ClassVar[int] = 1000
+
+    async def get(self, *, head: bool = False) -> None:
+        """Handle GET requests to the file hashes."""
+        fingerprint = await wait_for_fingerprint(self)
+        if head:
+            return
+        file_hashes = fingerprint.file_hashes
+        for start in range(0, len(file_hashes), self.LINES_PER_CHUNK):
+            self.write(
+                "".join(
+                    f"{line}\n"
+                    for line in file_hashes[
+                        start : start + self.LINES_PER_CHUNK
+                    ]
+                )
+            )
+            await self.flush()
+        await self.finish()
 
 
 class VersionAPI(APIRequestHandler):
@@ -106,9 +270,12 @@ class VersionAPI(APIRequestHandler):
 
     async def get(self, *, head: bool = False) -> None:
         """Handle GET requests to the version API."""
+        fingerprint = await wait_for_fingerprint(self)
         if head:
             return
-        await self.finish_dict(version=VERSION, hash=get_hash_of_file_hashes())
+        await self.finish_dict(
+            version=VERSION, hash=fingerprint.hash_of_file_hashes
+        )
 
 
 class Version(HTMLRequestHandler):
@@ -118,10 +285,15 @@ class Version(HTMLRequestHandler):
         """Handle GET requests to the version page."""
         if head:
             return
+        fingerprint = await FINGERPRINT.wait(1)
         await self.render(
             "pages/version.html",
             version=VERSION,
-            file_hashes=get_file_hashes(),
-            hash_of_file_hashes=get_hash_of_file_hashes(),
+            file_hashes=(
+                fingerprint.get_file_hashes() if fingerprint and full else None
+            ),
+            hash_of_file_hashes=(
+                fingerprint.hash_of_file_hashes if fingerprint else None
+            ),
             full=full,
         )
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmark looking up commits in a synthetic commits.txt."""
+
+import random
+import sys
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Final
+
+REPO_ROOT: Final[Path] = Path(__file__).absolute().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+
+# pylint: disable=wrong-import-position
+from an_website.commitment.commitment import (  # noqa: E402
+    Commit,
+    parse_commits_txt,
+)
+from an_website.utils.emoji import text_contains_emoji  # noqa: E402
+
+COMMIT_COUNT: Final[int] = 100_000
+LOOKUP_COUNT: Final[int] = 100
+
+WORDS: Final[tuple[str, ...]] = (
+    "add",
+    "fix",
+    "kangaroo",
+    "quotes",
+    "remove",
+    "tests",
+    "typo",
+    "update",
+    "🐛",
+    "🦘",
+)
+
+
+def create_commits_txt(count: int) -> str:
+    """Create the contents of a commits.txt with random commits."""
+    rng = random.Random(42)
+    return "\n".join(
+        f"{rng.randbytes(20).hex()} {1_600_000_000 + i} "
+        + " ".join(rng.choices(WORDS, k=rng.randint(0, 6)))
+        for i in range(count)
+    )
+
+
+def measure(function: Callable[[], object], count: int) -> float:
+    """Measure the function, return the seconds per call."""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+def scan_random(commits: Mapping[str, Commit]) -> tuple[str, Commit]:
+    """Choose a random commit with an emoji by looking at all commits."""
+    return random.choice(
+        [
+            (hash_, commit)
+            for hash_, commit in commits.items()
+            if commit[1]
+            if text_contains_emoji(commit[1])
+        ]
+    )
+
+
+def scan_prefix(
+    commits: Mapping[str, Commit], prefix: str
+) -> None | tuple[str, Commit]:
+    """Find the commit with the prefix by looking at all commits."""
+    results = [
+        (hash_, commit)
+        for hash_, commit in commits.items()
+        if hash_.startswith(prefix)
+    ][:2]
+    return results[0] if len(results) == 1 else None
+
+
+def main() -> int | str:
+    """Run the benchmark and print the results."""
+    data = create_commits_txt(COMMIT_COUNT)
+    start = time.perf_counter()
+    commits = parse_commits_txt(data)
+    print(f"parsing and indexing: {time.perf_counter() - start:8.3f}s")
+    as_dict = dict(commits.items())
+
+    prefixes = [hash_[:7] for hash_ in random.sample(list(commits), 1000)]
+    for prefix in prefixes[:LOOKUP_COUNT]:
+        if commits.find(prefix) != scan_prefix(as_dict, prefix):
+            return f"Different results for {prefix}"
+
+    for name, function, count in (
+        ("random (scan)", lambda: scan_random(as_dict), 5),
+        ("random (index)", lambda: commits.random(True), 100_000),
+        (
+            "prefix (scan)",
+            lambda: scan_prefix(as_dict, random.choice(prefixes)),
+            LOOKUP_COUNT,
+        ),
+        (
+            "prefix (sorted)",
+            lambda: commits.find(random.choice(prefixes)),
+            100_000,
+        ),
+    ):
+        print(f"{name:>20}: {measure(function, count) * 1e6:12.2f}µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmark setting the default headers with and without header sets."""
+
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Final
+
+REPO_ROOT: Final[Path] = Path(__file__).absolute().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+
+# pylint: disable=wrong-import-position
+from tornado.httputil import HTTPHeaders, HTTPServerRequest  # noqa: E402
+from tornado.web import Application  # noqa: E402
+
+from an_website.utils.base_request_handler import (  # noqa: E402
+    BaseRequestHandler,
+)
+from an_website.utils.header_sets import HeaderSetCache  # noqa: E402
+
+COUNT: Final[int] = 20_000
+
+SETTINGS: Final[dict[str, Any]] = {
+    "ELASTIC_APM": {"ENABLED": False},
+    "HSTS": True,
+    "REPORTING": True,
+    "REPORTING_ENDPOINT": "/api/reports",
+}
+
+
+class BenchmarkHandler(BaseRequestHandler):
+    """A request handler that never handles a request."""
+
+    async def get(self, *, head: bool = False) -> None:
+        """Handle GET requests."""
+
+
+class Connection:
+    """The connection of the requests, it never gets used."""
+
+    def set_close_callback(self, callback: None | Callable[[], None]) -> None:
+        """Ignore the callback."""
+
+
+def measure(app: Application) -> tuple[float, dict[str, str]]:
+    """Measure setting the default headers, return the seconds per request."""
+    request = HTTPServerRequest(
+        "GET",
+        "/benchmark",
+        headers=HTTPHeaders({"Host": "example.org"}),
+        host="example.org",
+        connection=Connection(),
+    )
+    handler = BenchmarkHandler(app, request, module_info=None)
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        handler.clear()  # calls set_default_headers
+    seconds = (time.perf_counter() - start) / COUNT
+    http_headers = handler._headers  # pylint: disable=protected-access
+    headers = dict(http_headers.get_all())
+    headers["Content-Security-Policy"] = headers[
+        "Content-Security-Policy"
+    ].replace(handler.nonce, "")
+    del headers["X-Clacks-Overhead"]
+    return seconds, headers
+
+
+def main() -> int | str:
+    """Run the benchmark and print the results."""
+    uncached, uncached_headers = measure(Application(**SETTINGS))
+    print(f"   uncached: {uncached * 1e6:8.2f}µs per request")
+    header_sets = HeaderSetCache()
+    cached, cached_headers = measure(
+        Application(HEADER_SETS=header_sets, **SETTINGS)
+    )
+    print(f"header sets: {cached * 1e6:8.2f}µs per request")
+    print(f"{header_sets.hits} hits, {header_sets.misses} misses")
+    if cached_headers != uncached_headers:
+        return "The headers differ"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmark swapping words with the default config."""
+
+import sys
+import timeit
+from pathlib import Path
+from typing import Final
+
+REPO_ROOT: Final[Path] = Path(__file__).absolute().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+
+# pylint: disable=wrong-import-position
+import regex  # noqa: E402
+
+from an_website.swapped_words.config_file import (  # noqa: E402
+    SwappedWordsConfig,
+    WordPair,
+    get_config,
+)
+from an_website.swapped_words.swap import MAX_CHAR_COUNT  # noqa: E402
+
+CONFIG: Final[str] = (
+    REPO_ROOT / "an_website/swapped_words/config.sw"
+).read_text("UTF-8")
+SAMPLE: Final[str] = (
+    "Das Ministerium findet das Problem ironisch, der Arbeitgeber übt Kritik"
+    " und der Schützenverein provoziert den Bundestag. Das ist amüsant. "
+)
+TEXT: Final[str] = (SAMPLE * (MAX_CHAR_COUNT // len(SAMPLE) + 1))[
+    :MAX_CHAR_COUNT
+]
+
+
+def swap_words_uncached(config: str, text: str) -> str:
+    """Swap the words like before, compiling the regex for every call."""
+    sw_config = SwappedWordsConfig(config)
+    pattern = regex.compile(
+        "|".join(
+            f"(?P<n{i}>{word_pair.to_pattern_str()})"
+            for i, word_pair in enumerate(sw_config.lines)
+            if isinstance(word_pair, WordPair)
+        ),
+        regex.IGNORECASE,
+    )
+
+    def get_replaced_word(match: regex.Match[str]) -> str:
+        for key, word in match.groupdict().items():
+            if isinstance(word, str) and key.startswith("n"):
+                return sw_config.get_replacement_by_group_name(key, word)
+        return match[0]
+
+    return pattern.sub(get_replaced_word, text)
+
+
+def main() -> int | str:
+    """Run the benchmark and print the results."""
+    if swap_words_uncached(CONFIG, TEXT) != get_config(CONFIG).swap_words(TEXT):
+        return "The results differ"
+
+    number = 20
+    for name, func in (
+        ("uncached", lambda: swap_words_uncached(CONFIG, TEXT)),
+        ("cached", lambda: get_config(CONFIG).swap_words(TEXT)),
+    ):
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:>8}: {best * 1000:8.3f}ms per {len(TEXT)} chars")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
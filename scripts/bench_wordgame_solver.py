@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmark ranking the solutions of the wordgame solver."""
+
+import sys
+import time
+from collections.abc import Collection
+from pathlib import Path
+from typing import Final
+
+REPO_ROOT: Final[Path] = Path(__file__).absolute().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+
+# pylint: disable=wrong-import-position
+from hangman_solver import Language, read_words_with_length  # noqa: E402
+
+from an_website.hangman_solver import wordgame_solver  # noqa: E402
+from an_website.utils.utils import bounded_edit_distance  # noqa: E402
+
+# the words used in the tests and some more
+WORDS: Final[tuple[str, ...]] = ("test", "fest", "haus", "wort", "spiel")
+
+
+def find_solutions_linear(word: str, ignore: Collection[str]) -> list[str]:
+    """Find the solutions like before, by checking every word."""
+    ignore = {*ignore, word}
+    return [
+        test_word
+        for length in (len(word) - 1, len(word), len(word) + 1)
+        for test_word in read_words_with_length(Language.DeBasicUmlauts, length)
+        if test_word not in ignore
+        and bounded_edit_distance(word, test_word, 2) == 1
+    ]
+
+
+def rank_linear(word: str) -> list[tuple[int, str]]:
+    """Rank the solutions like before."""
+    return sorted(
+        (
+            (len(find_solutions_linear(sol, {word})), sol)
+            for sol in find_solutions_linear(word, ())
+        ),
+        reverse=True,
+    )
+
+
+def main() -> int | str:
+    """Run the benchmark and print the results."""
+    start = time.perf_counter()
+    for word in WORDS:
+        wordgame_solver.get_ranked_solutions(word)
+    print(f"building the index: {time.perf_counter() - start:8.3f}s")
+
+    for name, rank in (
+        ("linear", rank_linear),
+        ("indexed", wordgame_solver.get_ranked_solutions),
+    ):
+        start = time.perf_counter()
+        results = [rank(word) for word in WORDS]
+        print(f"{name:>18}: {time.perf_counter() - start:8.3f}s")
+        if results != [
+            wordgame_solver.get_ranked_solutions(word) for word in WORDS
+        ]:
+            return "The results differ"
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
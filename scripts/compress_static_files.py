@@ -16,14 +16,21 @@
 """This script compresses static files in a folder in place."""
 
 import abc
+import json
 import sys
 from collections.abc import Collection, Iterable, Set
 from pathlib import Path
-from typing import Final, override
+from typing import Any, Final, override
 
 IGNORED_EXTENSIONS: Final[Set[str]] = {"map"}
 BINARY: Final[Set[str]] = {"mp3", "png", "jpg", "woff2", "jxl"}
 
+SOURCE_DIR: Final[Path] = Path(__file__).absolute().parent.parent / "an_website"
+
+# Same as in ../an_website/utils/fix_static_path_impl.py
+MANIFEST_FILE_NAME: Final[str] = "static-manifest.json"
+MANIFEST_VERSION: Final[int] = 1
+
 
 type CompressionResult = tuple[Path, float, bool]
 
@@ -163,12 +170,59 @@ def compress_dir(
         results.clear()
 
 
+def create_manifest(
+    dir_: Path, compressors: Collection[FileCompressor]
+) -> dict[str, Any]:
+    """Create the manifest of the files in a directory."""
+    # pylint: disable-next=import-outside-toplevel
+    from blake3 import blake3
+
+    media_types: dict[str, str] = json.loads(
+        (SOURCE_DIR / "vendored" / "media-types.json").read_bytes()
+    )
+    compressed_extensions = tuple(c.file_extension() for c in compressors)
+
+    files: dict[str, dict[str, Any]] = {}
+
+    for file in sorted(dir_.rglob("*")):
+        if not file.is_file() or file.name == MANIFEST_FILE_NAME:
+            continue
+        extension = file.suffix.removeprefix(".")
+        if extension in compressed_extensions:
+            continue
+        data = file.read_bytes()
+        entry: dict[str, Any] = {
+            "hash": blake3(data).hexdigest(8),
+            "size": len(data),
+            "variants": {
+                ext: compressed.stat().st_size
+                for ext in compressed_extensions
+                if (compressed := Path(f"{file}.{ext}")).is_file()
+            },
+        }
+        if media_type := media_types.get(extension):
+            entry["type"] = media_type
+        files[file.relative_to(dir_).as_posix()] = entry
+
+    return {"version": MANIFEST_VERSION, "files": files}
+
+
+def write_manifest(dir_: Path, compressors: Collection[FileCompressor]) -> Path:
+    """Write the manifest of the files in a directory."""
+    manifest = create_manifest(dir_, compressors)
+    manifest_file = dir_ / MANIFEST_FILE_NAME
+    manifest_file.write_text(
+        json.dumps(manifest, indent=None, separators=(",", ":")),
+        encoding="UTF-8",
+    )
+    return manifest_file
+
+
 def get_static_dirs() -> Iterable[Path]:
     """Get the directories containing the static files."""
-    source_dir = Path(__file__).absolute().parent.parent / "an_website"
-    yield source_dir / "static"
-    yield source_dir / "soundboard" / "files"
-    yield source_dir / "vendored/apm-rum/elastic-apm-rum.umd.min.js"
+    yield SOURCE_DIR / "static"
+    yield SOURCE_DIR / "soundboard" / "files"
+    yield SOURCE_DIR / "vendored/apm-rum/elastic-apm-rum.umd.min.js"
 
 
 def get_compressors() -> Collection[FileCompressor]:
@@ -180,6 +234,12 @@ def get_missing_dependencies() -> Iterable[str]:
     """Get the missing dependencies."""
     for compressor in get_compressors():
         yield from compressor.get_missing_dependencies()
+    try:
+        # pylint: disable-next=import-outside-toplevel,unused-import
+        import blake3  # noqa: F401
+    except ModuleNotFoundError as exc:
+        assert exc.name == "blake3"
+        yield "blake3"
 
 
 def compress_static_files() -> Iterable[CompressionResult]:
@@ -188,10 +248,12 @@ def compress_static_files() -> Iterable[CompressionResult]:
 
     for static_dir in get_static_dirs():
         yield from compress_dir(static_dir, compressors)
+        if static_dir.is_dir():
+            write_manifest(static_dir, compressors)
 
 
 def clean_files() -> Iterable[Path]:
-    """Delete compressed static files."""
+    """Delete compressed static files and the manifests."""
     compressed_extensions = frozenset(
         c.file_extension() for c in get_compressors()
     )
@@ -199,7 +261,10 @@ def clean_files() -> Iterable[Path]:
         for file in static_dir.rglob("*"):
             if not file.is_file():
                 continue
-            if file.suffix.removeprefix(".") not in compressed_extensions:
+            if (
+                file.suffix.removeprefix(".") not in compressed_extensions
+                and file.name != MANIFEST_FILE_NAME
+            ):
                 continue
             file.unlink()
             yield file
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Load test the fan-out of the emoji chat with in-process clients."""
+
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Final
+
+REPO_ROOT: Final[Path] = Path(__file__).absolute().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+
+# pylint: disable=wrong-import-position
+import orjson as json  # noqa: E402
+from tornado.httpserver import HTTPServer  # noqa: E402
+from tornado.testing import bind_unused_port  # noqa: E402
+from tornado.web import Application  # noqa: E402
+from tornado.websocket import (  # noqa: E402
+    WebSocketClientConnection,
+    WebSocketHandler,
+    websocket_connect,
+)
+
+from an_website.emoji_chat.connections import (  # noqa: E402
+    ConnectionRegistry,
+)
+
+REGISTRY: Final[ConnectionRegistry[WebSocketHandler]] = ConnectionRegistry(
+    presence_frame=lambda registry: json.dumps(
+        {"type": "users", "count": len(registry)}
+    )
+)
+
+
+class RegisteringHandler(WebSocketHandler):
+    """Add the connections to the registry."""
+
+    def on_close(self) -> None:
+        """Remove the connection."""
+        REGISTRY.remove(self)
+
+    def open(self, *args: str, **kwargs: str) -> None:
+        """Add the connection."""
+        REGISTRY.add(self)
+
+
+async def read_messages(client: WebSocketClientConnection, count: int) -> None:
+    """Read messages until the count is reached, ignore presence updates."""
+    while count:  # pylint: disable=while-used
+        message = await client.read_message()
+        if message is None:
+            return
+        if '"type":"users"' not in message:
+            count -= 1
+
+
+async def run(clients: int, messages: int, slow: int) -> None:
+    """Open the clients, broadcast the messages and print the timings."""
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([(r"/", RegisteringHandler)]))
+    server.add_sockets([sock])
+
+    start = time.perf_counter()
+    connections = []
+    for _ in range(0, clients, 500):
+        connections.extend(
+            await asyncio.gather(
+                *[
+                    websocket_connect(f"ws://127.0.0.1:{port}/")
+                    for _ in range(min(500, clients - len(connections)))
+                ]
+            )
+        )
+    while len(REGISTRY) < clients:  # pylint: disable=while-used
+        await asyncio.sleep(0.01)
+    print(f"opened {clients} clients in {time.perf_counter() - start:.3f}s")
+
+    # the slow clients never read, so their messages pile up on the server
+    readers = [
+        asyncio.create_task(read_messages(client, messages))
+        for client in connections[slow:]
+    ]
+    frame = json.dumps({"type": "message", "message": ["🆒"] * 20})
+    start = time.perf_counter()
+    broadcast_time = 0.0
+    for _ in range(messages):
+        broadcast_start = time.perf_counter()
+        REGISTRY.broadcast(frame)
+        broadcast_time += time.perf_counter() - broadcast_start
+        await asyncio.sleep(0)
+    await asyncio.gather(*readers)
+    print(
+        f"broadcast {messages} messages in {broadcast_time:.3f}s,"
+        f" all received after {time.perf_counter() - start:.3f}s,"
+        f" dropped {REGISTRY.dropped} slow clients"
+    )
+
+    start = time.perf_counter()
+    for client in connections:
+        client.close()
+    while REGISTRY:  # pylint: disable=while-used
+        await asyncio.sleep(0.01)
+    print(f"closed {clients} clients in {time.perf_counter() - start:.3f}s")
+    server.stop()
+
+
+def main() -> int | str:
+    """Parse the arguments and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--slow", type=int, default=10)
+    args = parser.parse_args()
+
+    # every client needs two file descriptors
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.clients * 2 + 64
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        if hard != resource.RLIM_INFINITY and hard < needed:
+            return f"Needs {needed} file descriptors, but only {hard} allowed"
+        resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+    asyncio.run(run(args.clients, args.messages, args.slow))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,10 @@ from typing import Any, Literal, TypedDict, cast
 
 import dill  # type: ignore[import-untyped]  # nosec: B403
 import jsonpickle  # type: ignore[import-untyped]
+from tornado.web import Application
+
+from an_website import EVENT_REDIS
+from an_website.backdoor.session import BackdoorSession
 
 from . import (  # noqa: F401  # pylint: disable=unused-import
     FetchCallable,
@@ -267,3 +271,92 @@ async def test_backdoor(fetch: FetchCallable) -> None:  # noqa: F811
         )
         assert response["result"][1].args == ("division by zero",)
         assert isinstance(response["result"][1], ZeroDivisionError)
+
+
+async def test_backdoor_session(app: Application) -> None:  # noqa: F811
+    """Test saving the backdoor sessions value by value."""
+    if not EVENT_REDIS.is_set():
+        return
+    redis = app.settings["REDIS"]
+    key = f"{app.settings['REDIS_PREFIX']}:backdoor-session-values:test"
+    await redis.delete(key)
+
+    session = BackdoorSession(key, max_value_size=1000)
+    session.update(spam=[1, 2], eggs="eggs", self=object(), big="x" * 1000)
+    assert await session.backup(redis) == 3
+    assert set(await redis.hkeys(key)) == {"__name__", "spam", "eggs"}
+    assert 0 < await redis.ttl(key) <= 60 * 60 * 24 * 7
+
+    # only the changed values get saved again
+    assert await session.backup(redis) == 0
+    session["spam"].append(3)
+    assert await session.backup(redis) == 0
+    session.mark_dirty("spam")
+    assert await session.backup(redis) == 1
+    code = compile("spam.append(5)\nspam.pop()", "", "exec")
+    exec(code, session)  # nosec: B102
+    session.mark_used(code)
+    assert await session.backup(redis) == 0  # the pickle didn't change
+    session["eggs"] = "bacon"
+    assert await session.backup(redis) == 1
+
+    # values changed through functions or other names get saved, too
+    del session["big"]  # functions are pickled with their globals
+    exec("ham = spam\ndef add(): ham.append(4)", session)  # nosec: B102
+    assert await session.backup(redis) == 2
+    code = compile("add()", "", "exec")
+    exec(code, session)  # nosec: B102
+    session.mark_used(code)
+    assert await session.backup(redis) == 2
+
+    # values containing changed values get saved, too
+    exec("box = {'ham': ham}", session)  # nosec: B102
+    assert await session.backup(redis) == 1
+    code = compile("ham.append(6)", "", "exec")
+    exec(code, session)  # nosec: B102
+    session.mark_used(code)
+    assert await session.backup(redis) == 3  # spam, ham and box
+    code = compile("ham.pop()", "", "exec")
+    exec(code, session)  # nosec: B102
+    session.mark_used(code)
+    assert await session.backup(redis) == 3
+    assert session["box"] == {"ham": [1, 2, 3, 4]}
+    del session["box"]
+    assert await session.backup(redis) == 0
+
+    # values that are too big aren't pickled again until marked as dirty
+    session["huge"] = ["x" * 1000]
+    assert await session.backup(redis) == 0
+    session["huge"][0] = "x"
+    session.mark_used(compile("huge[0] = 'x'", "", "exec"))
+    assert await session.backup(redis) == 0
+    session.mark_dirty("huge")
+    assert await session.backup(redis) == 1
+    del session["huge"]
+    assert await session.backup(redis) == 0
+
+    # the values get unpickled when they are looked up
+    loaded = BackdoorSession(key)
+    assert await loaded.load(redis) == 4
+    assert "spam" in loaded
+    assert not dict.__contains__(loaded, "spam")
+    assert eval("spam", loaded) == [1, 2, 3, 4]  # nosec: B307
+    assert dict.__contains__(loaded, "spam")
+    exec("def get_eggs(): return eggs", loaded)  # nosec: B102
+    assert loaded["get_eggs"]() == "bacon"
+
+    # deleted values get deleted from Redis
+    exec("del spam, eggs, ham, add", loaded)  # nosec: B102
+    assert "eggs" not in loaded
+    assert await loaded.backup(redis) == 2  # __name__ and get_eggs
+    assert set(await redis.hkeys(key)) == {"__name__", "get_eggs"}
+
+    # values that can't be unpickled stay in Redis
+    await redis.hset(key, "broken", "x")
+    broken = BackdoorSession(key)
+    assert await broken.load(redis) == 2
+    assert broken.get("broken") is None
+    assert "broken" not in broken
+    await broken.backup(redis)
+    assert set(await redis.hkeys(key)) == {"__name__", "get_eggs", "broken"}
+    await redis.delete(key)
@@ -68,6 +68,43 @@ def test_parsing() -> None:
         )
 
 
+def test_commits() -> None:
+    """Test looking up commits."""
+    date = datetime(2022, 8, 29, tzinfo=UTC)
+    commits = commitment.Commits(
+        {
+            "abc1": (date, "💬 first"),
+            "abc2": (date, "second"),
+            "abd3": (date, ""),
+            "b004": (date, "🦘 fourth"),
+        }
+    )
+    assert list(commits) == ["abc1", "abc2", "abd3", "b004"]
+    assert commits["abd3"] == (date, "")
+    assert "abc" not in commits
+    assert "b005" not in commits
+
+    assert commits.find("a") is None  # ambiguous
+    assert commits.find("abc") is None  # ambiguous
+    assert commits.find("abc", require_emoji=True) == ("abc1", commits["abc1"])
+    assert commits.find("abc2") == ("abc2", commits["abc2"])
+    assert commits.find("abc2", require_emoji=True) is None
+    assert commits.find("abd") == ("abd3", commits["abd3"])
+    assert commits.find("b") == ("b004", commits["b004"])
+    assert commits.find("c") is None
+
+    assert {commits.random()[0] for _ in range(200)} == {  # type: ignore[index]
+        "abc1",
+        "abc2",
+        "b004",
+    }
+    assert {
+        commits.random(require_emoji=True)[0]  # type: ignore[index]
+        for _ in range(100)
+    } == {"abc1", "b004"}
+    assert commitment.Commits({"abc1": (date, "")}).random() is None
+
+
 async def test_text_api(fetch: FetchCallable) -> None:  # noqa: F811
     """Test the commitment API."""
     assert commitment.COMMITS, "Please create commits.txt"
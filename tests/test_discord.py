@@ -0,0 +1,242 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The tests for the Discord invites."""
+
+import asyncio
+from collections import Counter
+from typing import NoReturn, cast
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application, HTTPError, RequestHandler
+
+from an_website import EVENT_REDIS
+from an_website.discord.discord import InviteResolver, InviteSources, get_invite
+
+from . import app  # noqa: F401  # pylint: disable=unused-import
+
+
+class Stubs:
+    """The answers of the stub servers of the invite sources."""
+
+    answers: dict[tuple[str, str], tuple[int, float, bytes]]
+    requests: Counter[tuple[str, str]]
+
+    def __init__(self) -> None:
+        """Initialize the stubs without answers."""
+        self.answers = {}
+        self.requests = Counter()
+
+
+class StubSource(RequestHandler):
+    """A stub server of an invite source."""
+
+    source: str
+    stubs: Stubs
+
+    def initialize(self, source: str, stubs: Stubs) -> None:
+        """Initialize the handler."""
+        self.source = source
+        self.stubs = stubs
+
+    async def get(self, guild_id: str) -> None:
+        """Answer after the delay (404 if there is no answer)."""
+        self.stubs.requests[self.source, guild_id] += 1
+        code, delay, body = self.stubs.answers.get(
+            (self.source, guild_id), (404, 0, b"")
+        )
+        await asyncio.sleep(delay)
+        self.set_status(code)
+        if self.request.method != "HEAD":
+            self.write(body)
+
+    head = get
+
+
+def start_stubs() -> tuple[HTTPServer, Stubs, InviteSources]:
+    """Start the stub servers of the invite sources."""
+    stubs = Stubs()
+    sock, port = bind_unused_port()
+    server = HTTPServer(
+        Application(
+            [
+                (
+                    rf"/{source}{path}",
+                    StubSource,
+                    {"source": source, "stubs": stubs},
+                )
+                for source, path in (
+                    ("discord", r"/api/guilds/(\d+)/widget.json"),
+                    ("disboard", r"/site/get-invite/(\d+)"),
+                    ("top.gg", r"/servers/(\d+)/join"),
+                    ("discords", r"/api-v2/server/(\d+)/relevant"),
+                )
+            ]
+        )
+    )
+    server.add_sockets([sock])
+    url = f"http://127.0.0.1:{port}"
+    sources = InviteSources(
+        f"{url}/discord",
+        f"{url}/disboard",
+        f"{url}/top.gg",
+        f"{url}/discords",
+        timeout=5,
+    )
+    return server, stubs, sources
+
+
+async def test_get_invite() -> None:
+    """Test getting invites from the sources."""
+    server, stubs, sources = start_stubs()
+    try:
+        await check_get_invite(stubs, sources)
+    finally:
+        server.stop()
+
+
+async def check_get_invite(stubs: Stubs, sources: InviteSources) -> None:
+    """Check getting invites from the stub servers of the sources."""
+    url = sources.discord
+
+    stubs.answers["discord", "1"] = (200, 0, b'{"instant_invite": "x"}')
+    stubs.answers["disboard", "1"] = (200, 0, b'"y"')
+    invite = ("x", f"{url}/api/guilds/1/widget.json")
+    assert await get_invite("1", sources) == invite
+    assert stubs.requests["disboard", "1"] == 0
+
+    # the faster source wins the race
+    stubs.answers["discord", "2"] = (200, 0, b'{"instant_invite": null}')
+    stubs.answers["top.gg", "2"] = (200, 0.3, b"")
+    stubs.answers["discords", "2"] = (200, 0, b"")
+    top_gg = (
+        f"{sources.top_gg}/servers/2/join",
+        f"{sources.top_gg}/servers/2/",
+    )
+    discords = (
+        f"{sources.discords}/servers/2/join",
+        f"{sources.discords}/servers/2/",
+    )
+    assert await get_invite("2", sources) == top_gg
+    assert await get_invite("2", sources, race=True) == discords
+    assert stubs.requests["disboard", "2"] == 2
+
+    # sources that answer with invalid JSON are skipped
+    stubs.answers["discord", "3"] = (200, 0, b"{")
+    stubs.answers["top.gg", "3"] = (200, 0, b"")
+    for race in (False, True):
+        assert await get_invite("3", sources, race=race) == (
+            f"{sources.top_gg}/servers/3/join",
+            f"{sources.top_gg}/servers/3/",
+        )
+
+    # the reason of the widget is preferred
+    del stubs.answers["top.gg", "2"], stubs.answers["discords", "2"]
+    for race in (False, True):
+        with pytest.raises(HTTPError) as exc_info:
+            await get_invite("2", sources, race=race)
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.reason == (
+            f"No instant invite in widget ({url}/api/guilds/2/widget.json) "
+            "found."
+        )
+
+
+class BrokenRedis:
+    """Stand in for Redis that fails every command."""
+
+    # pylint: disable=unused-argument
+
+    def pipeline(self, transaction: bool = True) -> NoReturn:
+        """Fail to create a pipeline."""
+        raise RedisConnectionError("Redis is broken.")
+
+    async def set(self, *args: object, **kwargs: object) -> NoReturn:
+        """Fail to set a value."""
+        raise RedisConnectionError("Redis is broken.")
+
+
+async def test_invite_resolver(app: Application) -> None:  # noqa: F811
+    """Test resolving and caching invites."""
+    server, stubs, sources = start_stubs()
+    try:
+        await check_invite_resolver(app, stubs, sources)
+    finally:
+        server.stop()
+
+
+async def check_invite_resolver(
+    app: Application,  # noqa: F811
+    stubs: Stubs,
+    sources: InviteSources,
+) -> None:
+    """Check resolving and caching invites from the stub servers."""
+    resolver = InviteResolver(max_size=2, sources=sources)
+
+    # concurrent lookups share one request to every source
+    stubs.answers["disboard", "1"] = (200, 0.1, b'"y"')
+    invite = ("y", f"{sources.disboard}/server/1")
+    assert (
+        await asyncio.gather(*[resolver.get("1") for _ in range(20)])
+        == [invite] * 20
+    )
+    assert (
+        stubs.requests["discord", "1"] == stubs.requests["disboard", "1"] == 1
+    )
+    assert await resolver.get("1") == invite
+    assert stubs.requests["disboard", "1"] == 1
+
+    # errors are cached, too
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            await resolver.get("2")
+    assert stubs.requests["discord", "2"] == 1
+
+    # the least recently used guild gets forgotten
+    stubs.answers["disboard", "3"] = (200, 0, b'"z"')
+    await resolver.get("3")
+    await resolver.get("1")
+    assert stubs.requests["disboard", "1"] == 2
+
+    # errors of Redis don't break resolving the invites
+    broken_redis = cast("Redis[str]", BrokenRedis())
+    expiring = InviteResolver(sources=sources, ttl=0)
+    stubs.answers["disboard", "5"] = (200, 0, b'"w"')
+    invite = ("w", f"{sources.disboard}/server/5")
+    assert await expiring.get("5", broken_redis) == invite
+    assert stubs.requests["disboard", "5"] == 1
+    # the expired invite is used, if the sources fail, too
+    del stubs.answers["disboard", "5"]
+    assert await expiring.get("5", broken_redis) == invite
+    assert stubs.requests["disboard", "5"] == 2
+    with pytest.raises(HTTPError):
+        await expiring.get("5")
+
+    if not EVENT_REDIS.is_set():
+        return
+    redis = app.settings["REDIS"]
+    prefix = app.settings["REDIS_PREFIX"]
+    await redis.delete(f"{prefix}:discord-invite:4")
+
+    # the workers share the cache in Redis
+    stubs.answers["disboard", "4"] = (200, 0, b'"z"')
+    invite = ("z", f"{sources.disboard}/server/4")
+    assert await resolver.get("4", redis, prefix) == invite
+    other_worker = InviteResolver(sources=sources)
+    assert await other_worker.get("4", redis, prefix) == invite
+    assert stubs.requests["disboard", "4"] == 1
+    await redis.delete(f"{prefix}:discord-invite:4")
@@ -0,0 +1,191 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The tests for the emoji chat."""
+
+import asyncio
+from asyncio import Future
+from typing import Any
+
+import orjson as json
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+from tornado.websocket import (
+    WebSocketClosedError,
+    WebSocketHandler,
+    websocket_connect,
+)
+
+from an_website.emoji_chat import chat
+from an_website.emoji_chat.connections import ConnectionRegistry
+
+from . import app  # noqa: F401  # pylint: disable=unused-import
+
+
+class FakeConnection:
+    """A connection that never gets written to a socket."""
+
+    closed: None | int
+    frames: list[bytes | str | dict[str, Any]]
+    slow: bool
+
+    def __init__(self, slow: bool = False) -> None:
+        """Initialize the connection."""
+        self.closed = None
+        self.frames = []
+        self.slow = slow
+
+    def close(self, code: None | int = None, reason: None | str = None) -> None:
+        """Close the connection."""
+        self.closed = code
+
+    def write_message(
+        self, message: bytes | str | dict[str, Any], binary: bool = False
+    ) -> Future[None]:
+        """Record the message, slow connections never finish writing."""
+        if self.closed is not None:
+            raise WebSocketClosedError()
+        self.frames.append(message)
+        future: Future[None] = asyncio.get_running_loop().create_future()
+        if not self.slow:
+            future.set_result(None)
+        return future
+
+
+async def test_connection_registry() -> None:
+    """Test broadcasting to the connections of the registry."""
+    presence_frames: list[int] = []
+
+    def presence_frame(registry: ConnectionRegistry[FakeConnection]) -> bytes:
+        """Record the count of the connections."""
+        presence_frames.append(len(registry))
+        return b"users"
+
+    registry: ConnectionRegistry[FakeConnection] = ConnectionRegistry(
+        max_pending=2, presence_delay=0.01, presence_frame=presence_frame
+    )
+    fast = [FakeConnection() for _ in range(100)]
+    slow = FakeConnection(slow=True)
+    for conn in (*fast, slow):
+        registry.add(conn)
+    registry.remove(fast.pop())
+    assert len(registry) == 100
+
+    await asyncio.sleep(0.05)
+    # all the changes are coalesced into one presence update
+    assert presence_frames == [100]
+    assert all(conn.frames == [b"users"] for conn in (*fast, slow))
+
+    assert registry.broadcast(b"1") == 100
+    await asyncio.sleep(0)
+    assert registry.pending(fast[0]) == 0
+    assert registry.pending(slow) == 2
+
+    # the slow connection has too many pending messages and gets dropped
+    assert registry.broadcast(b"2") == 99
+    assert slow.closed == 1008
+    assert slow not in registry
+    assert registry.dropped == 1
+    assert all(conn.frames == [b"users", b"1", b"2"] for conn in fast)
+
+    # closed connections get removed
+    fast[0].closed = 1000
+    assert registry.broadcast(b"3") == 98
+    assert fast[0] not in registry
+
+    await asyncio.sleep(0.05)
+    assert presence_frames == [100, 98]
+
+
+async def test_connection_registry_websockets() -> None:
+    """Test broadcasting to real WebSocket connections."""
+    registry: ConnectionRegistry[WebSocketHandler] = ConnectionRegistry()
+
+    class RegisteringHandler(WebSocketHandler):
+        """Add the connections to the registry."""
+
+        def on_close(self) -> None:
+            """Remove the connection."""
+            registry.remove(self)
+
+        def open(self, *args: str, **kwargs: str) -> None:
+            """Add the connection."""
+            registry.add(self)
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([(r"/", RegisteringHandler)]))
+    server.add_sockets([sock])
+    try:
+        clients = await asyncio.gather(
+            *[websocket_connect(f"ws://127.0.0.1:{port}/") for _ in range(200)]
+        )
+        while len(registry) < len(clients):  # pylint: disable=while-used
+            await asyncio.sleep(0.01)
+
+        frame = json.dumps({"type": "message", "message": "🆒"})
+        assert registry.broadcast(frame) == len(clients)
+        for message in await asyncio.gather(
+            *[client.read_message() for client in clients]
+        ):
+            assert message == frame.decode("UTF-8")
+
+        for client in clients[:100]:
+            client.close()
+        while len(registry) > 100:  # pylint: disable=while-used
+            await asyncio.sleep(0.01)
+        assert registry.broadcast(frame) == 100
+    finally:
+        server.stop()
+
+
+async def test_chat_history(app: Application) -> None:  # noqa: F811
+    """Test saving messages and reading them from the history."""
+    redis = app.settings["REDIS"]
+    prefix = app.settings["REDIS_PREFIX"]
+    await redis.delete(f"{prefix}:emoji-chat:message-list")
+
+    history = chat.ChatHistory(size=3)
+    first = await chat.save_new_message("🦘", "🆒", redis, prefix)
+    assert first["author"] == ["🦘"]
+    assert first["content"] == ["🆒"]
+
+    # without the subscription the messages always get read from Redis
+    snapshot = await history.get_snapshot(redis, prefix)
+    assert snapshot.messages == (first,)
+    assert not history.loaded
+
+    history.subscribed = True
+    snapshot = await history.get_snapshot(redis, prefix)
+    assert snapshot.messages == (first,)
+    assert history.loaded
+    assert await history.get_snapshot(redis, prefix) is snapshot
+    assert snapshot.get_json() is snapshot.get_json()
+    assert json.loads(snapshot.get_json()) == [first]
+    assert snapshot.get_html("x", lambda messages: str(len(messages))) == "1"
+    assert snapshot.get_html("x", lambda messages: "changed") == "1"
+
+    # messages published to the channel get added without reading Redis
+    await redis.delete(f"{prefix}:emoji-chat:message-list")
+    messages = [{"author": ["🦘"], "content": [str(i)]} for i in range(3)]
+    for message in messages:
+        history.append_published(
+            json.dumps({"type": "message", "message": message}).decode()
+        )
+    snapshot = await history.get_snapshot(redis, prefix)
+    assert snapshot.messages == tuple(messages)
+    assert snapshot.with_message(messages[-1]) is snapshot
+    assert snapshot.with_message(first).messages == (*messages, first)
+
+    history.invalidate()
+    assert not (await history.get_snapshot(redis, prefix)).messages
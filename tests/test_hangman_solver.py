@@ -13,16 +13,23 @@
 
 """The tests for the hangman solver."""
 
+import asyncio
+from pathlib import Path
+
 import pytest
-from hangman_solver import HangmanResult
+from hangman_solver import Language
 from tornado.web import HTTPError
 
-from an_website.hangman_solver import hangman_solver as solver
+from an_website.hangman_solver import (
+    hangman_solver as solver,
+    wordgame_solver as wordgame,
+)
+from an_website.utils.utils import bounded_edit_distance
 
 
 def test_solving_hangman() -> None:
     """Test solving hangman puzzles."""
-    hangman: HangmanResult = solver.solve_hangman(
+    hangman: solver.HangmanSolution = solver.solve_hangman(
         solver.HangmanArguments(
             input="te_t",
             invalid="x",
@@ -119,5 +126,93 @@ def test_solving_hangman() -> None:
         )
 
 
+async def test_solving_hangman_async() -> None:
+    """Test solving hangman puzzles with the pool and the cache."""
+    cache = solver.HangmanSolutionCache(size=2)
+    data = solver.HangmanArguments(input="Te_t", invalid="xnx", max_words=5)
+    assert data.get_solution_key() == ("te_t", "nx", "de", False)
+
+    hangman, _ = await solver.solve_hangman_async(
+        data, solver.HangmanSolverPool(0), cache
+    )
+    assert len(hangman.words) <= 5
+    assert "test" in hangman.words
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    data.max_words = 100
+    pool = solver.HangmanSolverPool(1)
+    try:
+        cached, _ = await solver.solve_hangman_async(data, pool, cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cached.words[:5] == hangman.words
+        assert cached.matching_words_count == hangman.matching_words_count
+
+        for input_ in ("_est", "__st", "___t"):
+            data.input = input_
+            await solver.solve_hangman_async(data, pool, cache)
+        assert len(cache.shared) <= 2
+
+        # the processes don't import the website
+        assert not await asyncio.get_running_loop().run_in_executor(
+            pool._executor,  # pylint: disable=protected-access
+            eval,
+            "'an_website.main' in __import__('sys').modules",
+        )
+    finally:
+        pool.shutdown()
+
+    pool = solver.HangmanSolverPool(1, max_queued=0)
+    pool.pending = 1
+    with pytest.raises(HTTPError):
+        await pool.solve(data.get_solution_key())
+    pool.shutdown()
+
+
+def test_deletion_index(tmp_path: Path) -> None:
+    """Test the index of the wordgame solver."""
+    index = wordgame.DeletionIndex.build(("ab", "ba", "ac"))
+    assert index.lookup("ab") == ["ab"]
+    assert index.lookup("a") == ["ab", "ba", "ac"]
+    assert index.lookup("c") == ["ac"]
+    assert not index.lookup("x")
+
+    lang = Language.parse_string("de")
+    index = wordgame.DeletionIndex.load_or_build(lang, 4, tmp_path)
+    assert "test" in index.lookup("tst")
+    assert len(tuple(tmp_path.iterdir())) == 1
+    loaded = wordgame.DeletionIndex.load_or_build(lang, 4, tmp_path)
+    assert loaded.neighbourhoods == index.neighbourhoods
+    assert not wordgame.DeletionIndex.load_or_build(lang, 0, None).lookup("")
+    # indices without words aren't saved
+    assert not wordgame.DeletionIndex.load_or_build(
+        lang, 1000, tmp_path
+    ).lookup("")
+    assert len(tuple(tmp_path.iterdir())) == 1
+
+    # the lengths are limited to the lengths of the words
+    max_length = wordgame.get_max_word_length(lang.value)
+    assert 0 < max_length < wordgame.WORD_LENGTH_LIMIT
+    assert wordgame.get_index(lang, max_length).neighbourhoods
+    assert wordgame.get_index(lang, max_length + 1) is wordgame.EMPTY_INDEX
+    assert (lang.value, max_length + 1) not in wordgame.INDICES
+
+
+def test_wordgame_solver() -> None:
+    """Test finding the solutions of the wordgame."""
+    solutions = set(wordgame.find_solutions("test", ()))
+    assert "test" not in solutions
+    assert "fest" in solutions
+    assert all(
+        bounded_edit_distance("test", word, 2) == 1 for word in solutions
+    )
+    assert "fest" not in set(wordgame.find_solutions("test", ("fest",)))
+
+    ranked = wordgame.get_ranked_solutions("test", ("fest",))
+    assert ranked == sorted(ranked, reverse=True)
+    assert {word for _, word in ranked} == solutions - {"fest"}
+    assert not wordgame.get_ranked_solutions("")
+
+
 if __name__ == "__main__":
     test_solving_hangman()
+    test_wordgame_solver()
@@ -0,0 +1,71 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The tests for the host info page."""
+
+import asyncio
+import time
+
+from an_website.host_info.host_info import Snapshot, SnapshotProvider
+
+from . import (  # noqa: F401  # pylint: disable=unused-import
+    FetchCallable,
+    fetch,
+)
+
+
+async def test_snapshot_provider() -> None:
+    """Test sharing and refreshing the snapshots."""
+    created: list[Snapshot] = []
+
+    async def create() -> Snapshot:
+        await asyncio.sleep(0.01)
+        snapshot = Snapshot(
+            time.time(), 0, (b"logo", f"{len(created)}".encode())
+        )
+        created.append(snapshot)
+        return snapshot
+
+    provider = SnapshotProvider(create, interval=60, size=1024)
+    assert provider.get_latest() is None
+
+    # concurrent requests share one run of the program
+    snapshots = await asyncio.gather(*[provider.get() for _ in range(10)])
+    assert snapshots == [created[0]] * 10
+    assert await provider.get() is created[0]
+
+    # the snapshot is read from the shared memory
+    provider._latest = None  # pylint: disable=protected-access
+    assert provider.get_latest() == created[0]
+    assert Snapshot.from_bytes(created[0].to_bytes()) == created[0]
+
+    # a refresh is only claimed once every interval
+    assert provider.claim()
+    assert not provider.claim()
+    assert await provider.refresh() == created[1]
+    assert await provider.get() == created[1]
+    assert 0 <= created[1].get_age() < 1
+
+    # snapshots that are too big aren't shared
+    created.append(Snapshot(time.time(), 0, (b"x" * 2048,)))
+    provider.create = lambda: asyncio.sleep(0, created[-1])
+    assert await provider.refresh() == created[-1]
+    provider._latest = None  # pylint: disable=protected-access
+    assert provider.get_latest() == created[1]
+
+
+async def test_host_info_age(fetch: FetchCallable) -> None:  # noqa: F811
+    """Test the age of the host info."""
+    response = await fetch("/host-info", headers={"Accept": "text/plain"})
+    assert response.code == 200
+    assert 0 <= int(response.headers["Age"]) < 60
@@ -14,14 +14,28 @@
 """The tests for the quotes pages."""
 
 import urllib.parse
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
+from pathlib import Path
+from typing import Any, Literal
 
 import orjson as json
+import pytest
 import qoi_rs
 from PIL import Image
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application, RequestHandler
 
 from an_website.quotes import create, utils as quotes
-from an_website.quotes.image import CONTENT_TYPES, FILE_EXTENSIONS
+from an_website.quotes.cache import CacheUpdateStats, _update_cache
+from an_website.quotes.image import (
+    CONTENT_TYPES,
+    FILE_EXTENSIONS,
+    QuoteImageCache,
+)
+from an_website.quotes.quote_of_the_day.store import RedisQuoteOfTheDayStore
 
 from . import (  # noqa: F401  # pylint: disable=unused-import
     WRONG_QUOTE_DATA,
@@ -383,3 +397,263 @@ async def test_quote_apis(fetch: FetchCallable) -> None:  # noqa: F811
 
         for author in response["authors"]:
             assert author == quotes.AUTHORS_CACHE[author["id"]].to_json()
+
+
+def test_wrong_quotes_index() -> None:
+    """Test the secondary indices over the wrong quotes cache."""
+    wrong_quote = get_wrong_quote()
+    index = quotes.WRONG_QUOTES_INDEX
+
+    assert index.get_by_id(1) is wrong_quote
+    assert index.get_by_id(1337) is None
+    assert wrong_quote in index.get_by_quote_id(1)
+    assert wrong_quote in index.get_by_author_id(2)
+    assert not index.get_by_author_id(1)
+    assert wrong_quote in index.get_rated()
+    assert {wq.get_id() for wq in index.get_rated()} == {
+        wq.get_id()
+        for wq in quotes.WRONG_QUOTES_CACHE.values()
+        if wq.id not in {-1, None}
+        if wq.quote.author_id != wq.author_id
+    }
+    assert wrong_quote in index.get_by_rating(above=0)
+    assert wrong_quote not in index.get_by_rating(above=1)
+    assert wrong_quote not in index.get_by_rating(below=0)
+
+    quotes.parse_wrong_quote({**WRONG_QUOTE_DATA, "rating": -5})
+    assert wrong_quote.rating == -5
+    assert wrong_quote not in index.get_by_rating(above=0)
+    assert wrong_quote in index.get_by_rating(below=0)
+    assert wrong_quote in index.get_by_rating(above=-6, below=-4)
+
+    with index.batch_update():
+        quotes.parse_wrong_quote(WRONG_QUOTE_DATA)
+        # the index only gets rebuilt after the batch update
+        assert wrong_quote in index.get_by_rating(below=0)
+    assert wrong_quote in index.get_by_rating(above=0)
+    assert list(index.get_all()) == sorted(
+        index.get_all(), key=lambda wq: wq.rating, reverse=True
+    )
+
+
+def test_quote_image_cache(tmp_path: Path) -> None:
+    """Test the cache for the quote images."""
+    cache = QuoteImageCache(max_size=10, max_disk_size=10)
+    key = cache.get_key("quote", "author", 1, None, "png")
+    assert key == cache.get_key("quote", "author", 1, None, "png")
+    assert key != cache.get_key("quote", "author", 2, None, "png")
+
+    assert cache.get(key) is None
+    cache.put(key, b"12345")
+    cache.put("other", b"678")
+    assert cache.get(key) == b"12345"
+    cache.put("too_big", b"x" * 11)
+    assert cache.get("too_big") is None
+    # the least recently used image gets evicted
+    cache.put("evicting", b"90ab")
+    assert cache.get("other") is None
+    assert cache.get(key) == b"12345"
+    assert cache.get("evicting") == b"90ab"
+    cache.put("evicting", b"cd")
+    cache.put("other", b"678")
+    assert cache.get(key) == b"12345"
+    assert cache.get("evicting") == b"cd"
+    assert cache.last_used.keys() == cache.images.keys()
+
+    assert cache.load_or_create("a", lambda: b"123456", tmp_path) == b"123456"
+    assert (tmp_path / "a").read_bytes() == b"123456"
+    assert cache.load_or_create("a", lambda: b"xyz", tmp_path) == b"123456"
+    assert cache.load_or_create("b", lambda: b"7890ab", tmp_path) == b"7890ab"
+    assert not (tmp_path / "a").exists()
+    assert cache.load_or_create("c", lambda: b"xyz", None) == b"xyz"
+
+
+async def test_vote_queue(app: Application) -> None:  # noqa: F811
+    """Test queueing votes and sending them to a stub of the API."""
+    votes: list[tuple[str, str]] = []
+
+    class StubAPIHandler(RequestHandler):
+        """Stand in for the API of the wrong quotes."""
+
+        def post(self, wq_id: str) -> None:
+            """Record the vote (10 votes are from somewhere else)."""
+            votes.append((wq_id, self.get_body_argument("vote")))
+            rating = 10 + sum(int(vote) for _, vote in votes)
+            self.finish({**WRONG_QUOTE_DATA, "rating": rating})
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(
+        Application([(r"/api/wrongquotes/([0-9]+)", StubAPIHandler)])
+    )
+    server.add_sockets([sock])
+    api_url = quotes.API_URL
+    quotes.API_URL = f"http://127.0.0.1:{port}/api"
+    redis = app.settings["REDIS"]
+    prefix = app.settings["REDIS_PREFIX"]
+
+    queue_key = quotes.get_vote_queue_key(prefix)
+    await redis.delete(queue_key, f"{queue_key}:flushing")
+
+    try:
+        wrong_quote = get_wrong_quote()
+        assert wrong_quote.rating == 1
+
+        to_vote: tuple[Literal[-1, 1], ...] = (1, 1, -1, 1)
+        for vote in to_vote:
+            result = await wrong_quote.vote(
+                vote, lazy=True, redis=redis, redis_prefix=prefix
+            )
+            assert result is wrong_quote
+
+        assert wrong_quote.rating == 3
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 3
+        assert not votes
+
+        assert await quotes.flush_votes(redis, prefix) == 2
+        assert votes == [("1", "1"), ("1", "1")]
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 12
+        assert await quotes.flush_votes(redis, prefix) == 0
+
+        # updating the cache keeps the votes that haven't been sent yet
+        await wrong_quote.vote(1, lazy=True, redis=redis, redis_prefix=prefix)
+        quotes.parse_wrong_quote(
+            quotes.add_pending_votes(
+                {**WRONG_QUOTE_DATA, "rating": 12},
+                await quotes.get_pending_votes(redis, prefix),
+            )
+        )
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 13
+        assert await quotes.flush_votes(redis, prefix) == 1
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 13
+
+        # votes that weren't sent get sent with the next flush
+        await redis.hset(f"{queue_key}:flushing", "1", -1)
+        await wrong_quote.vote(1, lazy=True, redis=redis, redis_prefix=prefix)
+        assert await quotes.flush_votes(redis, prefix) == 1
+        assert votes[-1] == ("1", "-1")
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 13
+        assert await quotes.flush_votes(redis, prefix) == 1
+        assert votes[-1] == ("1", "1")
+        assert quotes.WRONG_QUOTES_CACHE[(1, 2)].rating == 13
+    finally:
+        quotes.API_URL = api_url
+        quotes.parse_wrong_quote(WRONG_QUOTE_DATA)
+        server.stop()
+
+
+async def test_delta_sync(app: Application) -> None:  # noqa: F811
+    """Test that only the changed entries of the API get parsed."""
+    authors: list[dict[str, object]] = []
+
+    class StubAPIHandler(RequestHandler):
+        """Stand in for the API of the authors."""
+
+        def get(self) -> None:
+            """Respond with the authors."""
+            self.set_header("Content-Type", "application/json")
+            self.finish(json.dumps(authors))
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([(r"/api/authors", StubAPIHandler)]))
+    server.add_sockets([sock])
+    api_url = quotes.API_URL
+    quotes.API_URL = f"http://127.0.0.1:{port}/api"
+    redis = app.settings["REDIS"]
+    prefix = f"{app.settings['REDIS_PREFIX']}:test-delta-sync"
+    redis_key = f"{prefix}:cached-quote-data:authors"
+    parsed: list[int] = []
+
+    def parse(data: Mapping[str, Any]) -> quotes.Author:
+        parsed.append(int(data["id"]))
+        return quotes.Author(int(data["id"]), str(data["name"]), None)
+
+    async def update() -> tuple[set[int], CacheUpdateStats]:
+        return await _update_cache(
+            quotes.Author,
+            parse,
+            lambda data: True,
+            redis,
+            prefix,
+            full=False,
+        )
+
+    try:
+        await redis.set(
+            redis_key,
+            json.dumps(
+                [{"id": i, "name": name} for i, name in enumerate("abc")]
+            ),
+        )
+        authors[:] = [{"id": 0, "name": "a"}, {"id": 1, "name": "B"}]
+        authors.append({"id": 3, "name": "d"})
+
+        assert await update() == (
+            {0, 1, 3},
+            CacheUpdateStats(added=1, changed=1, removed=1, unchanged=1),
+        )
+        assert parsed == [1, 3]
+        assert json.loads(await redis.get(redis_key)) == authors
+
+        # an empty response doesn't remove everything
+        authors.clear()
+        parsed.clear()
+        with pytest.raises(ValueError):
+            await update()
+        assert not parsed
+        assert len(json.loads(await redis.get(redis_key))) == 3
+    finally:
+        quotes.API_URL = api_url
+        await redis.delete(redis_key)
+        server.stop()
+
+
+async def test_quote_of_the_day_store(app: Application) -> None:  # noqa: F811
+    """Test the batched lookups of the quote of the day store."""
+    redis = app.settings["REDIS"]
+    prefix = f"{app.settings['REDIS_PREFIX']}:test-qod-store"
+    store = RedisQuoteOfTheDayStore(redis, prefix)
+    today = datetime.now(timezone.utc).date()
+    dates = [today - timedelta(days=i) for i in range(5)]
+    await redis.delete(
+        *[store.get_redis_quote_date_key(date) for date in dates],
+        *[store.get_redis_used_key((i, i)) for i in range(5)],
+    )
+    cache = RedisQuoteOfTheDayStore.CACHE.copy()
+    RedisQuoteOfTheDayStore.CACHE.clear()
+
+    try:
+        assert await store.get_quote_ids_by_dates(dates) == [None] * 5
+        assert await store.set_quote_of_the_day(dates[0], (0, 0)) == (0, 0)
+        # the quote of a date can only be set once
+        assert await store.set_quote_of_the_day(dates[0], (1, 1)) == (0, 0)
+        await store.set_quote_id_by_date(dates[3], (3, 3))
+        await store.set_quote_to_used((2, 2))
+
+        assert await store.have_quotes_been_used(
+            [(i, i) for i in range(5)]
+        ) == [True, False, True, True, False]
+        assert await store.has_quote_been_used((3, 3))
+
+        # past days and today are cached, the store isn't asked again
+        assert RedisQuoteOfTheDayStore.CACHE == {
+            dates[0]: (0, 0),
+            dates[3]: (3, 3),
+        }
+        await redis.delete(store.get_redis_quote_date_key(dates[3]))
+        assert await store.get_quote_ids_by_dates(dates) == [
+            (0, 0),
+            None,
+            None,
+            (3, 3),
+            None,
+        ]
+
+        # dates in the future don't get cached
+        tomorrow = today + timedelta(days=1)
+        await store.set_quote_id_by_date(tomorrow, (4, 4))
+        assert tomorrow not in RedisQuoteOfTheDayStore.CACHE
+        assert await store.get_quote_id_by_date(tomorrow) == (4, 4)
+        await redis.delete(store.get_redis_quote_date_key(tomorrow))
+    finally:
+        RedisQuoteOfTheDayStore.CACHE.clear()
+        RedisQuoteOfTheDayStore.CACHE.update(cache)
@@ -0,0 +1,77 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The tests for the Reporting API™️."""
+
+import asyncio
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from tornado.web import Application
+
+from an_website import EVENT_ELASTICSEARCH
+from an_website.reporting.ingest import ReportQueue
+
+from . import app  # noqa: F401  # pylint: disable=unused-import
+
+
+def create_report(number: int) -> dict[str, Any]:
+    """Create a report like the Reporting API™️ does."""
+    return {
+        "@timestamp": datetime.now(UTC),
+        "_op_type": "create",
+        "body": {"number": number},
+        "ecs": {"version": "8.17.0"},
+        "type": "test",
+        "url": "https://example.org/",
+        "user_agent": "pytest",
+    }
+
+
+async def test_report_queue(app: Application) -> None:  # noqa: F811
+    """Test queueing the reports."""
+    queue = ReportQueue(max_size=5, batch_size=3, flush_interval=0.05)
+
+    # the flush interval passes without a full batch
+    assert queue.put([create_report(1)]) == 1
+    start = time.monotonic()
+    await queue.wait()
+    assert time.monotonic() - start >= 0.04
+
+    # a full batch wakes the waiting task up
+    waiting = asyncio.create_task(queue.wait())
+    await asyncio.sleep(0)
+    assert queue.put([create_report(2), create_report(3)]) == 2
+    await asyncio.wait_for(waiting, 0.04)
+
+    # too many reports get dropped
+    assert queue.put(create_report(i) for i in range(4, 8)) == 2
+    assert len(queue) == 5
+    assert queue.stats.queued == 5
+    assert queue.stats.dropped == 2
+
+    # failing to save the reports keeps them in the queue
+    broken: Any = object()
+    assert not await queue.flush(broken, "reports")
+    assert len(queue) == 5
+    assert not queue.stats.failed
+
+    if not EVENT_ELASTICSEARCH.is_set():
+        return
+    prefix = app.settings["ELASTICSEARCH_PREFIX"]
+    saved = await queue.flush(
+        app.settings["ELASTICSEARCH"], f"{prefix}-reports"
+    )
+    assert saved == queue.stats.saved == 5
+    assert not queue
@@ -13,6 +13,7 @@
 
 """The tests for the request handlers of an-website."""
 
+import re
 import socket
 from datetime import datetime
 from urllib.parse import quote_from_bytes
@@ -20,7 +21,9 @@ from urllib.parse import quote_from_bytes
 from html5lib import HTMLParser
 from time_machine import travel
 from tornado.simple_httpclient import SimpleAsyncHTTPClient
+from tornado.web import Application
 
+from an_website.utils.header_sets import HeaderSetCache
 from an_website.utils.options import COLOUR_SCHEMES
 
 from . import (  # noqa: F401  # pylint: disable=unused-import
@@ -50,6 +53,7 @@ async def test_json_apis(fetch: FetchCallable) -> None:  # noqa: F811
         "/api/discord",
         "/api/endpunkte",
         "/api/hangman-loeser",
+        "/api/hangman-loeser/statistik",
         "/api/ip",
         "/api/ping",
         "/api/version",
@@ -262,6 +266,36 @@ async def test_request_handlers0(
     )
 
 
+async def test_default_headers(
+    app: Application, fetch: FetchCallable  # noqa: F811
+) -> None:
+    """Test reusing the default headers of similar requests."""
+    header_sets: HeaderSetCache = app.settings["HEADER_SETS"]
+    header_sets.invalidate()
+    assert not header_sets
+
+    responses = [
+        await fetch("/", headers={"Host": "example.org"}) for _ in range(3)
+    ]
+    assert len(header_sets) == 1
+    assert header_sets.hits >= 2
+    policies = set()
+    nonces = set()
+    for response in responses:
+        csp = response.headers["Content-Security-Policy"]
+        match = re.search(r"'nonce-([^']+)'", csp)
+        assert match
+        nonces.add(match[1])
+        policies.add(csp.replace(match[1], ""))
+    # only the nonce is different
+    assert len(nonces) == len(responses)
+    assert len(policies) == 1
+
+    response = await fetch("/", headers={"Host": "example.com"})
+    assert "ws://example.com" in response.headers["Content-Security-Policy"]
+    assert len(header_sets) == 2
+
+
 @travel(datetime(2000 + 1, 2, 3, 4, 5, 6, 7, hill_valley), tick=False)
 async def test_request_handlers1(fetch: FetchCallable) -> None:  # noqa: F811
     """Check if the request handlers return 200 codes."""
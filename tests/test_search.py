@@ -0,0 +1,63 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""The tests for the search module."""
+
+from an_website.utils import search
+
+DOCUMENTS: dict[int, tuple[str, str]] = {
+    i: (f"Abraham Lincoln {i}", f"Zitat {i * 7}") for i in range(100)
+} | {100: ("Kim Jong-il", "ab")}
+
+
+def test_search_index() -> None:
+    """Test that the SearchIndex finds the same as the DataProvider."""
+    index = search.SearchIndex(lambda doc: doc, DOCUMENTS.items())
+    provider = search.DataProvider(
+        tuple(DOCUMENTS.values()), lambda doc: doc, lambda doc: doc
+    )
+    assert len(index) == len(DOCUMENTS)
+
+    for query in ("lincoln", "jong il", "ab", "zitat 14", "xyz", "incol 7"):
+        query_object = search.Query(query)
+        assert sorted(index.search(query_object)) == sorted(
+            provider.search(query_object)
+        ), query
+
+    assert index.sync(tuple(DOCUMENTS.items())[:50]) == 51
+    assert len(index) == 50
+    assert (
+        index.sync(((0, ("Kim Jong-un", "")), *tuple(DOCUMENTS.items())[1:50]))
+        == 1
+    )
+    assert [sv.value for sv in index.search(search.Query("jong"))] == [
+        ("Kim Jong-un", "")
+    ]
+
+
+def test_search_with_limit() -> None:
+    """Test that only the best results get returned."""
+    index = search.SearchIndex(lambda doc: doc, DOCUMENTS.items())
+    results = search.search(
+        search.Query("lincoln 42"),
+        search.IndexedDataProvider(index, lambda doc: doc[0]),
+        limit=3,
+    )
+    assert len(results) == 3
+    assert results[0] == search.ScoredValue(1.0, "Abraham Lincoln 42")
+    assert results[0].score >= results[1].score >= results[2].score
+
+
+if __name__ == "__main__":
+    test_search_index()
+    test_search_with_limit()
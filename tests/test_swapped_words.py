@@ -178,6 +178,15 @@ def test_one_way_word_pair() -> None:
     assert pair.get_replacement("Z") == "Z"
 
 
+def test_get_config() -> None:
+    """Test getting the cached config and swapping words with it."""
+    config = sw_config.get_config("(a)=>b;C(c|x)=>Dd")
+    assert config is sw_config.get_config("\r\n(a)=>b;C(c|x)=>Dd  \r\n")
+    assert config == sw_config.SwappedWordsConfig("(a)=>b;C(c|x)=>Dd")
+    assert config.get_regex() is config.get_regex()
+    assert config.swap_words("A a b Cc cX dd xx") == "B b b Dd dD dd xx"
+
+
 def test_check_text_too_long() -> None:
     """Test the check_text_too_long function."""
     swap.check_text_too_long("")
@@ -366,4 +375,5 @@ if __name__ == "__main__":
     test_parsing_config()
     test_two_way_word_pair()
     test_one_way_word_pair()
+    test_get_config()
     test_check_text_too_long()
@@ -14,10 +14,19 @@
 """The tests for the TraversableStaticFileHandler."""
 
 import gzip
+import subprocess  # nosec: B404
+import sys
 from compression import zstd
+from pathlib import Path
 
 from an_website import DIR as ROOT_DIR
-from an_website.utils.fix_static_path_impl import recurse_directory
+from an_website.utils.fix_static_path_impl import (
+    FileHashes,
+    hash_file,
+    manifest_entry_is_current,
+    recurse_directory,
+)
+from an_website.utils.static_file_from_traversable import StaticFileManifest
 
 from . import (  # noqa: F401  # pylint: disable=unused-import
     FetchCallable,
@@ -29,6 +38,38 @@ from . import (  # noqa: F401  # pylint: disable=unused-import
 STATIC_DIR = ROOT_DIR / "static"
 CACHE_CONTROL = f"public,immutable,max-age={86400 * 365 * 10}"
 
+# fetch a static file, edit it and fetch it again
+EDIT_BETWEEN_FETCHES = """
+import asyncio, sys
+from pathlib import Path
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+from an_website.utils.static_file_from_traversable import (
+    TraversableStaticFileHandler,
+)
+
+async def main() -> None:
+    root = Path(sys.argv[1])
+    sock, port = bind_unused_port()
+    server = HTTPServer(
+        Application(
+            [(r"/(.*)", TraversableStaticFileHandler, {"root": root})]
+        )
+    )
+    server.add_sockets([sock])
+    for content in (b"old", b"edited"):
+        (root / "file.txt").write_bytes(content)
+        response = await AsyncHTTPClient().fetch(
+            f"http://127.0.0.1:{port}/file.txt"
+        )
+        print(response.body.decode(), response.headers["Content-Length"])
+    server.stop()
+
+asyncio.run(main())
+"""
+
 
 async def test_well_known(
     fetch: FetchCallable,  # noqa: F811
@@ -252,3 +293,73 @@ async def test_invalid_range(
         assert response.code == 416
         assert response.headers["Content-Type"] == "text/plain"
         assert response.headers["Content-Range"] == f"bytes */{size}"
+
+
+def test_static_file_manifest() -> None:
+    """Test resolving static files with the StaticFileManifest."""
+    manifest = StaticFileManifest(STATIC_DIR)
+    assert manifest.get("does-not-exist.txt") is None
+    assert not manifest.files
+
+    file = manifest.get("robots.txt")
+    assert file is not None
+    assert manifest.get("robots.txt") is file
+    assert file.content_type == "text/plain; charset=UTF-8"
+    path, size = file.variants[None]
+    assert path == STATIC_DIR / "robots.txt"
+    assert size == len(path.read_bytes())
+    for encoding in ("gz", "zst"):
+        if (STATIC_DIR / f"robots.txt.{encoding}").is_file():
+            assert encoding in file.variants
+
+
+def test_file_hashes(tmp_path: Path) -> None:
+    """Test the FileHashes mapping."""
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / "b.txt.gz").write_text("b")
+
+    hashes = FileHashes(
+        tmp_path,
+        "/files/",
+        aliases={"/a.txt": "/files/a.txt"},
+        manifest={"b.txt": {"hash": "from-manifest", "size": 1}},
+    )
+    # the files missing in the manifest get hashed at once
+    assert dict(hashes) == {
+        "/files/a.txt": hash_file(tmp_path / "a.txt"),
+        "/files/b.txt": "from-manifest",
+    }
+    assert hashes["/a.txt"] == hashes["/files/a.txt"]
+    # files added later aren't looked up
+    (tmp_path / "c.txt").write_text("c")
+
+    for key in ("/files/c.txt", "/files/b.txt.gz", "/files/../a.txt", "/x"):
+        assert key not in hashes
+
+
+def test_manifest_entry_is_current(tmp_path: Path) -> None:
+    """Test detecting files that changed after the manifest was created."""
+    (tmp_path / "a.txt").write_text("aaa")
+    (tmp_path / "a.txt.gz").write_text("aa")
+
+    entry = {"size": 3, "variants": {"gz": 2}}
+    assert manifest_entry_is_current(tmp_path, "a.txt", entry)
+    assert not manifest_entry_is_current(
+        tmp_path, "a.txt", {"size": 3, "variants": {"gz": 3}}
+    )
+    assert not manifest_entry_is_current(tmp_path, "b.txt", entry)
+
+    (tmp_path / "a.txt").write_text("aaaa")
+    assert not manifest_entry_is_current(tmp_path, "a.txt", entry)
+
+
+def test_edited_file_in_dev_mode(tmp_path: Path) -> None:
+    """Test that edited files aren't served from the cache in dev mode."""
+    output = subprocess.run(  # nosec: B603
+        [sys.executable, "-X", "dev", "-c", EDIT_BETWEEN_FETCHES, tmp_path],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.splitlines() == ["old 3", "edited 6"]
@@ -13,6 +13,9 @@
 
 """The tests for the uptime page."""
 
+import asyncio
+from typing import Any
+
 from an_website import UPTIME
 from an_website.uptime import uptime
 from an_website.utils import utils
@@ -60,6 +63,72 @@ def test_get_availability_dict() -> None:
     }
 
 
+class FakeElasticsearch:
+    """Answer the availability query slowly."""
+
+    fail: bool
+    up: int
+
+    def __init__(self) -> None:
+        """Initialize the fake."""
+        self.fail = False
+        self.up = 0
+
+    async def search(self, **kwargs: Any) -> dict[str, Any]:
+        """Return the availability data."""
+        assert kwargs == uptime.ES_AVAILABILITY_KWARGS
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError()
+        self.up += 1
+        return {
+            "aggregations": {"up": {"value": self.up}, "down": {"value": 1}}
+        }
+
+
+async def test_availability_cache() -> None:
+    """Test caching the availability data."""
+    elasticsearch: Any = FakeElasticsearch()
+    cache = uptime.AvailabilityCache(refresh_interval=0.05, max_age=0.2)
+
+    # concurrent requests share one query
+    results = await asyncio.gather(
+        *[cache.get(elasticsearch) for _ in range(10)]
+    )
+    assert results == [(1, 1)] * 10
+    assert cache.queries == 1
+    assert await cache.get(elasticsearch) == (1, 1)
+    assert cache.queries == 1
+
+    # old data gets returned while it gets refreshed
+    await asyncio.sleep(0.06)
+    assert await cache.get(elasticsearch) == (1, 1)
+    await asyncio.sleep(0.02)
+    assert cache.queries == 2
+    assert await cache.get(elasticsearch) == (2, 1)
+
+    # too old data gets refreshed before returning
+    await asyncio.sleep(0.25)
+    assert await cache.get(elasticsearch) == (3, 1)
+
+    # if the query fails the old data is used
+    elasticsearch.fail = True
+    await asyncio.sleep(0.25)
+    assert await cache.get(elasticsearch) == (3, 1)
+    assert cache.queries == 4
+    assert await cache.get(elasticsearch) == (3, 1)
+    assert cache.queries == 4
+
+
+def test_availability_chart() -> None:
+    """Test the availability chart."""
+    chart = uptime.get_availability_chart(0.5)
+    assert 'stroke-dasharray="15.71 31.4159"' in chart
+    assert uptime.get_availability_chart(0.5) is chart
+
+
 if __name__ == "__main__":
     test_calculate_uptime()
     test_get_availability_dict()
+    asyncio.run(test_availability_cache())
+    test_availability_chart()
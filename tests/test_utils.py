@@ -18,6 +18,8 @@ from urllib.parse import urlsplit
 import pytest
 
 from an_website.utils import utils
+from an_website.utils.fragments import FRAGMENT_BOUNDARY, PageFragments
+from an_website.utils.path_suggestions import BKTree, PathSuggestions
 
 
 def test_adding_stuff_to_url() -> None:
@@ -84,6 +86,56 @@ def test_country_code_to_flag() -> None:
     assert utils.country_code_to_flag("AQ") == "🇦🇶"
 
 
+def test_geoip_cache() -> None:
+    """Test the utils.GeoIPCache class."""
+    cache = utils.GeoIPCache(local_size=2, shared_size=10, negative_ttl=-1)
+    assert cache.get("127.0.0.1", "db") == (False, None)
+    cache.put("127.0.0.1", "db", {"country_iso_code": "AQ"})
+    assert cache.get("127.0.0.1", "db") == (True, {"country_iso_code": "AQ"})
+    assert cache.get("127.0.0.1", "other-db") == (False, None)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    for i in range(3):
+        cache.put(f"10.0.0.{i}", "db", {"i": i})
+    assert len(cache.local) == 2
+    # evicted from the local tier, but still in the shared one
+    assert cache.get("127.0.0.1", "db") == (True, {"country_iso_code": "AQ"})
+
+    for i in range(20):
+        cache.put(f"10.0.1.{i}", "db", {"i": i})
+    assert len(cache.shared) <= 10
+    assert cache.get("10.0.1.19", "db") == (True, {"i": 19})
+    assert cache.get("10.0.0.0", "db") == (False, None)
+
+    # empty results are cached with the negative ttl (expired immediately)
+    cache.put("10.0.2.0", "db", {})
+    assert cache.get("10.0.2.0", "db") == (False, None)
+
+    cache.clear()
+    assert not cache.local
+    assert not cache.shared
+
+
+def test_latency_histogram() -> None:
+    """Test the utils.LatencyHistogram class."""
+    histogram = utils.LatencyHistogram((0.1, 1, 0.01))
+    assert histogram.bounds == (0.01, 0.1, 1)
+    assert histogram.quantile(0.5) == 0
+    for seconds in (0.005, 0.01, 0.05, 0.5, 0.5, 5):
+        histogram.observe(seconds)
+    assert histogram.counts == [2, 1, 2, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.8) == 1
+    assert histogram.quantile(0.99) == float("inf")
+    assert histogram.to_dict() == {
+        "le_0.01": 2,
+        "le_0.1": 3,
+        "le_1": 5,
+        "le_inf": 6,
+        "sum": pytest.approx(6.065),
+    }
+
+
 def test_n_from_set() -> None:
     """Test the n_from_set function."""
     set_ = {1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12}
@@ -141,13 +193,86 @@ def test_get_close_matches() -> None:
     assert utils.get_close_matches("a𓆗", "a") == ("a",)
 
 
+def test_bk_tree() -> None:
+    """Test finding the closest words in a BK-tree."""
+    words = ("ab", "baa", "acab", "services", "zitate", "zitat", "a", "b")
+    tree = BKTree((*words, "zitat"))
+    assert len(tree) == len(words)
+    for word in ("aa", "ab", "a𓆗", "serwizes", "zitatee", "qwertzuiop", "x"):
+        for cutoff in (0.0, 0.3, 0.5, 0.9):
+            matches = utils.get_close_matches(word, words, 1, cutoff)
+            assert tree.find_closest(word, cutoff) == (
+                matches[0] if matches else None
+            )
+    assert BKTree().find_closest("a") is None
+    assert tree.find_closest("") is None
+
+
+def test_path_suggestions() -> None:
+    """Test suggesting paths for unknown paths."""
+    suggestions = PathSuggestions(
+        {
+            "api": "/api",
+            "services": "/services",
+            "serices": "/services",
+            "zitate": "/zitate",
+            "zitat": "/zitate",
+        },
+        cache_size=2,
+    )
+    assert suggestions.suggest("serwizes") == "/services"
+    assert suggestions.suggest("zitat/1-2") == "zitate/1-2"
+    assert suggestions.suggest("api/x") == "/api"
+    assert suggestions.suggest("qwertzuiop") is None
+    assert suggestions.suggest("qwertzuiop") is None
+
+
+def test_page_fragments() -> None:
+    """Test splitting pages into their fragments."""
+    page = (
+        f"<html><head>{FRAGMENT_BOUNDARY}"
+        '<script defer type="module" src="/a.js"></script>'
+        f"{FRAGMENT_BOUNDARY}{FRAGMENT_BOUNDARY}"
+        '<link rel="stylesheet" href="/a.css"><style>a{b:c}</style>'
+        f"{FRAGMENT_BOUNDARY}</head><body><style>x{{y:z}}</style>"
+        f'<main id="main">{FRAGMENT_BOUNDARY}'
+        "\n  <h1>Title</h1><p>Text &amp; <b>more</b> text</p>"
+        "<script>let x = 1;</script>\n"
+        f"{FRAGMENT_BOUNDARY}</main></body></html>"
+    )
+    fragments = PageFragments.from_page(page)
+    assert fragments.body == (
+        "<h1>Title</h1><p>Text &amp; <b>more</b> text</p>"
+        "<script>let x = 1;</script>"
+    )
+    resources = fragments.get_resources()
+    assert resources.scripts == [
+        {"script": None, "defer": "", "type": "module", "src": "/a.js"},
+        {"script": "let x = 1;"},
+    ]
+    assert resources.stylesheets == ["/a.css"]
+    assert resources.styles == ["a{b:c}", "x{y:z}"]
+    assert fragments.get_text() == "Title\nText &\nmore\ntext"
+
+    # pages that don't use the base template are just the body
+    fragments = PageFragments.from_page("<p>x</p>")
+    assert fragments.body == "<p>x</p>"
+    assert not fragments.get_resources().scripts
+    assert fragments.get_text() == "x"
+
+
 if __name__ == "__main__":
     test_adding_stuff_to_url()
     test_anonomyze_ip()
     test_bool_str_conversion()
     test_country_code_to_flag()
+    test_geoip_cache()
+    test_latency_histogram()
     test_n_from_set()
     test_name_to_id()
     test_replace_umlauts()
     test_time_to_str()
     test_get_close_matches()
+    test_bk_tree()
+    test_path_suggestions()
+    test_page_fragments()
@@ -13,13 +13,24 @@
 
 """The tests for the version module."""
 
+from pathlib import Path
+
 from an_website.version.version import (
+    Fingerprint,
+    FingerprintService,
     get_file_hashes,
     get_hash_of_file_hashes,
     hash_all_files,
     hash_bytes,
 )
 
+from . import (  # noqa: F401  # pylint: disable=unused-import
+    FetchCallable,
+    app,
+    assert_valid_response,
+    fetch,
+)
+
 
 def test_hash_bytes() -> None:
     """Test the hash_bytes function."""
@@ -54,3 +65,30 @@ def test_get_hash_of_file_hashes() -> None:
     assert get_hash_of_file_hashes() == get_hash_of_file_hashes()
     chars = (ord(ch) for ch in get_hash_of_file_hashes())
     assert all(ch in range(0x2800, 0x2900) for ch in chars)
+
+
+def test_fingerprint_service(tmp_path: Path) -> None:
+    """Test computing the fingerprint and saving it in the cache file."""
+    cache_file = tmp_path / "version-fingerprint" / "1.0.txt"
+    fingerprint = FingerprintService(cache_file).get()
+    assert fingerprint.get_file_hashes() == get_file_hashes()
+    assert fingerprint.hash_of_file_hashes == get_hash_of_file_hashes()
+    assert cache_file.read_text("UTF-8") == get_file_hashes()
+
+    # the cache file is used instead of hashing the files again
+    cache_file.write_text("⠁ a\n⠂ b", "UTF-8")
+    service = FingerprintService(cache_file)
+    assert service.start() is service.start()
+    assert service.get() == Fingerprint(
+        ("⠁ a", "⠂ b"), hash_bytes("⠁ a\n⠂ b".encode("UTF-8"))
+    )
+
+
+async def test_file_hashes_api(fetch: FetchCallable) -> None:  # noqa: F811
+    """Test streaming the file hashes."""
+    response = assert_valid_response(
+        await fetch("/api/version/hashes", headers={"Accept": "text/plain"}),
+        "text/plain;charset=utf-8",
+        codes={200},
+    )
+    assert response.body.decode("UTF-8") == f"{get_file_hashes()}\n"